@@ -1,44 +1,182 @@
-from fastapi import APIRouter, Query
+import re
+from typing import Optional
+from bson import ObjectId
+from fastapi import APIRouter, Query, HTTPException
 from datetime import date, datetime, timedelta
-from app.db.models_mongo import AttendanceLog, Student, SessionModel
+from app.db import mongo as mongo_module
+from app.services import rollups
 from datetime import timezone
 
 
 router = APIRouter()
 
-@router.get("/preview")
-async def attendance_preview(
-    range: str = Query("today", enum=["today", "week", "month", "year"])
-):
+MAX_PAGE = 5000
+
+
+def _range_start(range: str) -> date:
     today = date.today()
 
     # 🔹 date range calculation
     if range == "today":
-        start = today
+        return today
     elif range == "week":
-        start = today - timedelta(days=today.weekday())
+        return today - timedelta(days=today.weekday())
     elif range == "month":
-        start = today.replace(day=1)
-    elif range == "year":
-        start = today.replace(month=1, day=1)
+        return today.replace(day=1)
+    return today.replace(month=1, day=1)
 
-    records = []
 
-    async for log in AttendanceLog.find({"date": {"$gte": start}}):
-        student = await Student.get(log.student_id)
-        session = await SessionModel.get(log.session_id)
+def _ci_exact(value):
+    return {"$regex": f"^{re.escape(str(value).strip())}$", "$options": "i"}
+
+
+async def _ids(collection, query):
+    return [str(d["_id"]) async for d in mongo_module.db[collection].find(query, {"_id": 1})]
+
+
+def _to_object_id(field):
+    # attendance_logs keeps ids as strings; a bad one joins nothing instead of failing
+    return {"$convert": {"input": field, "to": "objectId", "onError": None, "onNull": None}}
+
+
+@router.get("/preview")
+async def attendance_preview(
+    range: str = Query("today", enum=["today", "week", "month", "year"]),
+    dept: Optional[str] = None,
+    sem: Optional[int] = None,
+    subject: Optional[str] = None,
+    name: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=MAX_PAGE),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+):
+    """
+    Newest marks first, one page per call. Filters are resolved to
+    student / session ids up front, so Mongo only walks matching logs and
+    joins students + sessions for the returned page alone.
+    """
+    start = _range_start(range)
+    match = {"date": {"$gte": datetime.combine(start, datetime.min.time())}}
+
+    if cursor:
+        try:
+            match["_id"] = {"$lt": ObjectId(cursor)}
+        except Exception:
+            raise HTTPException(400, "Invalid cursor")
+
+    student_q = {}
+    if dept:
+        student_q["dept"] = _ci_exact(dept)
+    if sem is not None:
+        student_q["sem"] = sem
+    if name:
+        student_q["name"] = {"$regex": re.escape(name.strip()), "$options": "i"}
+    if student_q:
+        match["student_id"] = {"$in": await _ids("students", student_q)}
+
+    if subject:
+        match["session_id"] = {"$in": await _ids("sessions", {"subject": _ci_exact(subject)})}
+
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"_id": -1}},
+        {"$limit": limit + 1},
+        {"$addFields": {
+            "student_oid": _to_object_id("$student_id"),
+            "session_oid": _to_object_id("$session_id"),
+        }},
+        {"$lookup": {
+            "from": "students",
+            "localField": "student_oid",
+            "foreignField": "_id",
+            "as": "student",
+        }},
+        {"$lookup": {
+            "from": "sessions",
+            "localField": "session_oid",
+            "foreignField": "_id",
+            "as": "session",
+        }},
+        {"$project": {
+            "student_name": 1,
+            "in_time": 1,
+            "confidence": 1,
+            "student": {"$arrayElemAt": ["$student", 0]},
+            "session": {"$arrayElemAt": ["$session", 0]},
+        }},
+    ]
+
+    records = []
+    last_id = None
+    more = False
+    async for log in mongo_module.db["attendance_logs"].aggregate(pipeline):
+        # one extra row was asked for: it only tells us another page exists
+        if len(records) == limit:
+            more = True
+            break
+        last_id = log["_id"]
+        student = log.get("student") or {}
+        session = log.get("session") or {}
+        in_time = log.get("in_time")
 
         records.append({
-            "roll_no": student.roll_no if student else None,
-            "student_name": student.name if student else log.student_name,
-            "dept": student.dept if student else None,
-            "sem": student.sem if student else None,
-            "subject": session.subject if session else None,
+            "roll_no": student.get("roll_no"),
+            "student_name": student.get("name", log.get("student_name")),
+            "dept": student.get("dept"),
+            "sem": student.get("sem"),
+            "subject": session.get("subject"),
             "in_time": (
-                log.in_time.replace(tzinfo=timezone.utc).isoformat()
-                if log.in_time else None
+                in_time.replace(tzinfo=timezone.utc).isoformat()
+                if in_time else None
             ),
-            "confidence": log.confidence,
+            "confidence": log.get("confidence"),
         })
 
-    return records
+    return {
+        "records": records,
+        "count": len(records),
+        "next_cursor": str(last_id) if more else None,
+    }
+
+
+# =========================
+# SUMMARIES (from daily rollups)
+# =========================
+RANGE_ENUM = ["today", "week", "month", "year"]
+
+
+@router.get("/summary/subjects")
+async def subject_summary(
+    range: str = Query("month", enum=RANGE_ENUM),
+    dept: Optional[str] = None,
+    sem: Optional[int] = None,
+):
+    return await rollups.subject_summary(_range_start(range), date.today(), dept=dept, sem=sem)
+
+
+@router.get("/summary/students")
+async def class_summary(
+    range: str = Query("month", enum=RANGE_ENUM),
+    dept: str = Query(...),
+    sem: int = Query(...),
+    course_name: Optional[str] = None,
+):
+    return await rollups.class_summary(
+        _range_start(range), date.today(), dept=dept, sem=sem, course_name=course_name
+    )
+
+
+@router.get("/summary/students/{student_id}")
+async def student_summary(
+    student_id: str,
+    range: str = Query("month", enum=RANGE_ENUM),
+):
+    try:
+        oid = ObjectId(student_id)
+    except Exception:
+        raise HTTPException(400, "Invalid student_id")
+    student = await mongo_module.db["students"].find_one(
+        {"_id": oid}, {"name": 1, "roll_no": 1, "dept": 1, "sem": 1, "course_name": 1}
+    )
+    if not student:
+        raise HTTPException(404, "Student not found")
+    return await rollups.student_summary(student, _range_start(range), date.today())
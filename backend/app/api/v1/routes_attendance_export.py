@@ -1,86 +1,214 @@
 # backend/app/api/v1/routes_attendance_export.py
-from fastapi import APIRouter, Query, Response
-from app.db.models_mongo import AttendanceLog, SessionModel
-from typing import Optional
-from io import StringIO
+import os
+import re
 import csv
+import zlib
+import tempfile
+from io import StringIO
+from typing import Optional
 from datetime import datetime, date, timedelta
+from bson import ObjectId
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from app.db import mongo as mongo_module
 
 router = APIRouter()
 
-@router.get("/export")
-async def export_attendance(
-    dept: Optional[str] = Query(None),
-    sem: Optional[str] = Query(None),
-    name: Optional[str] = Query(None),
-    range: Optional[str] = Query("today"),  # ✅ NEW
-):
+# rows per streamed chunk / per session prefetch
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "500"))
+
+HEADER = [
+    "Dept",
+    "Sem",
+    "Subject",
+    "Roll No",
+    "Student Name",
+    "Date",
+    "In Time",
+    "Confidence",
+]
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def _date_range(range):
     today = date.today()
 
     # ✅ DATE RANGE LOGIC
-    if range == "today":
-        start_date = today
-        end_date = today
-
-    elif range == "week":
+    if range == "week":
         start_date = today - timedelta(days=today.weekday())
-        end_date = today
-
     elif range == "month":
         start_date = today.replace(day=1)
-        end_date = today
-
     elif range == "year":
         start_date = today.replace(month=1, day=1)
-        end_date = today
-
     else:
         start_date = today
-        end_date = today
-
-    out = StringIO()
-    writer = csv.writer(out)
-
-    writer.writerow([
-        "Dept",
-        "Sem",
-        "Subject",
-        "Roll No",
-        "Student Name",
-        "Date",
-        "In Time",
-        "Confidence",
-    ])
-
-    async for log in AttendanceLog.find({
-        "date": {"$gte": start_date, "$lte": end_date}
-    }):
-        session = await SessionModel.get(log.session_id)
-        if not session:
-            continue
-
-        # 🔹 filters
-        if dept and session.dept != dept:
-            continue
-        if sem and session.sem != sem:
-            continue
-        if name and log.student_name and name.lower() not in log.student_name.lower():
-            continue
-
-        writer.writerow([
-            session.dept,
-            session.sem,
-            session.subject,
-            log.student_id,
-            log.student_name,
-            log.date.isoformat(),
-            log.in_time.replace(tzinfo=None).isoformat() if log.in_time else "",
-            log.confidence,
-        ])
+    return start_date, today
+
+
+async def _export_rows(dept, sem, name, start_date, end_date):
+    """
+    Yields lists of export rows, EXPORT_CHUNK_ROWS at a time.
+
+    dept/sem are session fields: they become a session_id $in on the logs
+    query. Session metadata is fetched in $in batches and kept for the
+    rest of the export.
+    """
+    sessions = {}   # session_id -> {dept, sem, subject} (None = missing)
+    query = {
+        "date": {
+            "$gte": datetime.combine(start_date, datetime.min.time()),
+            "$lte": datetime.combine(end_date, datetime.min.time()),
+        }
+    }
+
+    session_q = {}
+    if dept:
+        session_q["dept"] = dept
+    if sem:
+        session_q["sem"] = str(sem)
+    if session_q:
+        async for s in mongo_module.db["sessions"].find(
+            session_q, {"dept": 1, "sem": 1, "subject": 1}
+        ):
+            sessions[str(s["_id"])] = s
+        query["session_id"] = {"$in": list(sessions)}
+
+    if name:
+        # logs without a stored name are kept, as the name filter always did
+        query["$or"] = [
+            {"student_name": {"$regex": re.escape(name), "$options": "i"}},
+            {"student_name": None},
+            {"student_name": ""},
+        ]
+
+    cursor = mongo_module.db["attendance_logs"].find(
+        query,
+        {"session_id": 1, "student_id": 1, "student_name": 1,
+         "date": 1, "in_time": 1, "confidence": 1},
+        batch_size=EXPORT_CHUNK_ROWS,
+    )
+
+    async def flush(logs):
+        missing = {l["session_id"] for l in logs if l["session_id"] not in sessions}
+        oids = []
+        for sid in missing:
+            sessions[sid] = None
+            if ObjectId.is_valid(sid):
+                oids.append(ObjectId(sid))
+        if oids:
+            async for s in mongo_module.db["sessions"].find(
+                {"_id": {"$in": oids}}, {"dept": 1, "sem": 1, "subject": 1}
+            ):
+                sessions[str(s["_id"])] = s
+
+        rows = []
+        for log in logs:
+            session = sessions.get(log["session_id"])
+            if not session:
+                continue
+            d = log.get("date")
+            in_time = log.get("in_time")
+            rows.append([
+                session.get("dept"),
+                session.get("sem"),
+                session.get("subject"),
+                log.get("student_id"),
+                log.get("student_name"),
+                d.date().isoformat() if isinstance(d, datetime) else str(d or ""),
+                in_time.replace(tzinfo=None).isoformat() if in_time else "",
+                log.get("confidence"),
+            ])
+        return rows
+
+    logs = []
+    async for log in cursor:
+        logs.append(log)
+        if len(logs) >= EXPORT_CHUNK_ROWS:
+            yield await flush(logs)
+            logs = []
+    if logs:
+        yield await flush(logs)
+
+
+async def _csv_stream(chunks, compress):
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None   # 31 -> gzip
+
+    def encode(rows):
+        buf = StringIO()
+        csv.writer(buf).writerows(rows)
+        data = buf.getvalue().encode("utf-8")
+        return gz.compress(data) if gz else data
+
+    yield encode([HEADER])
+    async for rows in chunks:
+        data = encode(rows)
+        if data:
+            yield data
+    if gz:
+        yield gz.flush()
+
+
+async def _xlsx_stream(chunks, compress):
+    """
+    openpyxl's write-only mode spools rows to a temp file instead of keeping
+    the sheet in memory; the finished workbook is then streamed from disk.
+    """
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Attendance")
+    ws.append(HEADER)
+    async for rows in chunks:
+        for row in rows:
+            ws.append(row)
+
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        await run_in_threadpool(wb.save, path)
+        gz = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+        with open(path, "rb") as f:
+            while True:
+                data = await run_in_threadpool(f.read, 1 << 20)
+                if not data:
+                    break
+                yield gz.compress(data) if gz else data
+        if gz:
+            yield gz.flush()
+    finally:
+        os.unlink(path)
+
+
+@router.get("/export")
+async def export_attendance(
+    dept: Optional[str] = Query(None),
+    sem: Optional[str] = Query(None),
+    name: Optional[str] = Query(None),
+    range: Optional[str] = Query("today"),  # ✅ NEW
+    format: str = Query("csv", enum=["csv", "xlsx"]),
+    gzip: bool = Query(False, description="gzip the file (.gz)"),
+):
+    start_date, end_date = _date_range(range)
+    chunks = _export_rows(dept, sem, name, start_date, end_date)
+
+    if format == "xlsx":
+        body = _xlsx_stream(chunks, gzip)
+    else:
+        body = _csv_stream(chunks, gzip)
+
+    filename = f"attendance_{range}_{end_date}.{format}"
+    media_type = MEDIA_TYPES[format]
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
 
     headers = {
-        "Content-Disposition": f'attachment; filename="attendance_{range}_{today}.csv"',
-        "Content-Type": "text/csv",
+        "Content-Disposition": f'attachment; filename="{filename}"',
     }
 
-    return Response(out.getvalue(), media_type="text/csv", headers=headers)
+    return StreamingResponse(body, media_type=media_type, headers=headers)
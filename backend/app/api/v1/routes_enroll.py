@@ -1,12 +1,21 @@
 # backend/app/api/v1/routes_enroll.py
-import io
-import asyncio
+from typing import List, Optional
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from beanie import PydanticObjectId
 import numpy as np
-from app.utils.image import read_imagefile
-from app.services.face_engine import get_faces_and_embeddings
+from app.services.ingest import read_upload, to_original
+from app.services.micro_batch import get_faces_and_embeddings_batched
+from app.services.detection_profiles import get_profile, ENROLL_DETECTION_PROFILE
+from app.services.face_quality import best_enrollment_face, duplicate_of
+from app.services.embedding_codec import encode_fields
 from app.db.models_mongo import Student, FaceEmbedding
+from app.services.gallery import gallery
+from app.services.gallery_sync import purge_student_faces
+from app.services.templates import templates_enabled, save_student_templates
+from app.services.inference_pool import run_inference, InferenceBusy
+from app.services.bulk_enroll import ImageEntry, archive_entries, bulk_enroll_stream
 from datetime import datetime
 
 router = APIRouter()
@@ -22,13 +31,12 @@ async def register_failure(student: Student, msg: str):
     await student.save()
 
     if student.enroll_failures >= MAX_FAILURES:
-        # delete embeddings
-        await FaceEmbedding.find(
-            {"student_id": str(student.id)}
-        ).delete()
+        # delete embeddings / templates
+        await purge_student_faces([student.id])
 
         # delete student
         await student.delete()
+        gallery.remove_student(student.id)
 
         raise HTTPException(
             status_code=400,
@@ -58,34 +66,57 @@ async def enroll(
     if not file or not file.content_type.startswith("image/"):
         await register_failure(student, "Invalid image file")
 
-    contents = await file.read()
-    if not contents:
+    if not file.size:
         await register_failure(student, "Empty image")
 
     # ---------- read image ----------
+    # decoded straight from the spooled upload, no bytes copy
+    profile = get_profile(ENROLL_DETECTION_PROFILE)
     try:
-        img = read_imagefile(io.BytesIO(contents))
+        frame = await run_inference(read_upload, file.file, profile.max_side)
+    except (InferenceBusy, HTTPException):
+        raise  # 429 / 413, not the student's fault
     except Exception:
+        frame = None
+    if frame is None:
         await register_failure(student, "Image read failed")
+    img = frame.image
 
     # ---------- face detection ----------
     try:
-        faces = await asyncio.to_thread(get_faces_and_embeddings, img)
+        faces = await get_faces_and_embeddings_batched(img, profile)
+    except InferenceBusy:
+        raise
     except Exception:
         await register_failure(student, "Face engine failed")
 
     if not faces:
         await register_failure(student, "No face detected")
 
+    # ---------- quality gate ----------
+    face, quality, reason = best_enrollment_face(img, faces)
+    if reason:
+        await register_failure(student, f"Image rejected: {reason}")
+
+    emb = face["embedding"].astype(np.float32)
+
+    # a near-copy of an image we already have adds nothing but gallery rows;
+    # not counted as a failure, the face itself is fine
+    similarity = duplicate_of(emb, gallery.student_rows(student.id))
+    if similarity is not None:
+        raise HTTPException(
+            409, f"Image rejected: too similar to an enrolled image ({similarity:.3f})"
+        )
+
     # ---------- SUCCESS PATH ----------
-    emb = faces[0]["embedding"].astype(np.float32)
 
     emb_doc = FaceEmbedding(
         student_id=str(student.id),
-        embedding=emb.tobytes(),
+        **encode_fields(emb),
         created_at=datetime.utcnow(),
     )
     await emb_doc.insert()
+    gallery.add(emb_doc.id, student, emb)
 
     student.enrolled_images += 1
     await student.save()
@@ -96,7 +127,8 @@ async def enroll(
         "student_id": str(student.id),
         "faces_detected": len(faces),
         "enrolled_images": student.enrolled_images,
-        "bbox": faces[0].get("bbox"),
+        "bbox": to_original(face["bbox"], frame.scale) if face.get("bbox") is not None else None,
+        "quality": quality,
     }
 
 
@@ -114,14 +146,51 @@ async def finalize_enrollment(student_id: str):
     # ❌ No images → delete student
     if student.enrolled_images == 0:
         await student.delete()
+        gallery.remove_student(student.id)
         raise HTTPException(400, "No images enrolled")
 
     # ✅ COMMIT
     student.enroll_status = "COMPLETED"
     await student.save()
 
+    # re-sync this student's rows with what actually landed in Mongo
+    await gallery.refresh_student(student)
+
+    # 🧩 aggregate the images into per-student templates
+    templates = 0
+    if templates_enabled():
+        ids, vectors = await save_student_templates(
+            student, gallery.student_rows(student.id)
+        )
+        gallery.set_templates(student, ids, vectors)
+        templates = len(ids)
+
     return {
         "success": True,
         "student_id": str(student.id),
         "enrolled_images": student.enrolled_images,
+        "templates": templates,
     }
+
+
+@router.post("/bulk", summary="Enroll many students from an archive or many files")
+async def bulk_enroll(
+    archive: Optional[UploadFile] = File(None, description="zip / tar(.gz) of <roll_no>/<image>"),
+    files: Optional[List[UploadFile]] = File(None, description="images named <roll_no>_<n>.jpg"),
+):
+    """
+    Streams one JSON line per student (accepted / rejected images) as each
+    finishes, then a summary line.
+    """
+    entries = []
+    if archive is not None:
+        try:
+            entries = await run_in_threadpool(archive_entries, archive.file, archive.filename or "")
+        except Exception:
+            raise HTTPException(400, "archive must be a zip or tar file")
+    entries.extend(ImageEntry.from_upload(f) for f in files or [])
+
+    if not entries:
+        raise HTTPException(400, "No images uploaded")
+
+    return StreamingResponse(bulk_enroll_stream(entries), media_type="application/x-ndjson")
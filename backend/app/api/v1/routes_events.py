@@ -0,0 +1,52 @@
+# backend/app/api/v1/routes_events.py
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, Request, Header
+from fastapi.responses import StreamingResponse
+from app.services.events import event_bus, format_sse
+
+router = APIRouter()
+
+HEARTBEAT_S = 15
+
+
+@router.get("/stream")
+async def event_stream(
+    request: Request,
+    session_id: Optional[str] = None,
+    last_event_id: Optional[int] = Header(None),
+):
+    """
+    Server-sent events:
+        session.created / session.status   (UPCOMING → LIVE → EXPIRED)
+        attendance.marked
+    Pass ?session_id= to receive one session's events only. Browsers
+    reconnecting with Last-Event-ID get the events they missed.
+    """
+    sub = event_bus.subscribe(session_id=session_id, last_event_id=last_event_id)
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while not sub.dropped:
+                try:
+                    event = await asyncio.wait_for(sub.queue.get(), timeout=HEARTBEAT_S)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            event_bus.unsubscribe(sub)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/stats")
+async def event_stats():
+    return event_bus.stats()
@@ -0,0 +1,19 @@
+# backend/app/api/v1/routes_health.py
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.services.gallery import gallery
+from app.services.warmup import readiness
+
+router = APIRouter()
+
+
+@router.get("/live", summary="Process is up (liveness probe)")
+async def live():
+    return {"status": "alive"}
+
+
+@router.get("/ready", summary="Worker can serve at steady-state latency (readiness probe)")
+async def ready():
+    ok, checks = await readiness.check(gallery)
+    body = {"status": "ready" if ok else "starting", "checks": checks, **readiness.stats()}
+    return JSONResponse(body, status_code=200 if ok else 503)
@@ -1,8 +1,27 @@
+import asyncio
 from typing import Optional
-from fastapi import APIRouter, UploadFile, File
-from app.utils.image import read_imagefile, save_crop_image
-from app.services.face_engine import get_faces_and_embeddings, match_embedding
-from app.db.models_mongo import FaceEmbedding, Student
+from fastapi import (
+    APIRouter, UploadFile, File, Form, Query, Request, WebSocket, WebSocketDisconnect, HTTPException,
+)
+from app.utils.image import save_crop_image
+from app.services import face_engine
+from app.services.micro_batch import (
+    get_faces_and_embeddings_batched,
+    embed_crops_batched,
+    recognition_batcher,
+)
+from app.services.face_tracker import FaceTracker
+from app.services.auto_mark import attendance_writer
+from app.services.detection_profiles import (
+    get_profile,
+    profile_stats,
+    RECOGNIZE_DETECTION_PROFILE,
+)
+from app.services.gallery import gallery, session_scope
+from app.services.gallery_sync import gallery_sync
+from app.services.session_cache import get_session
+from app.services.inference_pool import run_inference, inference_pool, InferenceBusy
+from app.services.ingest import read_upload, decode_image, to_original, ingest_metrics
 import numpy as np
 import os
 import time
@@ -17,42 +36,51 @@ os.makedirs(UNKNOWN_DIR, exist_ok=True)
 
 @router.post("/")
 async def recognize(
+    request: Request,
     file: UploadFile = File(...),
-    session_id: Optional[str] = None,
+    session_id: Optional[str] = Form(None),
+    top_k: int = Query(1, ge=1, le=10),
+    profile: Optional[str] = Query(None, description="default | kiosk | classroom"),
+    auto_mark: bool = Query(False, description="mark recognized students in session_id"),
 ):
+    # frontend posts session_id as a form field; older callers use ?session_id=
+    session_id = session_id or request.query_params.get("session_id")
     print("[RECOGNIZE] session_id =", session_id)
 
-    img = read_imagefile(file.file)
-    if img is None:
+    # 📐 detection resolution for this kind of camera
+    det_profile = get_profile(profile or RECOGNIZE_DETECTION_PROFILE)
+
+    # 🧵 decode + detection run on the inference pool, never on the event loop
+    # 🗜️ JPEGs decode at reduced scale when the profile would shrink them anyway
+    frame = await run_inference(read_upload, file.file, det_profile.max_side)
+    if frame is None:
         return {"faces": []}
+    img = frame.image
 
-    faces = get_faces_and_embeddings(img)
+    # 📦 recognition model runs on crops batched across concurrent requests
+    faces = await get_faces_and_embeddings_batched(img, det_profile)
 
-    # ✅ LOAD EMBEDDINGS USING BEANIE
-    enrolled = []
+    # ✅ IN-MEMORY GALLERY (no DB reads on the hot path)
+    # ✅ ALL FACES OF THE FRAME IN ONE MATRIX PRODUCT
+    matches = []
+    session_doc = await get_session(session_id) if session_id else None
+    if faces:
+        # 🎯 only students eligible for this session are searched first
+        scope = session_scope(session_doc) if session_doc else None
 
-    async for emb_doc in FaceEmbedding.find_all():
-        try:
-            emb = np.frombuffer(emb_doc.embedding, dtype=np.float32)
-        except Exception:
-            continue
-
-        # ✅ THIS LINE GOES HERE (ONLY ONCE)
-        student = await Student.get(emb_doc.student_id)
-
-        if student:
-            enrolled.append({
-                "student_id": str(student.id),
-                "name": student.name,
-                "embedding": emb,
-            })
+        queries = np.stack([f["embedding"] for f in faces]).astype(np.float32)
+        matches = await run_inference(
+            gallery.match, queries, threshold=0.60, top_k=top_k, scope=scope
+        )
 
-    results = []
+    # 📝 auto-mark: written in the background, batched with other cameras
+    marks = [None] * len(matches)
+    if auto_mark and session_doc and matches:
+        marks = await attendance_writer.observe(session_doc, matches)
 
-    for idx, f in enumerate(faces):
-        emb = f["embedding"].astype(np.float32)
-        match = match_embedding(emb, enrolled, threshold=0.60)
+    results = []
 
+    for f, match, mark in zip(faces, matches, marks):
         print(
             f"[RECOGNIZE] recognized={match['recognized']} "
             f"student_id={match['student_id']} "
@@ -60,8 +88,9 @@ async def recognize(
         )
 
         results.append({
-            "bbox": f["bbox"],
+            "bbox": to_original(f["bbox"], frame.scale),
             "match": match,
+            "attendance": mark,
         })
 
         # save unknown face
@@ -69,3 +98,176 @@ async def recognize(
             pass
 
     return {"faces": results}
+
+
+# =========================
+# STREAMING (WebSocket)
+# =========================
+async def _track_frame(tracker, img, det_profile, scope, top_k, scale=1.0):
+    """
+    Detect every frame, but embed + match only the tracks that need it.
+    Returns (visible tracks, lost tracks, recognized events, embedded count).
+    Tracks live in decoded-frame coordinates; `scale` maps event boxes back.
+    """
+    if face_engine.INFERENCE_MODE == "server":
+        # remote workers always return embeddings; tracking still saves matching
+        faces = await get_faces_and_embeddings_batched(img, det_profile)
+    else:
+        faces = await run_inference(face_engine.detect_and_align, img, det_profile)
+
+    visible, lost = tracker.update(faces)
+    stale = [t for t in visible if tracker.needs_embedding(t)]
+
+    events = []
+    if stale:
+        if face_engine.INFERENCE_MODE == "server":
+            embs = [t.face["embedding"] for t in stale]
+        else:
+            embs = await embed_crops_batched([t.face["crop"] for t in stale])
+        queries = np.stack(embs).astype(np.float32)
+        matches = await run_inference(
+            gallery.match, queries, threshold=0.60, top_k=top_k, scope=scope
+        )
+        for t, emb, match in zip(stale, queries, matches):
+            owner, changed = tracker.identify(t, emb, match)
+            if owner is not t:
+                visible[visible.index(t)] = owner
+            if changed:
+                events.append({
+                    "type": "recognized",
+                    "track_id": owner.id,
+                    "student_id": match["student_id"],
+                    "name": match["name"],
+                    "score": match["score"],
+                    "bbox": to_original(owner.bbox, scale),
+                })
+
+    return visible, lost, events, len(stale)
+
+
+@router.websocket("/ws")
+async def recognize_stream(
+    websocket: WebSocket,
+    session_id: Optional[str] = None,
+    profile: Optional[str] = None,
+    top_k: int = 1,
+    auto_mark: bool = False,
+):
+    """
+    Continuous recognition for one camera: the client sends binary JPEG
+    frames, the server answers every processed frame with its tracked faces
+    and pushes a `recognized` event the first time a track is identified
+    (plus `marked` when auto_mark is on and the student gets marked).
+
+    Frames that arrive while the previous one is still processing replace
+    each other (only the newest is kept), so a fast camera never builds a
+    backlog.
+    """
+    await websocket.accept()
+    try:
+        det_profile = get_profile(profile or RECOGNIZE_DETECTION_PROFILE)
+    except Exception as e:
+        await websocket.send_json({"type": "error", "detail": str(getattr(e, "detail", e))})
+        await websocket.close(code=1008)
+        return
+
+    session_doc = await get_session(session_id) if session_id else None
+    scope = session_scope(session_doc) if session_doc else None
+    top_k = max(1, min(int(top_k), 10))
+    tracker = FaceTracker()
+
+    latest = {"data": None, "dropped": 0}
+    arrived = asyncio.Event()
+    closed = asyncio.Event()
+
+    async def receive():
+        try:
+            while True:
+                msg = await websocket.receive()
+                if msg["type"] == "websocket.disconnect":
+                    break
+                if msg.get("bytes"):
+                    if latest["data"] is not None:
+                        latest["dropped"] += 1
+                    latest["data"] = msg["bytes"]
+                    arrived.set()
+                elif msg.get("text") == "ping":
+                    await websocket.send_json({"type": "pong"})
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+        finally:
+            closed.set()
+            arrived.set()
+
+    receiver = asyncio.ensure_future(receive())
+    print("[RECOGNIZE/WS] stream opened, session_id =", session_id)
+    try:
+        while True:
+            await arrived.wait()
+            arrived.clear()
+            if closed.is_set():
+                break
+            data, latest["data"] = latest["data"], None
+            if data is None:
+                continue
+
+            try:
+                frame = await run_inference(decode_image, data, det_profile.max_side)
+                if frame is None:
+                    await websocket.send_json({"type": "error", "detail": "Invalid frame"})
+                    continue
+                visible, lost, events, embedded = await _track_frame(
+                    tracker, frame.image, det_profile, scope, top_k, frame.scale
+                )
+            except InferenceBusy:
+                await websocket.send_json({"type": "busy", "frame": tracker.frame})
+                continue
+            except HTTPException as e:
+                await websocket.send_json({"type": "error", "detail": e.detail})
+                continue
+
+            if auto_mark and session_doc:
+                known = [t for t in visible if t.match is not None]
+                marks = await attendance_writer.observe(session_doc, [t.match for t in known])
+                for t, mark in zip(known, marks):
+                    if mark == "marked":
+                        events.append({
+                            "type": "marked",
+                            "track_id": t.id,
+                            "student_id": t.match["student_id"],
+                            "name": t.match["name"],
+                        })
+
+            for event in events:
+                await websocket.send_json(event)
+            for t in lost:
+                await websocket.send_json({"type": "lost", "track_id": t.id})
+            await websocket.send_json({
+                "type": "frame",
+                "frame": tracker.frame,
+                "faces": [
+                    {**t.as_dict(), "bbox": to_original(t.bbox, frame.scale)} for t in visible
+                ],
+                "embedded": embedded,
+                "dropped": latest["dropped"],
+            })
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        receiver.cancel()
+        print("[RECOGNIZE/WS] stream closed after", tracker.frame, "frames")
+
+
+@router.get("/metrics")
+async def recognize_metrics():
+    """
+    Detection latency per profile, recognition batching and pool load.
+    """
+    return {
+        "profiles": profile_stats(),
+        "ingest": ingest_metrics.stats(),
+        "batching": recognition_batcher.stats(),
+        "pool": inference_pool.stats(),
+        "auto_mark": attendance_writer.stats(),
+        "gallery_sync": gallery_sync.stats(),
+    }
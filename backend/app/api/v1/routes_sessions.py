@@ -1,4 +1,9 @@
-from fastapi import APIRouter, Body, HTTPException
+import os
+import json
+import asyncio
+import time
+import hashlib
+from fastapi import APIRouter, Body, HTTPException, Request, Response
 from datetime import datetime, timedelta, timezone
 
 router = APIRouter()
@@ -6,7 +11,13 @@ router = APIRouter()
 # IST timezone
 IST = timezone(timedelta(hours=5, minutes=30))
 
+from app.db import mongo as mongo_module
 from app.db.models_mongo import SessionModel, AttendanceLog
+from app.services.session_cache import remember_session, get_session
+from app.services.auto_mark import attendance_writer, session_window
+from app.services.rollups import record_marks
+from app.services.events import publish_marks, session_scheduler
+from pymongo.errors import DuplicateKeyError
 
 router = APIRouter()
 
@@ -62,6 +73,16 @@ async def create_session(payload: dict = Body(...)):
     )
 
     await session.insert()
+    remember_session(session)
+    invalidate_sessions_cache()
+    session_scheduler.track(session.id, start_time_utc, end_time_utc, data={
+        "dept": session.dept,
+        "sem": session.sem,
+        "subject": session.subject,
+        "course_name": session.course_name,
+        "start_time": start_time_utc.isoformat(),
+        "end_time": end_time_utc.isoformat(),
+    })
 
     return {
         "success": True,
@@ -71,18 +92,31 @@ async def create_session(payload: dict = Body(...)):
     }
 
 
-from datetime import datetime, timedelta, timezone
+# GET / is polled by every open client; one computed listing is shared
+# by all of them for SESSIONS_CACHE_TTL_S seconds (and dropped on create)
+SESSIONS_CACHE_TTL_S = float(os.getenv("SESSIONS_CACHE_TTL_S", "5"))
+_listing = {"at": 0.0, "body": None, "etag": None}
 
-UTC = timezone.utc
 
-@router.get("/")
-async def list_sessions():
+_listing_lock = asyncio.Lock()
+
+
+def invalidate_sessions_cache():
+    _listing["body"] = None
+
+
+def _stale():
+    return _listing["body"] is None or time.monotonic() - _listing["at"] > SESSIONS_CACHE_TTL_S
+
+
+async def _build_listing():
     now = datetime.now(UTC)
     twelve_hours_ago = now - timedelta(hours=12)
 
     sessions = []
 
-    async for s in SessionModel.find():
+    # 🔹 only sessions ending within the last 12 hours or later (end_time index)
+    async for s in SessionModel.find({"end_time": {"$gte": twelve_hours_ago}}):
         start_time = s.start_time.replace(tzinfo=UTC)
         end_time = s.end_time.replace(tzinfo=UTC)
 
@@ -95,12 +129,8 @@ async def list_sessions():
             status = "LIVE"
 
         # 🔹 EXPIRED (ONLY LAST 12 HOURS)
-        elif twelve_hours_ago <= end_time < now:
-            status = "EXPIRED"
-
-        # ❌ Too old → skip
         else:
-            continue
+            status = "EXPIRED"
 
         sessions.append({
             "id": str(s.id),
@@ -117,35 +147,44 @@ async def list_sessions():
     return sessions
 
 
+@router.get("/")
+async def list_sessions(request: Request):
+    if _stale():
+        async with _listing_lock:
+            # pollers that queued behind the rebuild reuse its result
+            if _stale():
+                body = json.dumps(await _build_listing(), separators=(",", ":")).encode()
+                _listing.update(
+                    at=time.monotonic(),
+                    body=body,
+                    etag='"' + hashlib.sha1(body).hexdigest() + '"',
+                )
+
+    headers = {"ETag": _listing["etag"], "Cache-Control": "no-cache"}
+    # 🔁 unchanged since the client's last poll → empty 304
+    if request.headers.get("if-none-match") == _listing["etag"]:
+        return Response(status_code=304, headers=headers)
+    return Response(_listing["body"], media_type="application/json", headers=headers)
+
+
 
 @router.post("/{session_id}/mark")
 async def mark_attendance(session_id: str, payload: dict):
     print("\n[MARK ATTENDANCE] payload =", payload)
 
-    # 1️⃣ Get session
-    session = await SessionModel.get(session_id)
+    # 1️⃣ Get session (cached after the first lookup)
+    session = await get_session(session_id)
     if not session:
         raise HTTPException(404, "Session not found")
 
     # 2️⃣ TIME — UTC ONLY ✅
     now = datetime.now(timezone.utc)
 
-    start_time = session.start_time
-    end_time = session.end_time
-
-    if start_time.tzinfo is None:
-        start_time = start_time.replace(tzinfo=timezone.utc)
-    if end_time.tzinfo is None:
-        end_time = end_time.replace(tzinfo=timezone.utc)
-
-    print("[TIME][UTC] now:", now)
-    print("[TIME][UTC] start:", start_time)
-    print("[TIME][UTC] end:", end_time)
-
-    if now < start_time:
+    window = session_window(session)
+    if window == "upcoming":
         raise HTTPException(400, "Session not started yet")
 
-    if now > end_time:
+    if window == "expired":
         raise HTTPException(400, "Session expired")
 
     # 3️⃣ Extract payload
@@ -159,13 +198,17 @@ async def mark_attendance(session_id: str, payload: dict):
     if confidence < 0.60:
         raise HTTPException(400, "Low confidence")
 
-    # 4️⃣ Prevent duplicate attendance
-    existing = await AttendanceLog.find_one({
-        "session_id": session_id,
-        "student_id": student_id
-    })
-    if existing:
-        raise HTTPException(400, "Attendance already marked")
+    # 4️⃣ Prevent duplicate attendance: the unique (session_id, student_id)
+    #    index rejects them on insert; a deployment still waiting for the
+    #    dedupe migration has no such index, so check first
+    if not await mongo_module.has_unique_marks():
+        existing = await AttendanceLog.find_one({
+            "session_id": session_id,
+            "student_id": student_id
+        })
+        if existing:
+            attendance_writer.remember(session_id, student_id)
+            raise HTTPException(400, "Attendance already marked")
 
     # 5️⃣ Save attendance (store UTC)
     log = AttendanceLog(
@@ -176,7 +219,14 @@ async def mark_attendance(session_id: str, payload: dict):
         in_time=now,
         date=now.date(),
     )
-    await log.insert()
+    try:
+        await log.insert()
+    except DuplicateKeyError:
+        attendance_writer.remember(session_id, student_id)
+        raise HTTPException(400, "Attendance already marked")
+    attendance_writer.remember(session_id, student_id)
+    await record_marks([log])
+    publish_marks([log])
 
     print("✅ Attendance marked successfully")
 
@@ -3,6 +3,8 @@ from fastapi import APIRouter, Body, HTTPException, UploadFile, File, Form, Quer
 from typing import Optional, List, Dict, Any
 from app.db.models_mongo import Student
 from app.db import mongo as mongo_module   # raw mongo DB (expects app/db/mongo.py exposing `db`)
+from app.services.gallery import gallery
+from app.services.gallery_sync import purge_student_faces
 from datetime import datetime
 # backend: add to backend/app/api/v1/routes_students.py (imports at top)
 from bson import ObjectId
@@ -194,4 +196,7 @@ async def bulk_delete_students(payload: dict = Body(...)):
         raise HTTPException(status_code=400, detail="no valid ObjectId in ids")
 
     res = await db["students"].delete_many({"_id": {"$in": obj_ids}})
+    # their embeddings / templates would otherwise be left orphaned
+    await purge_student_faces(obj_ids)
+    gallery.remove_students(obj_ids)
     return {"deleted_count": int(res.deleted_count)}
@@ -1,6 +1,7 @@
 # backend/app/db/models_mongo.py
 from typing import Optional, List
 from beanie import Document, Indexed
+from pymongo import IndexModel, ASCENDING
 from pydantic import BaseModel, Field
 from datetime import datetime, date
 
@@ -23,14 +24,44 @@ class Student(Document):
     class Settings:
         name = "students"
 
+class EmbeddingFormat(BaseModel):
+    # see app/services/embedding_codec.py; missing = legacy raw float32
+    v: int = 1
+    dtype: str = "float32"  # "float32" | "float16" | "int8"
+    dim: int = 512
+    model: str = "buffalo_s"
+    norm: float = 1.0
+    scale: Optional[float] = None  # int8 only
+
+
 class FaceEmbedding(Document):
     student_id: Optional[str] = None  # store str id (or PydanticObjectId)
-    embedding: bytes  # you store raw bytes (np.tobytes)
+    embedding: bytes  # vector bytes, encoded as described by embedding_format
+    embedding_format: Optional[EmbeddingFormat] = None
     image_url: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
     class Settings:
         name = "face_embeddings"
+        indexes = [
+            IndexModel([("student_id", ASCENDING)], name="student_id"),
+        ]
+
+
+class FaceTemplate(Document):
+    # aggregated per-student template built on finalize_enrollment
+    student_id: str
+    kind: str = "centroid"  # "centroid" | "medoid"
+    embedding: bytes  # unit-length vector, see embedding_format
+    embedding_format: Optional[EmbeddingFormat] = None
+    source_images: int = 0
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "face_templates"
+        indexes = [
+            IndexModel([("student_id", ASCENDING)], name="student_id"),
+        ]
 
 
 class SessionAttendance(BaseModel):
@@ -65,6 +96,16 @@ class SessionModel(Document):
 
     class Settings:
         name = "sessions"  # MongoDB collection name
+        indexes = [
+            # duplicate-session check on create
+            IndexModel(
+                [("dept", ASCENDING), ("sem", ASCENDING),
+                 ("subject", ASCENDING), ("start_time", ASCENDING)],
+                name="dept_sem_subject_start",
+            ),
+            # GET /sessions: everything not expired more than 12h ago
+            IndexModel([("end_time", ASCENDING)], name="end_time"),
+        ]
 
 
 
@@ -82,3 +123,75 @@ class AttendanceLog(Document):
 
     class Settings:
         name = "attendance_logs"
+        indexes = [
+            # one mark per student per session, whoever writes it
+            IndexModel(
+                [("session_id", ASCENDING), ("student_id", ASCENDING)],
+                unique=True,
+                name="session_student_unique",
+            ),
+            # preview / export date ranges
+            IndexModel([("date", ASCENDING)], name="date"),
+            # preview filtered by student (dept / sem / name)
+            IndexModel([("student_id", ASCENDING), ("date", ASCENDING)], name="student_date"),
+        ]
+
+
+class AttendanceDaily(Document):
+    # rollup: one doc per (day, session), kept in step with attendance_logs
+    # by app.services.rollups; _id is "<YYYY-MM-DD>:<session_id>"
+    id: str
+    day: datetime
+    session_id: str
+    dept: Optional[str] = None
+    sem: Optional[str] = None
+    subject: Optional[str] = None
+    course_name: Optional[str] = None
+    students: List[str] = []  # students present (size = headcount)
+
+    class Settings:
+        name = "attendance_daily"
+        indexes = [
+            IndexModel([("day", ASCENDING)], name="day"),
+            IndexModel([("dept", ASCENDING), ("sem", ASCENDING), ("day", ASCENDING)], name="dept_sem_day"),
+            IndexModel([("students", ASCENDING), ("day", ASCENDING)], name="students_day"),
+        ]
+
+
+class AttendancePresence(Document):
+    # rollup: per student per month, bit d-1 set when present on day d;
+    # _id is "<student_id>:<YYYY-MM>"
+    id: str
+    student_id: str
+    month: str
+    days: int = 0
+
+    class Settings:
+        name = "attendance_presence"
+        indexes = [
+            IndexModel([("student_id", ASCENDING), ("month", ASCENDING)], name="student_month"),
+        ]
+
+
+# how long gallery_changes entries are kept; a gallery snapshot older than
+# this can't be brought up to date and is rebuilt from Mongo
+GALLERY_CHANGE_RETENTION_S = 7 * 24 * 3600
+
+
+class GalleryChange(Document):
+    # change log of the recognition gallery (app.services.gallery_snapshot):
+    # one row per student whose embeddings/templates were added or removed
+    student_id: str
+    op: str  # "upsert" | "remove"
+    at: datetime
+    origin: Optional[str] = None  # "<host>:<pid>" of the writing process
+
+    class Settings:
+        name = "gallery_changes"
+        indexes = [
+            IndexModel(
+                [("at", ASCENDING)],
+                expireAfterSeconds=GALLERY_CHANGE_RETENTION_S,
+                name="at_ttl",
+            ),
+        ]
@@ -2,7 +2,16 @@
 import os
 import motor.motor_asyncio
 from beanie import init_beanie
-from app.db.models_mongo import Student, FaceEmbedding, SessionModel , AttendanceLog
+from app.db.models_mongo import (
+    Student,
+    FaceEmbedding,
+    FaceTemplate,
+    SessionModel,
+    AttendanceLog,
+    AttendanceDaily,
+    AttendancePresence,
+    GalleryChange,
+)
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -16,5 +25,167 @@ db = client.get_default_database()
 if db is None:
     db = client["attendance_db"]
 
+UNIQUE_MARK_INDEX = "session_student_unique"
+
+# declared indexes init_db found missing: {collection: [index names]}
+missing_indexes = {}
+# attendance marks are only idempotent across processes with this index
+unique_marks = False
+
+
+async def duplicate_marks():
+    """
+    (session_id, student_id) pairs marked more than once, i.e. rows that
+    raced past the old find_one check and block the unique index.
+    Returns [{session_id, student_id, keep, extra: [_id]}]; the earliest
+    mark of each pair is the one kept.
+    """
+    dupes = db["attendance_logs"].aggregate([
+        {"$sort": {"in_time": 1}},
+        {"$group": {
+            "_id": {"session_id": "$session_id", "student_id": "$student_id"},
+            "ids": {"$push": "$_id"},
+            "n": {"$sum": 1},
+        }},
+        {"$match": {"n": {"$gt": 1}}},
+    ], allowDiskUse=True)
+    return [
+        {**d["_id"], "keep": d["ids"][0], "extra": d["ids"][1:]}
+        async for d in dupes
+    ]
+
+
+async def drop_duplicate_marks(apply: bool = False):
+    """
+    Migration: list the duplicate marks and, with `apply`, delete them and
+    build the unique index. Run explicitly, never at startup:
+
+        cd backend
+        python -m app.db.mongo --dedupe-marks           # dry run
+        python -m app.db.mongo --dedupe-marks --apply
+    """
+    pairs = await duplicate_marks()
+    extra = [i for p in pairs for i in p["extra"]]
+    for p in pairs:
+        print(
+            f"  session {p['session_id']} student {p['student_id']}: "
+            f"keep {p['keep']}, remove {', '.join(map(str, p['extra']))}"
+        )
+    if not apply:
+        print(f"ℹ️ {len(extra)} duplicate attendance marks would be removed (dry run, use --apply)")
+        return 0
+    if extra:
+        await db["attendance_logs"].delete_many({"_id": {"$in": extra}})
+        print(f"🧹 Removed {len(extra)} duplicate attendance marks")
+    await db["attendance_logs"].create_index(
+        [("session_id", 1), ("student_id", 1)], unique=True, name=UNIQUE_MARK_INDEX
+    )
+    print(f"✅ {UNIQUE_MARK_INDEX} built")
+    return len(extra)
+
+
+DOCUMENT_MODELS = [
+    Student,
+    FaceEmbedding,
+    FaceTemplate,
+    SessionModel,
+    AttendanceLog,
+    AttendanceDaily,
+    AttendancePresence,
+    GalleryChange,
+]
+
+
+async def index_report():
+    """
+    Per collection: declared indexes that don't exist, and existing ones
+    with no recorded use since the server started ($indexStats).
+    """
+    report = {}
+    for model in DOCUMENT_MODELS:
+        name = model.Settings.name
+        coll = db[name]
+        existing = await coll.index_information()
+        declared = [im.document["name"] for im in getattr(model.Settings, "indexes", [])]
+
+        usage = {}
+        try:
+            async for st in coll.aggregate([{"$indexStats": {}}]):
+                usage[st["name"]] = int(st["accesses"]["ops"])
+        except Exception:
+            pass  # no clusterMonitor role / unsupported server
+
+        report[name] = {
+            "missing": [n for n in declared if n not in existing],
+            "unused": sorted(n for n, ops in usage.items() if ops == 0 and n != "_id_"),
+            "indexes": sorted(existing),
+        }
+    return report
+
+
+async def has_unique_marks():
+    """
+    True once attendance_logs has UNIQUE_MARK_INDEX. Re-checked while it
+    is missing, so a worker turns ready as soon as the migration built it.
+    """
+    global unique_marks
+    if not unique_marks:
+        unique_marks = UNIQUE_MARK_INDEX in await db["attendance_logs"].index_information()
+        if unique_marks:
+            missing_indexes.pop("attendance_logs", None)
+    return unique_marks
+
+
 async def init_db():
-    await init_beanie(database=db, document_models=[Student, FaceEmbedding, SessionModel,AttendanceLog])
+    global unique_marks
+    declared = AttendanceLog.Settings.indexes
+    blocked = False
+    if UNIQUE_MARK_INDEX not in await db["attendance_logs"].index_information():
+        pairs = await duplicate_marks()
+        if pairs:
+            # never delete attendance at startup: leave the index out and
+            # let an operator run the migration
+            blocked = True
+            print(
+                f"⚠️  attendance_logs: {len(pairs)} students marked twice in a session, "
+                f"{UNIQUE_MARK_INDEX} not built; review and fix with "
+                "`python -m app.db.mongo --dedupe-marks`"
+            )
+            AttendanceLog.Settings.indexes = [
+                im for im in declared if im.document["name"] != UNIQUE_MARK_INDEX
+            ]
+    try:
+        # builds every index declared in the models' Settings
+        await init_beanie(database=db, document_models=DOCUMENT_MODELS)
+    finally:
+        if blocked:
+            AttendanceLog.Settings.indexes = declared
+
+    report = await index_report()
+    missing_indexes.clear()
+    for name, r in report.items():
+        if r["missing"]:
+            missing_indexes[name] = r["missing"]
+            print(f"⚠️  {name}: missing indexes {r['missing']}")
+        if r["unused"]:
+            print(f"📉 {name}: unused since server start {r['unused']}")
+
+    unique_marks = UNIQUE_MARK_INDEX not in missing_indexes.get("attendance_logs", [])
+    if not unique_marks:
+        print(
+            f"❌ attendance_logs: {UNIQUE_MARK_INDEX} missing, marks are checked one by "
+            "one and /health/ready reports not ready until "
+            "`python -m app.db.mongo --dedupe-marks --apply` has built it"
+        )
+
+
+if __name__ == "__main__":
+    import asyncio
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Database maintenance")
+    parser.add_argument("--dedupe-marks", action="store_true", required=True)
+    parser.add_argument("--apply", action="store_true", help="delete (default: only list)")
+    args = parser.parse_args()
+
+    asyncio.run(drop_duplicate_marks(apply=args.apply))
@@ -0,0 +1,263 @@
+# backend/app/services/auto_mark.py
+import os
+import time
+import asyncio
+from datetime import datetime, timezone
+from pymongo.errors import BulkWriteError
+from app.db import mongo as mongo_module
+from app.db.models_mongo import AttendanceLog
+from app.services.rollups import record_marks
+from app.services.events import publish_marks
+
+# same bar as the manual /sessions/{id}/mark endpoint
+AUTO_MARK_MIN_SCORE = float(os.getenv("AUTO_MARK_MIN_SCORE", "0.60"))
+# sightings needed (within AUTO_MARK_WINDOW_S) before a student is marked
+AUTO_MARK_MIN_SIGHTINGS = int(os.getenv("AUTO_MARK_MIN_SIGHTINGS", "1"))
+AUTO_MARK_WINDOW_S = float(os.getenv("AUTO_MARK_WINDOW_S", "10"))
+# new rows are written together after this delay, or at once when this many wait
+AUTO_MARK_FLUSH_MS = float(os.getenv("AUTO_MARK_FLUSH_MS", "250"))
+AUTO_MARK_MAX_BATCH = int(os.getenv("AUTO_MARK_MAX_BATCH", "200"))
+
+DUPLICATE_KEY = 11000
+UTC = timezone.utc
+
+
+def _as_utc(dt):
+    return dt.replace(tzinfo=UTC) if dt.tzinfo is None else dt
+
+
+def session_window(session_doc):
+    """
+    "upcoming" | "live" | "expired" for a raw `sessions` document.
+    """
+    now = datetime.now(UTC)
+    if now < _as_utc(session_doc["start_time"]):
+        return "upcoming"
+    if now > _as_utc(session_doc["end_time"]):
+        return "expired"
+    return "live"
+
+
+class AttendanceWriter:
+    """
+    Marks attendance straight from recognition results.
+
+    Keeps, per session, the set of students already marked (seeded from
+    Mongo on first use) so repeated sightings cost nothing, and writes new
+    AttendanceLog rows in batched insert_many calls. The unique
+    (session_id, student_id) index makes every write idempotent, also
+    across API processes and the manual mark endpoint; while it is missing
+    (duplicate marks waiting for the dedupe migration) each batch is
+    checked against Mongo before it is written.
+    """
+
+    def __init__(
+        self,
+        min_score: float = AUTO_MARK_MIN_SCORE,
+        min_sightings: int = AUTO_MARK_MIN_SIGHTINGS,
+        window_s: float = AUTO_MARK_WINDOW_S,
+        flush_ms: float = AUTO_MARK_FLUSH_MS,
+        max_batch: int = AUTO_MARK_MAX_BATCH,
+    ):
+        self.min_score = min_score
+        self.min_sightings = max(1, min_sightings)
+        self.window_s = window_s
+        self.flush_delay = flush_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self._marked = {}      # session_id -> {student_id}
+        self._ends = {}        # session_id -> end_time; state is dropped after it
+        self._seeding = {}     # session_id -> Future while the set loads
+        self._sightings = {}   # (session_id, student_id) -> [monotonic times]
+        self._pending = []     # AttendanceLog waiting for the next flush
+        self._flush_task = None
+        self._swept = time.monotonic()
+        self.written = 0
+        self.duplicates = 0
+        self.flushes = 0
+
+    async def _marked_set(self, session_id):
+        marked = self._marked.get(session_id)
+        if marked is not None:
+            return marked
+        # one Mongo read per session, shared by concurrent first callers
+        fut = self._seeding.get(session_id)
+        if fut is None:
+            fut = self._seeding[session_id] = asyncio.ensure_future(
+                mongo_module.db["attendance_logs"].distinct(
+                    "student_id", {"session_id": session_id}
+                )
+            )
+        try:
+            existing = await asyncio.shield(fut)
+        finally:
+            self._seeding.pop(session_id, None)
+        return self._marked.setdefault(session_id, set(existing))
+
+    def remember(self, session_id, student_id):
+        """
+        Record a mark written elsewhere (manual endpoint).
+        """
+        marked = self._marked.get(str(session_id))
+        if marked is not None:
+            marked.add(str(student_id))
+
+    def _sighted(self, key):
+        now = time.monotonic()
+        seen = [t for t in self._sightings.get(key, ()) if now - t <= self.window_s]
+        seen.append(now)
+        self._sightings[key] = seen
+        return len(seen) >= self.min_sightings
+
+    def _forget(self, session_id):
+        self._marked.pop(session_id, None)
+        self._ends.pop(session_id, None)
+        for key in [k for k in self._sightings if k[0] == session_id]:
+            del self._sightings[key]
+
+    def _sweep(self):
+        """
+        Drop the state of ended sessions and sightings too old to count.
+        """
+        self._swept = time.monotonic()
+        now = datetime.now(UTC)
+        for session_id in [s for s, end in self._ends.items() if now > end]:
+            self._forget(session_id)
+        cutoff = time.monotonic() - self.window_s
+        for key in [k for k, seen in self._sightings.items() if not seen or seen[-1] < cutoff]:
+            del self._sightings[key]
+
+    async def observe(self, session_doc, matches):
+        """
+        Feed one frame's gallery matches for a session. Returns one status
+        per match: "marked", "already_marked", "pending", "not_live",
+        "not_eligible" (found only outside the session's scope) or None
+        (not recognized / too low).
+        """
+        statuses = [None] * len(matches)
+        session_id = str(session_doc["_id"])
+        window = session_window(session_doc)
+        if window != "live":
+            self._forget(session_id)
+        marked = None
+
+        for i, m in enumerate(matches):
+            if not m["recognized"] or m["score"] < self.min_score:
+                continue
+            if window != "live":
+                statuses[i] = "not_live"
+                continue
+            # a scoped search tags every match; "all" came from the
+            # whole-gallery fallback, i.e. a student not in this session
+            if m.get("scope", "session") != "session":
+                statuses[i] = "not_eligible"
+                continue
+            if marked is None:
+                marked = await self._marked_set(session_id)
+                self._ends[session_id] = _as_utc(session_doc["end_time"])
+
+            student_id = str(m["student_id"])
+            if student_id in marked:
+                statuses[i] = "already_marked"
+                continue
+            if not self._sighted((session_id, student_id)):
+                statuses[i] = "pending"
+                continue
+
+            now = datetime.now(UTC)
+            marked.add(student_id)
+            self._sightings.pop((session_id, student_id), None)
+            self._pending.append(AttendanceLog(
+                session_id=session_id,
+                student_id=student_id,
+                student_name=m.get("name"),
+                confidence=float(m["score"]),
+                in_time=now,
+                date=now.date(),
+            ))
+            statuses[i] = "marked"
+
+        if self._pending:
+            self._schedule()
+        elif time.monotonic() - self._swept > self.window_s:
+            self._sweep()
+        return statuses
+
+    def _schedule(self):
+        if len(self._pending) >= self.max_batch:
+            asyncio.ensure_future(self.flush())
+        elif self._flush_task is None:
+            self._flush_task = asyncio.ensure_future(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        try:
+            await asyncio.sleep(self.flush_delay)
+        finally:
+            self._flush_task = None
+        await self.flush()
+
+    async def _unwritten(self, batch):
+        """
+        The marks of `batch` not in Mongo yet: another worker, or this one
+        before a restart, may have written them.
+        """
+        students = {}
+        for log in batch:
+            students.setdefault(log.session_id, []).append(log.student_id)
+        written = set()
+        for session_id, ids in students.items():
+            found = await mongo_module.db["attendance_logs"].distinct(
+                "student_id", {"session_id": session_id, "student_id": {"$in": ids}}
+            )
+            written.update((session_id, s) for s in found)
+        self.duplicates += len(written)
+        return [log for log in batch if (log.session_id, log.student_id) not in written]
+
+    async def flush(self):
+        batch, self._pending = self._pending, []
+        if not batch:
+            return 0
+        self.flushes += 1
+        inserted = batch
+        try:
+            if not await mongo_module.has_unique_marks():
+                inserted = batch = await self._unwritten(batch)
+                if not batch:
+                    return 0
+            await AttendanceLog.insert_many(batch, ordered=False)
+            self.written += len(batch)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            dupes = sum(1 for err in errors if err.get("code") == DUPLICATE_KEY)
+            self.duplicates += dupes
+            self.written += e.details.get("nInserted", 0)
+            failed = {err["index"] for err in errors}
+            inserted = [log for i, log in enumerate(batch) if i not in failed]
+            for err in errors:
+                if err.get("code") != DUPLICATE_KEY:
+                    # let the next sighting try again
+                    log = batch[err["index"]]
+                    self._marked.get(log.session_id, set()).discard(log.student_id)
+                    print("❌ auto-mark write failed:", err.get("errmsg"))
+        except Exception as e:
+            for log in batch:
+                self._marked.get(log.session_id, set()).discard(log.student_id)
+            print("❌ auto-mark flush failed:", e)
+            return len(batch)
+
+        await record_marks(inserted)
+        publish_marks(inserted)
+        self._sweep()
+        return len(batch)
+
+    def stats(self):
+        return {
+            "sessions": len(self._marked),
+            "sightings": len(self._sightings),
+            "pending": len(self._pending),
+            "written": self.written,
+            "duplicates": self.duplicates,
+            "flushes": self.flushes,
+        }
+
+
+attendance_writer = AttendanceWriter()
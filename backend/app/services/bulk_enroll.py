@@ -0,0 +1,329 @@
+# backend/app/services/bulk_enroll.py
+"""
+Bulk enrollment: many students × many images in one request.
+
+Images are matched to students by roll number, taken from the folder name
+(`1042/front.jpg`) or else the file name prefix (`1042_2.jpg`, `1042.png`).
+Every image is decoded and embedded concurrently through the inference
+pool / recognition batcher, run through the enrollment quality gate
+(app.services.face_quality) and de-duplicated against the student's
+stored images, and each student's accepted images are written with one
+insert_many. Results stream back one JSON line per
+student as they finish.
+
+CLI (posts to a running API, so its gallery picks the students up):
+
+    cd backend
+    python -m app.services.bulk_enroll photos/          # or photos.zip / .tar.gz
+        [--url http://127.0.0.1:8000]
+"""
+import io
+import os
+import re
+import json
+import asyncio
+import tarfile
+import zipfile
+import threading
+from datetime import datetime
+from pathlib import PurePosixPath
+import numpy as np
+from beanie import PydanticObjectId
+from starlette.concurrency import run_in_threadpool
+from app.db import mongo as mongo_module
+from app.db.models_mongo import Student, FaceEmbedding
+from app.services.ingest import decode_image, ImageTooLarge
+from app.services.gallery import gallery
+from app.services.inference_pool import run_inference, inference_pool, InferenceBusy
+from app.services.micro_batch import get_faces_and_embeddings_batched
+from app.services.detection_profiles import get_profile, ENROLL_DETECTION_PROFILE
+from app.services.templates import templates_enabled, save_student_templates
+from app.services.face_quality import best_enrollment_face, duplicate_of
+from app.services.embedding_codec import encode_fields
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+# images in flight at once (default: enough to keep every pool worker busy)
+BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", "0")) or max(2, inference_pool.max_pending // 2)
+BUSY_RETRIES = 20
+
+
+# =========================
+# INPUT
+# =========================
+class ImageEntry:
+    def __init__(self, name, read):
+        self.name = name
+        # () -> bytes, called only when the image is processed, in a
+        # worker thread (it may decompress)
+        self.read = read
+
+    @classmethod
+    def from_upload(cls, upload):
+        """
+        Entry for one uploaded file (fastapi UploadFile).
+        """
+        def read():
+            upload.file.seek(0)
+            return upload.file.read()
+
+        return cls(upload.filename, read)
+
+
+def roll_from_path(path: str):
+    p = PurePosixPath(path.replace("\\", "/"))
+    if len(p.parts) >= 2 and p.parts[-2].isdigit():
+        return int(p.parts[-2])
+    m = re.match(r"(\d+)(?:[_\-\s.(]|$)", p.stem)
+    return int(m.group(1)) if m else None
+
+
+def _is_image(name: str):
+    p = PurePosixPath(name)
+    return (
+        p.suffix.lower() in IMAGE_EXTS
+        and not any(part.startswith((".", "__MACOSX")) for part in p.parts)
+    )
+
+
+def archive_entries(fileobj, filename: str):
+    """
+    ImageEntry per image inside a zip or tar(.gz/.bz2/.xz) archive.
+    Blocking (a compressed tar is decompressed to list it): call it from a
+    worker thread.
+    """
+    if filename.lower().endswith(".zip") or zipfile.is_zipfile(fileobj):
+        fileobj.seek(0)
+        zf = zipfile.ZipFile(fileobj)
+        return [
+            ImageEntry(info.filename, lambda info=info: zf.read(info))
+            for info in zf.infolist()
+            if not info.is_dir() and _is_image(info.filename)
+        ]
+
+    fileobj.seek(0)
+    tf = tarfile.open(fileobj=fileobj, mode="r:*")
+    # members share one (possibly compressed) stream; ZipFile locks its own
+    lock = threading.Lock()
+
+    def read(member):
+        with lock:
+            return tf.extractfile(member).read()
+
+    return [
+        ImageEntry(m.name, lambda m=m: read(m))
+        for m in tf.getmembers()
+        if m.isfile() and _is_image(m.name)
+    ]
+
+
+def group_by_roll(entries):
+    """
+    ({roll_no: [ImageEntry]}, [names without a roll number])
+    """
+    groups, unmatched = {}, []
+    for e in entries:
+        roll = roll_from_path(e.name)
+        if roll is None:
+            unmatched.append(e.name)
+        else:
+            groups.setdefault(roll, []).append(e)
+    return groups, unmatched
+
+
+# =========================
+# PROCESSING
+# =========================
+async def _with_retry(fn, *args):
+    # bulk work yields to live recognition traffic instead of failing
+    for attempt in range(BUSY_RETRIES):
+        try:
+            return await fn(*args)
+        except InferenceBusy:
+            await asyncio.sleep(min(0.05 * 2 ** attempt, 1.0))
+    return await fn(*args)
+
+
+async def _embed_image(entry, limiter, profile):
+    async with limiter:
+        try:
+            data = await run_in_threadpool(entry.read)
+        except Exception:
+            return None, "unreadable file"
+        try:
+            frame = await _with_retry(run_inference, decode_image, data, profile.max_side)
+        except ImageTooLarge:
+            return None, "image too large"
+        if frame is None:
+            return None, "not an image"
+        img = frame.image
+        faces = await _with_retry(get_faces_and_embeddings_batched, img, profile)
+    # same quality gate as the single-image endpoint
+    face, _, reason = best_enrollment_face(img, faces)
+    if reason:
+        return None, reason
+    return np.asarray(face["embedding"], dtype=np.float32), None
+
+
+async def _enroll_student(roll_no, entries, student, limiter, profile):
+    result = {"roll_no": roll_no, "images": len(entries), "accepted": 0, "rejected": []}
+    if student is None:
+        result["status"] = "unknown_roll_no"
+        return result
+    result["student_id"] = str(student.id)
+
+    outcomes = await asyncio.gather(
+        *[_embed_image(e, limiter, profile) for e in entries], return_exceptions=True
+    )
+
+    docs, embs = [], []
+    existing = gallery.student_rows(student.id)
+    now = datetime.utcnow()
+    for entry, outcome in zip(entries, outcomes):
+        if isinstance(outcome, Exception):
+            result["rejected"].append({"file": entry.name, "reason": "face engine failed"})
+            continue
+        emb, reason = outcome
+        if emb is None:
+            result["rejected"].append({"file": entry.name, "reason": reason})
+            continue
+        # near-duplicates of stored images or of ones accepted above
+        kept = np.vstack([existing, *embs]) if embs else existing
+        similarity = duplicate_of(emb, kept)
+        if similarity is not None:
+            result["rejected"].append({
+                "file": entry.name, "reason": f"near-duplicate ({similarity:.3f})",
+            })
+            continue
+        docs.append(FaceEmbedding(
+            id=PydanticObjectId(),
+            student_id=str(student.id),
+            **encode_fields(emb),
+            created_at=now,
+        ))
+        embs.append(emb)
+
+    if not docs:
+        result["status"] = "no_usable_images"
+        return result
+
+    await FaceEmbedding.insert_many(docs)
+    await mongo_module.db["students"].update_one(
+        {"_id": student.id},
+        {"$inc": {"enrolled_images": len(docs)}, "$set": {"enroll_status": "COMPLETED"}},
+    )
+    for doc, emb in zip(docs, embs):
+        gallery.add(doc.id, student, emb)
+
+    if templates_enabled():
+        ids, vectors = await save_student_templates(student, gallery.student_rows(student.id))
+        gallery.set_templates(student, ids, vectors)
+
+    result["accepted"] = len(docs)
+    result["status"] = "enrolled"
+    return result
+
+
+async def bulk_enroll_stream(entries, students_in_flight: int = 8):
+    """
+    Async generator of NDJSON lines: one per student, then a summary.
+    """
+    groups, unmatched = group_by_roll(entries)
+    students = {
+        s.roll_no: s
+        async for s in Student.find({"roll_no": {"$in": list(groups)}})
+    }
+    limiter = asyncio.Semaphore(BULK_CONCURRENCY)
+    profile = get_profile(ENROLL_DETECTION_PROFILE)
+
+    totals = {"students": 0, "enrolled": 0, "images": 0, "accepted": 0}
+    pending = set()
+    queue = list(groups.items())
+
+    def launch():
+        while queue and len(pending) < students_in_flight:
+            roll, ents = queue.pop(0)
+            pending.add(asyncio.ensure_future(
+                _enroll_student(roll, ents, students.get(roll), limiter, profile)
+            ))
+
+    launch()
+    while pending:
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            pending.discard(task)
+            try:
+                result = task.result()
+            except Exception as e:
+                result = {"status": "error", "detail": str(e)}
+            totals["students"] += 1
+            totals["enrolled"] += result.get("status") == "enrolled"
+            totals["images"] += result.get("images", 0)
+            totals["accepted"] += result.get("accepted", 0)
+            yield json.dumps(result) + "\n"
+        launch()
+
+    yield json.dumps({"summary": totals, "unmatched_files": unmatched}) + "\n"
+
+
+# =========================
+# CLI
+# =========================
+def _pack(path):
+    """
+    A directory is zipped into memory; archives are sent as they are.
+    """
+    if os.path.isdir(path):
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as zf:
+            for root, _, names in os.walk(path):
+                for n in names:
+                    full = os.path.join(root, n)
+                    rel = os.path.relpath(full, path)
+                    if _is_image(rel):
+                        zf.write(full, rel)
+        return "enroll.zip", buf.getvalue()
+    with open(path, "rb") as f:
+        return os.path.basename(path), f.read()
+
+
+def main():
+    import argparse
+    import uuid
+    import urllib.request
+
+    parser = argparse.ArgumentParser(description="Bulk-enroll student photos")
+    parser.add_argument("path", help="folder, .zip or .tar(.gz) of <roll_no>/<image> files")
+    parser.add_argument("--url", default=os.getenv("API_URL", "http://127.0.0.1:8000"))
+    args = parser.parse_args()
+
+    filename, payload = _pack(args.path)
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="archive"; filename="{filename}"\r\n'
+        f"Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + payload + f"\r\n--{boundary}--\r\n".encode()
+
+    req = urllib.request.Request(
+        args.url.rstrip("/") + "/api/v1/enroll/bulk",
+        data=body,
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+        method="POST",
+    )
+    with urllib.request.urlopen(req) as resp:
+        for line in resp:
+            r = json.loads(line)
+            if "summary" in r:
+                print(f"✅ {r['summary']}")
+                if r["unmatched_files"]:
+                    print(f"⚠️  no roll number in: {r['unmatched_files']}")
+            else:
+                print(
+                    f"{r.get('roll_no')}: {r.get('status')} "
+                    f"{r.get('accepted', 0)}/{r.get('images', 0)}"
+                    + "".join(f"\n    ✗ {x['file']}: {x['reason']}" for x in r.get("rejected", []))
+                )
+
+
+if __name__ == "__main__":
+    main()
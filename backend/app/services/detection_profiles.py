@@ -0,0 +1,125 @@
+# backend/app/services/detection_profiles.py
+import os
+import time
+from collections import deque
+import numpy as np
+from fastapi import HTTPException
+
+# name -> (det_size, max_side, max_faces)
+#   det_size  : square SCRFD input, the main knob for detection CPU
+#   max_side  : frames are downscaled so their longer side fits (0 = never)
+#   max_faces : keep only the N largest faces (0 = all)
+# override with e.g. DETECTION_PROFILE_KIOSK="256,480,1"
+DEFAULT_PROFILES = {
+    "default": (640, 1280, 0),
+    "kiosk": (320, 640, 1),        # one student right in front of the camera
+    "classroom": (960, 1920, 0),   # wide shot, many small faces
+}
+RECOGNIZE_DETECTION_PROFILE = os.getenv("RECOGNIZE_DETECTION_PROFILE", "default")
+ENROLL_DETECTION_PROFILE = os.getenv("ENROLL_DETECTION_PROFILE", "default")
+# latency samples kept per profile for the percentiles
+LATENCY_WINDOW = 512
+
+
+class DetectionProfile:
+    def __init__(self, name: str, det_size: int, max_side: int = 0, max_faces: int = 0):
+        self.name = name
+        self.det_size = int(det_size)
+        self.max_side = int(max_side)
+        self.max_faces = int(max_faces)
+
+    def downscale(self, image_bgr):
+        """
+        (frame to run detection on, factor to divide its coordinates by)
+        """
+        import cv2
+
+        h, w = image_bgr.shape[:2]
+        if not self.max_side or max(h, w) <= self.max_side:
+            return image_bgr, 1.0
+        scale = self.max_side / float(max(h, w))
+        small = cv2.resize(
+            image_bgr,
+            (max(1, round(w * scale)), max(1, round(h * scale))),
+            interpolation=cv2.INTER_AREA,
+        )
+        return small, scale
+
+    def as_dict(self):
+        return {
+            "det_size": self.det_size,
+            "max_side": self.max_side,
+            "max_faces": self.max_faces,
+        }
+
+
+def _load_profiles():
+    profiles = {}
+    for name, values in DEFAULT_PROFILES.items():
+        env = os.getenv(f"DETECTION_PROFILE_{name.upper()}")
+        if env:
+            values = tuple(int(v) for v in env.split(","))
+        profiles[name] = DetectionProfile(name, *values)
+    return profiles
+
+
+PROFILES = _load_profiles()
+
+
+def get_profile(name=None) -> DetectionProfile:
+    name = (name or "default").lower()
+    profile = PROFILES.get(name)
+    if profile is None:
+        raise HTTPException(
+            400, f"Unknown detection profile {name!r}, expected one of {sorted(PROFILES)}"
+        )
+    return profile
+
+
+# =========================
+# LATENCY METRICS
+# =========================
+class ProfileMetrics:
+    def __init__(self):
+        self.frames = 0
+        self.faces = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def record(self, seconds: float, faces: int):
+        self.frames += 1
+        self.faces += faces
+        self.latencies.append(seconds)
+
+    def stats(self):
+        if not self.latencies:
+            return {"frames": self.frames, "faces": self.faces}
+        ms = np.asarray(self.latencies) * 1000.0
+        return {
+            "frames": self.frames,
+            "faces": self.faces,
+            "avg_ms": round(float(ms.mean()), 2),
+            "p50_ms": round(float(np.percentile(ms, 50)), 2),
+            "p95_ms": round(float(np.percentile(ms, 95)), 2),
+            "max_ms": round(float(ms.max()), 2),
+        }
+
+
+_metrics = {}
+
+
+def record_latency(profile: DetectionProfile, started: float, faces: int):
+    """
+    `started` is a time.perf_counter() taken before detection began.
+    """
+    m = _metrics.get(profile.name)
+    if m is None:
+        m = _metrics[profile.name] = ProfileMetrics()
+    m.record(time.perf_counter() - started, faces)
+
+
+def profile_stats():
+    out = {}
+    for name, profile in PROFILES.items():
+        m = _metrics.get(name) or ProfileMetrics()
+        out[name] = {**profile.as_dict(), **m.stats()}
+    return out
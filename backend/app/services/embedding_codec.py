@@ -0,0 +1,273 @@
+# backend/app/services/embedding_codec.py
+"""
+Storage format of face vectors (face_embeddings / face_templates).
+
+Every stored vector carries an `embedding_format` next to its bytes:
+
+    {"v": 1, "dtype": "float16", "dim": 512, "model": "buffalo_s",
+     "norm": 1.0, "scale": null}
+
+    float32  raw little-endian floats (what rows without a format hold)
+    float16  half the size, cosine error ~1e-4
+    int8     a quarter of the size; value = int8 * scale (symmetric,
+             per vector), renormalized on decode
+
+`norm` is the length of the vector before it was stored, so a decoded
+unit vector can be scaled back if ever needed.
+
+Migrate stored rows / compare accuracy against float32:
+
+    cd backend
+    python -m app.services.embedding_codec --migrate [--dtype int8] [--collection face_templates]
+    python -m app.services.embedding_codec --benchmark [--synthetic 2000]
+"""
+import os
+import asyncio
+import numpy as np
+
+FORMAT_VERSION = 1
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "buffalo_s")
+# dtype new vectors are written with: float32 | float16 | int8
+EMBEDDING_STORE_DTYPE = os.getenv("EMBEDDING_STORE_DTYPE", "float16").lower()
+
+DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+COLLECTIONS = ("face_embeddings", "face_templates")
+MIGRATE_BATCH = 500
+
+
+def _check_dtype(dtype):
+    if dtype not in DTYPES:
+        raise ValueError(f"Unknown embedding dtype: {dtype} (use {', '.join(DTYPES)})")
+    return dtype
+
+
+def encode(vec, dtype: str = None):
+    """
+    (bytes, format dict) for one vector.
+    """
+    dtype = _check_dtype((dtype or EMBEDDING_STORE_DTYPE).lower())
+    v = np.asarray(vec, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(v))
+    unit = v / max(norm, 1e-8)
+
+    scale = None
+    if dtype == "int8":
+        scale = float(np.abs(unit).max()) / 127.0 or 1.0
+        data = np.clip(np.rint(unit / scale), -127, 127).astype(np.int8)
+    else:
+        data = unit.astype(DTYPES[dtype])
+
+    fmt = {
+        "v": FORMAT_VERSION,
+        "dtype": dtype,
+        "dim": int(v.shape[0]),
+        "model": EMBEDDING_MODEL,
+        "norm": round(norm, 6),
+        "scale": scale,
+    }
+    return data.tobytes(), fmt
+
+
+def encode_fields(vec, dtype: str = None):
+    """
+    Keyword arguments for FaceEmbedding / FaceTemplate.
+    """
+    data, fmt = encode(vec, dtype)
+    return {"embedding": data, "embedding_format": fmt}
+
+
+def _dtype(fmt):
+    # rows written before formats existed are raw float32
+    return (fmt or {}).get("dtype", "float32")
+
+
+def decode(data, fmt=None):
+    """
+    float32 vector (unit length unless stored as legacy float32), or None
+    when the bytes don't fit the format.
+    """
+    vecs, kept = decode_many([data], [fmt])
+    return vecs[0] if kept else None
+
+
+def decode_many(blobs, fmts, dim: int = None):
+    """
+    Decode many stored vectors at once: rows of the same dtype are joined
+    and converted with one frombuffer, not one call per row.
+    Returns (M×D float32 matrix, list of row positions that were kept);
+    rows of the wrong size are dropped.
+    """
+    groups = {}
+    for i, fmt in enumerate(fmts):
+        groups.setdefault(_dtype(fmt), []).append(i)
+
+    out_rows, out_pos = [], []
+    for dtype, idx in groups.items():
+        if dtype not in DTYPES:
+            continue
+        np_dtype = DTYPES[dtype]
+        width = np.dtype(np_dtype).itemsize
+        d = dim or max(len(blobs[i]) // width for i in idx)
+        idx = [i for i in idx if len(blobs[i]) == d * width]
+        if not idx:
+            continue
+        m = np.frombuffer(b"".join(blobs[i] for i in idx), dtype=np_dtype).reshape(len(idx), d)
+        if dtype == "int8":
+            scales = np.array([fmts[i].get("scale") or 1.0 for i in idx], dtype=np.float32)
+            m = m.astype(np.float32) * scales[:, None]
+            m /= np.maximum(np.linalg.norm(m, axis=1, keepdims=True), 1e-8)
+        else:
+            m = m.astype(np.float32)
+        out_rows.append(m)
+        out_pos.extend(idx)
+
+    if not out_rows:
+        return np.empty((0, dim or 0), dtype=np.float32), []
+    matrix = np.concatenate(out_rows)
+    order = np.argsort(out_pos, kind="stable")
+    return matrix[order], [out_pos[i] for i in order]
+
+
+# =========================
+# MIGRATION
+# =========================
+async def migrate(collection: str = "face_embeddings", dtype: str = None):
+    """
+    Re-encode every row of `collection` that isn't already in `dtype`.
+    Safe to re-run and to run while the API is up: readers accept every
+    format. Returns (rows rewritten, bytes before, bytes after).
+    """
+    from pymongo import UpdateOne
+    from app.db import mongo as mongo_module
+
+    dtype = _check_dtype((dtype or EMBEDDING_STORE_DTYPE).lower())
+    col = mongo_module.db[collection]
+    # $ne also matches rows without a format
+    query = {"embedding_format.dtype": {"$ne": dtype}}
+
+    ops, done, before, after = [], 0, 0, 0
+    async for d in col.find(query, {"embedding": 1, "embedding_format": 1}):
+        vecs, kept = decode_many([d["embedding"]], [d.get("embedding_format")])
+        if not kept:
+            continue
+        fmt_in = d.get("embedding_format") or {}
+        data, fmt = encode(vecs[0], dtype)
+        # the length before normalization survives re-encoding
+        if fmt_in.get("norm") is not None:
+            fmt["norm"] = fmt_in["norm"]
+        if fmt_in.get("model"):
+            fmt["model"] = fmt_in["model"]
+        before += len(d["embedding"])
+        after += len(data)
+        ops.append(UpdateOne(
+            {"_id": d["_id"]},
+            {"$set": {"embedding": data, "embedding_format": fmt}},
+        ))
+        if len(ops) >= MIGRATE_BATCH:
+            await col.bulk_write(ops, ordered=False)
+            done += len(ops)
+            ops = []
+    if ops:
+        await col.bulk_write(ops, ordered=False)
+        done += len(ops)
+    return done, before, after
+
+
+# =========================
+# BENCHMARK
+# =========================
+def synthetic_gallery(students: int, images: int = 5, dim: int = 512, spread: float = 0.45, seed: int = 0):
+    """
+    Unit vectors clustered per student, about as tight as real enrollments.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((students, dim)).astype(np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    noise = rng.standard_normal((students, images, dim)).astype(np.float32) * spread / np.sqrt(dim)
+    rows = (centers[:, None, :] + noise).reshape(-1, dim)
+    rows /= np.linalg.norm(rows, axis=1, keepdims=True)
+    return rows, np.repeat(np.arange(students), images)
+
+
+def benchmark(embeddings, labels, threshold: float = 0.55):
+    """
+    For each dtype: bytes per vector, reconstruction error, and how often a
+    leave-one-out rank-1 match agrees with the float32 result.
+    """
+    from app.services.face_engine import normalize_rows
+
+    ref = normalize_rows(embeddings)
+    labels = np.asarray(labels)
+
+    def rank1(gallery):
+        scores = ref @ gallery.T
+        np.fill_diagonal(scores, -np.inf)   # leave the query's own row out
+        best = scores.argmax(axis=1)
+        return best, scores[np.arange(len(ref)), best]
+
+    ref_best, ref_scores = rank1(ref)
+    report = {"rows": int(len(ref)), "threshold": threshold, "dtypes": {}}
+    for dtype in DTYPES:
+        encoded = [encode(v, dtype) for v in ref]
+        decoded, _ = decode_many([e[0] for e in encoded], [e[1] for e in encoded])
+        best, scores = rank1(decoded)
+        cos = np.sum(decoded * ref, axis=1)
+        report["dtypes"][dtype] = {
+            "bytes_per_vector": len(encoded[0][0]),
+            "min_self_cosine": round(float(cos.min()), 6),
+            "max_score_delta": round(float(np.abs(scores - ref_scores).max()), 6),
+            "rank1_agreement": round(float(np.mean(best == ref_best)), 6),
+            "rank1_accuracy": round(float(np.mean(labels[best] == labels)), 6),
+            "decision_flips": int(np.sum((scores >= threshold) != (ref_scores >= threshold))),
+        }
+    return report
+
+
+async def _stored_gallery():
+    from app.db import mongo as mongo_module
+
+    blobs, fmts, labels = [], [], []
+    async for d in mongo_module.db["face_embeddings"].find(
+        {}, {"student_id": 1, "embedding": 1, "embedding_format": 1}
+    ):
+        blobs.append(d["embedding"])
+        fmts.append(d.get("embedding_format"))
+        labels.append(d.get("student_id"))
+    vecs, kept = decode_many(blobs, fmts)
+    return vecs, [labels[i] for i in kept]
+
+
+if __name__ == "__main__":
+    import json
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Embedding storage format tools")
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument("--migrate", action="store_true")
+    action.add_argument("--benchmark", action="store_true")
+    parser.add_argument("--dtype", choices=list(DTYPES), default=None)
+    parser.add_argument("--collection", choices=list(COLLECTIONS) + ["all"], default="all")
+    parser.add_argument("--synthetic", type=int, default=0, help="benchmark N fake students instead of Mongo")
+    args = parser.parse_args()
+
+    async def main():
+        if args.benchmark and args.synthetic:
+            vecs, labels = synthetic_gallery(args.synthetic)
+        else:
+            from app.db.mongo import init_db
+
+            await init_db()
+            if args.benchmark:
+                vecs, labels = await _stored_gallery()
+        if args.benchmark:
+            if len(vecs) < 2:
+                print("⚠️ need at least 2 stored embeddings (or use --synthetic N)")
+                return
+            print(json.dumps(benchmark(vecs, labels), indent=2))
+            return
+
+        for col in (COLLECTIONS if args.collection == "all" else [args.collection]):
+            n, before, after = await migrate(col, args.dtype)
+            print(f"✅ {col}: {n} rows re-encoded, {before} → {after} bytes")
+
+    asyncio.run(main())
@@ -0,0 +1,196 @@
+# backend/app/services/events.py
+import os
+import json
+import asyncio
+import itertools
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+# events kept for clients reconnecting with Last-Event-ID
+EVENT_REPLAY = int(os.getenv("EVENT_REPLAY", "512"))
+# a subscriber this far behind is dropped (its client reconnects and replays)
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "256"))
+# the scheduler re-reads sessions this often, to see ones created elsewhere
+SESSION_SCHEDULER_REFRESH_S = float(os.getenv("SESSION_SCHEDULER_REFRESH_S", "60"))
+
+UTC = timezone.utc
+
+
+class Subscriber:
+    def __init__(self, session_id=None):
+        self.session_id = session_id
+        self.queue = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+        self.dropped = False
+
+    def wants(self, event):
+        return self.session_id is None or event["data"].get("session_id") == self.session_id
+
+
+class EventBus:
+    """
+    In-process fan-out: publish() hands each event to every subscriber's
+    queue once, whatever the number of dashboards listening.
+    """
+
+    def __init__(self, replay: int = EVENT_REPLAY):
+        self._ids = itertools.count(1)
+        self._recent = deque(maxlen=replay)
+        self._subscribers = set()
+        self.published = 0
+
+    def publish(self, type: str, data: dict):
+        event = {"id": next(self._ids), "type": type, "data": data}
+        self._recent.append(event)
+        self.published += 1
+        for sub in list(self._subscribers):
+            if not sub.wants(event):
+                continue
+            try:
+                sub.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                sub.dropped = True
+                self._subscribers.discard(sub)
+        return event
+
+    def subscribe(self, session_id=None, last_event_id=None):
+        sub = Subscriber(session_id)
+        if last_event_id is not None:
+            missed = [e for e in self._recent if e["id"] > last_event_id and sub.wants(e)]
+            for event in missed[-EVENT_QUEUE_SIZE:]:
+                sub.queue.put_nowait(event)
+        self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        self._subscribers.discard(sub)
+
+    def stats(self):
+        return {"subscribers": len(self._subscribers), "published": self.published}
+
+
+event_bus = EventBus()
+
+
+def format_sse(event):
+    return (
+        f"id: {event['id']}\n"
+        f"event: {event['type']}\n"
+        f"data: {json.dumps(event['data'], default=str)}\n\n"
+    )
+
+
+def publish_marks(logs):
+    for log in logs:
+        event_bus.publish("attendance.marked", {
+            "session_id": str(log.session_id),
+            "student_id": str(log.student_id),
+            "student_name": log.student_name,
+            "confidence": log.confidence,
+            "in_time": log.in_time.isoformat() if log.in_time else None,
+        })
+
+
+# =========================
+# SESSION STATUS SCHEDULER
+# =========================
+def _as_utc(dt):
+    return dt.replace(tzinfo=UTC) if dt.tzinfo is None else dt
+
+
+def session_status(start_time, end_time, now):
+    if now < start_time:
+        return "UPCOMING"
+    if now <= end_time:
+        return "LIVE"
+    return "EXPIRED"
+
+
+class SessionScheduler:
+    """
+    Publishes `session.status` when a session goes UPCOMING → LIVE →
+    EXPIRED. Sleeps until the nearest start/end time instead of polling,
+    and re-reads the window from Mongo every SESSION_SCHEDULER_REFRESH_S.
+    """
+
+    def __init__(self, bus: EventBus = event_bus):
+        self.bus = bus
+        self._sessions = {}   # id -> (start, end, last published status)
+        self._wake = asyncio.Event()
+        self._task = None
+        self._last_refresh = None
+
+    def track(self, session_id, start_time, end_time, data=None):
+        """
+        Follow a session; publishes `session.created` for new ones.
+        """
+        sid = str(session_id)
+        start, end = _as_utc(start_time), _as_utc(end_time)
+        status = session_status(start, end, datetime.now(UTC))
+        new = sid not in self._sessions
+        self._sessions[sid] = (start, end, status)
+        if new and data is not None:
+            self.bus.publish("session.created", {"session_id": sid, "status": status, **data})
+        self._wake.set()
+
+    async def _refresh(self):
+        from app.db import mongo as mongo_module
+
+        cutoff = datetime.now(UTC) - timedelta(hours=12)
+        seen = set()
+        async for s in mongo_module.db["sessions"].find(
+            {"end_time": {"$gte": cutoff}}, {"start_time": 1, "end_time": 1}
+        ):
+            sid = str(s["_id"])
+            seen.add(sid)
+            if sid not in self._sessions:
+                start, end = _as_utc(s["start_time"]), _as_utc(s["end_time"])
+                self._sessions[sid] = (start, end, session_status(start, end, datetime.now(UTC)))
+        # drop sessions that left the 12h window
+        for sid in list(self._sessions):
+            if sid not in seen and self._sessions[sid][1] < cutoff:
+                del self._sessions[sid]
+        self._last_refresh = asyncio.get_running_loop().time()
+
+    def _tick(self, now):
+        """
+        Publish due transitions; return seconds until the next one.
+        """
+        next_in = SESSION_SCHEDULER_REFRESH_S
+        for sid, (start, end, old) in list(self._sessions.items()):
+            status = session_status(start, end, now)
+            if status != old:
+                self._sessions[sid] = (start, end, status)
+                self.bus.publish("session.status", {
+                    "session_id": sid, "status": status, "previous": old,
+                })
+            for t in (start, end):
+                if t > now:
+                    next_in = min(next_in, (t - now).total_seconds())
+        return max(next_in, 0.05)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                if self._last_refresh is None or loop.time() - self._last_refresh >= SESSION_SCHEDULER_REFRESH_S:
+                    await self._refresh()
+            except Exception as e:
+                print("❌ session scheduler refresh failed:", e)
+            wait = self._tick(datetime.now(UTC))
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self.run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+session_scheduler = SessionScheduler()
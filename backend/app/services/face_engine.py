@@ -60,85 +60,350 @@
 #         }
 
 
-import insightface
+import os
+import time
+import threading
 import numpy as np
 from numpy.linalg import norm
 
+# "local"  -> run InsightFace in this process (default)
+# "server" -> send frames to the multi-process inference server
+#             (python -m app.services.inference_server)
+INFERENCE_MODE = os.getenv("INFERENCE_MODE", "local").lower()
+# ONNX Runtime intra-op threads per model session
+# (0 = cores / INFERENCE_WORKERS, see InferencePool.intra_op_threads)
+ORT_INTRA_OP_THREADS = int(os.getenv("ORT_INTRA_OP_THREADS", "0"))
+
 # 🔒 Global variable (initially empty)
 face_app = None
+_face_app_lock = threading.Lock()
+
+
+def _tune_sessions(app, intra_op_threads):
+    """
+    Re-create every model's ORT session with a fixed intra-op thread count,
+    so several engines on one machine don't all grab every core.
+    """
+    import onnxruntime
+
+    opts = onnxruntime.SessionOptions()
+    opts.intra_op_num_threads = intra_op_threads
+    opts.inter_op_num_threads = 1
+    for model in app.models.values():
+        model.session = onnxruntime.InferenceSession(
+            model.model_file, sess_options=opts, providers=["CPUExecutionProvider"]
+        )
 
 
 def get_face_app():
     """
     Lazy-load InsightFace model.
-    Loads ONLY on first request to reduce startup memory spike.
+    Loads ONLY on first request to reduce startup memory spike
+    (unless WARMUP_ON_STARTUP loads it eagerly, see warmup.py).
     """
     global face_app
-    if face_app is None:
-        face_app = insightface.app.FaceAnalysis(
+    if face_app is not None:
+        return face_app
+    # pool threads / warm-up may all ask at once: load it one time
+    with _face_app_lock:
+        if face_app is not None:
+            return face_app
+        import insightface
+
+        app = insightface.app.FaceAnalysis(
             name="buffalo_s",                 # ✅ smaller model
-            providers=["CPUExecutionProvider"] # ✅ CPU only
+            providers=["CPUExecutionProvider"], # ✅ CPU only
+            allowed_modules=["detection", "recognition"],  # ✅ skip landmark / genderage models
         )
-        face_app.prepare(
+        threads = ORT_INTRA_OP_THREADS
+        if threads <= 0:
+            from app.services.inference_pool import inference_pool
+
+            threads = inference_pool.intra_op_threads()
+        if threads > 0:
+            _tune_sessions(app, threads)
+        app.prepare(
             ctx_id=-1,                        # ✅ CPU (IMPORTANT)
             det_size=(640, 640)
         )
+        face_app = app
     return face_app
 
 
-def get_faces_and_embeddings(image_bgr):
+def warm_up(profiles=(), batch_sizes=(1,)):
+    """
+    Load the model and run it once per detection input size and per
+    recognition batch size, so ONNX Runtime has allocated and planned every
+    shape before real traffic arrives. Returns {step: ms}.
+    """
+    timings = {}
+    t = time.perf_counter()
+    get_face_app()
+    timings["load"] = round((time.perf_counter() - t) * 1000, 1)
+
+    for profile in [None, *profiles]:
+        side = (profile.max_side or profile.det_size) if profile else 640
+        blank = np.zeros((side, side, 3), dtype=np.uint8)   # no faces: detection only
+        t = time.perf_counter()
+        detect_and_align(blank, profile)
+        timings[f"detect:{profile.name if profile else 'native'}"] = round((time.perf_counter() - t) * 1000, 1)
+
+    crops = np.zeros((max(batch_sizes), 112, 112, 3), dtype=np.uint8)
+    for n in sorted(set(batch_sizes)):
+        t = time.perf_counter()
+        embed_crops(list(crops[:n]))
+        timings[f"embed:{n}"] = round((time.perf_counter() - t) * 1000, 1)
+    return timings
+
+
+def detect_and_align(image_bgr, profile=None):
+    """
+    Detection only: every face with its bbox, score, 5 keypoints and the
+    aligned crop the recognition model expects.
+
+    With a DetectionProfile the frame is downscaled and detected at the
+    profile's det_size; boxes and keypoints are mapped back to `image_bgr`,
+    and crops are cut from it. For uploads that is the frame ingest.py
+    decoded, which may itself be 1/2 - 1/8 of the uploaded resolution
+    (never below the profile's max_side).
+    """
+    from insightface.utils import face_align
+
     app = get_face_app()
-    faces = app.get(image_bgr)
+    if profile is None:
+        bboxes, kpss = app.det_model.detect(image_bgr, max_num=0, metric="default")
+    else:
+        small, scale = profile.downscale(image_bgr)
+        bboxes, kpss = app.det_model.detect(
+            small,
+            input_size=(profile.det_size, profile.det_size),
+            max_num=profile.max_faces,
+            metric="default",
+        )
+        if kpss is not None and scale != 1.0:
+            bboxes = bboxes.copy()
+            bboxes[:, :4] /= scale
+            kpss = kpss / scale
+    if kpss is None:
+        return []
+
+    crop_size = app.models["recognition"].input_size[0]
+    faces = []
+    for b, kps in zip(bboxes, kpss):
+        faces.append({
+            "bbox": b[:4].astype(int).tolist(),
+            "det_score": float(b[4]),
+            "kps": kps,
+            "crop": face_align.norm_crop(image_bgr, landmark=kps, image_size=crop_size),
+        })
+    return faces
+
+
+def embed_crops(crops):
+    """
+    Recognition only: one batched ONNX call for any number of aligned
+    crops, returned as unit-length rows.
+    """
+    if not len(crops):
+        return np.empty((0, 512), dtype=np.float32)
+    rec = get_face_app().models["recognition"]
+    return normalize_rows(rec.get_feat(list(crops)))
+
+
+def detect_and_embed(image_bgr, profile=None):
+    """
+    Run detection + recognition in THIS process.
+    """
+    faces = detect_and_align(image_bgr, profile)
+    if not faces:
+        return []
+
+    embs = embed_crops([f["crop"] for f in faces])
 
     results = []
-    for f in faces:
-        emb = f.normed_embedding
-        bbox = f.bbox.astype(int).tolist()
+    for f, emb in zip(faces, embs):
         results.append({
-            "bbox": bbox,
+            "bbox": f["bbox"],
+            "det_score": f["det_score"],
+            "kps": f["kps"],
             "embedding": emb
         })
 
     return results
 
 
+def get_faces_and_embeddings(image_bgr, profile=None):
+    if INFERENCE_MODE == "server":
+        from app.services.inference_server import remote_faces_and_embeddings
+
+        return remote_faces_and_embeddings(image_bgr, profile)
+    return detect_and_embed(image_bgr, profile)
+
+
 def cosine_similarity(a, b):
     return float(np.dot(a, b) / (norm(a) * norm(b) + 1e-8))
 
 
+def normalize_rows(x):
+    """
+    Return x (M×D or D) as float32 rows of unit length.
+    """
+    x = np.asarray(x, dtype=np.float32)
+    if x.ndim == 1:
+        x = x[None, :]
+    n = norm(x, axis=1, keepdims=True)
+    return x / np.maximum(n, 1e-8)
+
+
+# rows of a non-float32 gallery converted per scoring step
+SCORE_CHUNK_ROWS = 16384
+
+
+def score_rows(queries, gallery):
+    """
+    queries (M×D float32) · gallery (N×D)ᵀ as float32 scores.
+    A float16 gallery is widened a chunk at a time, so scoring never holds
+    a full float32 copy of it.
+    """
+    if gallery.dtype == np.float32:
+        return queries @ gallery.T
+    scores = np.empty((queries.shape[0], gallery.shape[0]), dtype=np.float32)
+    for lo in range(0, gallery.shape[0], SCORE_CHUNK_ROWS):
+        chunk = gallery[lo:lo + SCORE_CHUNK_ROWS].astype(np.float32)
+        scores[:, lo:lo + len(chunk)] = queries @ chunk.T
+    return scores
+
+
+def _no_match():
+    return {
+        "recognized": False,
+        "student_id": None,
+        "name": None,
+        "score": 0.0,
+        "candidates": [],
+    }
+
+
+def _top_students(row, student_ids, names, top_k):
+    """
+    Best `top_k` distinct students for one row of scores.
+    A student with several enrolled images only appears once, with their
+    best image score.
+    """
+    n = row.shape[0]
+    window = min(n, top_k * 4)
+    while True:
+        idx = np.argpartition(-row, window - 1)[:window] if window < n else np.arange(n)
+        idx = idx[np.argsort(-row[idx], kind="stable")]
+        seen = {}
+        for i in idx:
+            sid = student_ids[i]
+            if sid not in seen:
+                seen[sid] = i
+                if len(seen) == top_k:
+                    break
+        if len(seen) == top_k or window == n:
+            return [
+                {"student_id": sid, "name": names[i], "score": float(row[i])}
+                for sid, i in seen.items()
+            ]
+        window = min(n, window * 4)
+
+
+def _students_from_rows(scores, rows, student_ids, names, top_k):
+    """
+    Best `top_k` distinct students from candidate rows sorted best first.
+    """
+    seen = {}
+    for score, i in zip(scores, rows):
+        if not np.isfinite(score):
+            break
+        sid = student_ids[i]
+        if sid not in seen:
+            seen[sid] = {"student_id": sid, "name": names[i], "score": float(score)}
+            if len(seen) == top_k:
+                break
+    return list(seen.values())
+
+
+def match_embeddings(query_embs, gallery_embs, student_ids, names, threshold=0.55, top_k=1, index=None):
+    """
+    Batch matcher: every face of a frame (M×512) against the whole
+    gallery (N×512) in a single matrix product.
+
+    Both sides must already be unit length (normed_embedding /
+    normalize_rows), so the dot product IS the cosine similarity.
+    Returns one match dict per query, in the same shape as
+    match_embedding(), plus `candidates`: the best `top_k` students.
+
+    `index` is an optional search backend (see search_index.py) built over
+    gallery_embs; without one, or with an exhaustive one, the whole gallery
+    is scored.
+    """
+    query_embs = np.asarray(query_embs, dtype=np.float32)
+    if query_embs.ndim == 1:
+        query_embs = query_embs[None, :]
+    m = query_embs.shape[0]
+    if m == 0:
+        return []
+    if len(student_ids) == 0:
+        return [_no_match() for _ in range(m)]
+
+    results = []
+    if index is not None and not index.exhaustive:
+        # over-fetch rows so repeated images of one student still leave
+        # top_k distinct students
+        window = 1 if top_k == 1 else top_k * 4
+        row_scores, rows = index.search(query_embs, window)
+        for q in range(m):
+            candidates = _students_from_rows(row_scores[q], rows[q], student_ids, names, top_k)
+            if not candidates:
+                results.append(_no_match())
+                continue
+            best = candidates[0]
+            results.append({
+                "recognized": best["score"] >= threshold,
+                "student_id": best["student_id"],
+                "name": best["name"],
+                "score": best["score"],
+                "candidates": candidates,
+            })
+        return results
+
+    scores = score_rows(query_embs, np.asarray(gallery_embs))   # M×N
+    best = scores.argmax(axis=1)
+    best_scores = scores[np.arange(m), best]
+
+    for q in range(m):
+        i = best[q]
+        score = float(best_scores[q])
+        if top_k > 1:
+            candidates = _top_students(scores[q], student_ids, names, top_k)
+        else:
+            candidates = [{"student_id": student_ids[i], "name": names[i], "score": score}]
+        results.append({
+            "recognized": score >= threshold,
+            "student_id": student_ids[i],
+            "name": names[i],
+            "score": score,
+            "candidates": candidates,
+        })
+    return results
+
+
 def match_embedding(query_emb, enrolled, threshold=0.55):
     """
     Threshold tuned for buffalo_s.
     Always returns best match.
     """
     if not enrolled:
-        return {
-            "recognized": False,
-            "student_id": None,
-            "name": None,
-            "score": 0.0,
-        }
-
-    best_score = -1.0
-    best_student = None
-
-    for e in enrolled:
-        score = cosine_similarity(query_emb, e["embedding"])
-        if score > best_score:
-            best_score = score
-            best_student = e
-
-    if best_score >= threshold:
-        return {
-            "recognized": True,
-            "student_id": best_student["student_id"],
-            "name": best_student["name"],
-            "score": float(best_score),
-        }
-    else:
-        return {
-            "recognized": False,
-            "student_id": best_student["student_id"],
-            "name": best_student["name"],
-            "score": float(best_score),
-        }
\ No newline at end of file
+        return _no_match()
+
+    gallery_embs = normalize_rows([e["embedding"] for e in enrolled])
+    return match_embeddings(
+        normalize_rows(query_emb),
+        gallery_embs,
+        [e["student_id"] for e in enrolled],
+        [e["name"] for e in enrolled],
+        threshold=threshold,
+    )[0]
@@ -0,0 +1,112 @@
+# backend/app/services/face_quality.py
+import os
+import numpy as np
+
+# an enrollment image must pass all of these to be stored
+ENROLL_MIN_DET_SCORE = float(os.getenv("ENROLL_MIN_DET_SCORE", "0.60"))
+ENROLL_MIN_FACE_PX = int(os.getenv("ENROLL_MIN_FACE_PX", "64"))
+# variance of the Laplacian of the face at 112px; lower = blurrier
+ENROLL_MIN_SHARPNESS = float(os.getenv("ENROLL_MIN_SHARPNESS", "30"))
+# |yaw| / |pitch| from the 5 keypoints, as a fraction of the eye distance
+ENROLL_MAX_YAW = float(os.getenv("ENROLL_MAX_YAW", "0.35"))
+ENROLL_MAX_PITCH = float(os.getenv("ENROLL_MAX_PITCH", "0.35"))
+# cosine to one of the student's stored images at or above this = duplicate
+ENROLL_DUPLICATE_CUTOFF = float(os.getenv("ENROLL_DUPLICATE_CUTOFF", "0.92"))
+
+
+def _area(face):
+    x1, y1, x2, y2 = face["bbox"]
+    return max(0, x2 - x1) * max(0, y2 - y1)
+
+
+def largest_face(faces):
+    return max(faces, key=_area) if faces else None
+
+
+def sharpness(image_bgr, bbox):
+    """
+    Variance of the Laplacian over the face box, resized to 112px so the
+    number doesn't depend on how large the face is in the frame.
+    """
+    import cv2
+
+    h, w = image_bgr.shape[:2]
+    x1, y1, x2, y2 = [int(v) for v in bbox]
+    x1, y1 = max(0, x1), max(0, y1)
+    x2, y2 = min(w, x2), min(h, y2)
+    if x2 <= x1 or y2 <= y1:
+        return 0.0
+    gray = cv2.cvtColor(image_bgr[y1:y2, x1:x2], cv2.COLOR_BGR2GRAY)
+    gray = cv2.resize(gray, (112, 112), interpolation=cv2.INTER_AREA)
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+def pose(kps):
+    """
+    Rough (yaw, pitch, roll) from the 5 SCRFD keypoints
+    (left eye, right eye, nose, left mouth, right mouth).
+    yaw / pitch are offsets of the nose relative to the eye distance
+    (0 = frontal), roll is the eye-line angle in degrees.
+    """
+    k = np.asarray(kps, dtype=np.float32).reshape(5, 2)
+    le, re, nose, lm, rm = k
+    eye_mid = (le + re) / 2
+    mouth_mid = (lm + rm) / 2
+    eye_dist = max(float(np.linalg.norm(re - le)), 1e-6)
+
+    yaw = float((nose[0] - eye_mid[0]) / eye_dist)
+    # frontal faces have the nose about halfway between eye line and mouth
+    face_h = max(float(mouth_mid[1] - eye_mid[1]), 1e-6)
+    pitch = float((nose[1] - eye_mid[1]) / face_h - 0.5)
+    roll = float(np.degrees(np.arctan2(re[1] - le[1], re[0] - le[0])))
+    return yaw, pitch, roll
+
+
+def assess(image_bgr, face):
+    """
+    (metrics, reason): reason is None when the face is good enough to
+    enroll, else a short human-readable rejection.
+    """
+    x1, y1, x2, y2 = face["bbox"]
+    metrics = {
+        "det_score": round(float(face.get("det_score", 1.0)), 3),
+        "face_px": int(min(x2 - x1, y2 - y1)),
+        "sharpness": round(sharpness(image_bgr, face["bbox"]), 1),
+    }
+    if face.get("kps") is not None:
+        yaw, pitch, roll = pose(face["kps"])
+        metrics.update(yaw=round(yaw, 3), pitch=round(pitch, 3), roll=round(roll, 1))
+
+    if metrics["det_score"] < ENROLL_MIN_DET_SCORE:
+        return metrics, "low detection score"
+    if metrics["face_px"] < ENROLL_MIN_FACE_PX:
+        return metrics, "face too small"
+    if metrics["sharpness"] < ENROLL_MIN_SHARPNESS:
+        return metrics, "image too blurry"
+    if abs(metrics.get("yaw", 0.0)) > ENROLL_MAX_YAW:
+        return metrics, "face turned sideways"
+    if abs(metrics.get("pitch", 0.0)) > ENROLL_MAX_PITCH:
+        return metrics, "face tilted up or down"
+    return metrics, None
+
+
+def best_enrollment_face(image_bgr, faces):
+    """
+    Largest face of the image and its quality: (face, metrics, reason).
+    """
+    face = largest_face(faces)
+    if face is None:
+        return None, {}, "no face detected"
+    metrics, reason = assess(image_bgr, face)
+    return face, metrics, reason
+
+
+def duplicate_of(embedding, existing, cutoff: float = ENROLL_DUPLICATE_CUTOFF):
+    """
+    Highest cosine between `embedding` and the rows of `existing` (all
+    unit length) when it reaches `cutoff`, else None.
+    """
+    if existing is None or len(existing) == 0:
+        return None
+    best = float(np.max(np.asarray(existing, dtype=np.float32) @ np.asarray(embedding, dtype=np.float32)))
+    return best if best >= cutoff else None
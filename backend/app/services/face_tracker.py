@@ -0,0 +1,161 @@
+# backend/app/services/face_tracker.py
+import os
+import itertools
+import numpy as np
+
+# a detection continues a track when their boxes overlap at least this much
+TRACK_IOU = float(os.getenv("TRACK_IOU", "0.35"))
+# frames a track survives without a detection before it is reported lost
+TRACK_MAX_MISSED = int(os.getenv("TRACK_MAX_MISSED", "10"))
+# a confidently recognized track is still re-embedded every N frames
+TRACK_REFRESH_FRAMES = int(os.getenv("TRACK_REFRESH_FRAMES", "15"))
+# tracks scoring below this keep being re-embedded every frame
+TRACK_CONFIDENT_SCORE = float(os.getenv("TRACK_CONFIDENT_SCORE", "0.65"))
+# a new face this close to a recently missed track's embedding is the same person
+TRACK_REID_SIMILARITY = float(os.getenv("TRACK_REID_SIMILARITY", "0.60"))
+
+
+def iou_matrix(a, b):
+    """
+    Pairwise IoU between boxes a (N×4) and b (M×4), as x1, y1, x2, y2.
+    """
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-6)
+
+
+class Track:
+    def __init__(self, track_id, face, frame):
+        self.id = track_id
+        self.face = face            # latest detection (bbox, det_score, crop, ...)
+        self.bbox = face["bbox"]
+        self.embedding = None
+        self.match = None
+        self.embedded_at = None     # frame of the last embedding
+        self.last_seen = frame
+        self.hits = 1
+
+    @property
+    def student_id(self):
+        if self.match and self.match["recognized"]:
+            return self.match["student_id"]
+        return None
+
+    def as_dict(self):
+        return {
+            "track_id": self.id,
+            "bbox": self.bbox,
+            "match": self.match,
+            "hits": self.hits,
+        }
+
+
+class FaceTracker:
+    """
+    Follows faces across the frames of one stream, so the recognition model
+    and the gallery only run for new tracks, tracks that aren't confidently
+    recognized yet, and (every `refresh_every` frames) everything else.
+
+    Detections are associated to tracks greedily by IoU; a new track whose
+    first embedding is close to a track that just went missing takes over
+    that track instead (e.g. after a quick occlusion or a jump in position).
+    """
+
+    def __init__(
+        self,
+        iou_threshold: float = TRACK_IOU,
+        max_missed: int = TRACK_MAX_MISSED,
+        refresh_every: int = TRACK_REFRESH_FRAMES,
+        confident_score: float = TRACK_CONFIDENT_SCORE,
+        reid_similarity: float = TRACK_REID_SIMILARITY,
+    ):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.refresh_every = refresh_every
+        self.confident_score = confident_score
+        self.reid_similarity = reid_similarity
+        self.tracks = {}
+        self.frame = 0
+        self._ids = itertools.count(1)
+
+    def update(self, faces):
+        """
+        Feed one frame's detections. Returns (visible tracks in detection
+        order, tracks lost this frame).
+        """
+        self.frame += 1
+        live = list(self.tracks.values())
+        visible = [None] * len(faces)
+
+        if live and faces:
+            ious = iou_matrix([t.bbox for t in live], [f["bbox"] for f in faces])
+            # greedy: best overlapping pairs first
+            for flat in np.argsort(-ious, axis=None):
+                ti, fi = np.unravel_index(flat, ious.shape)
+                if ious[ti, fi] < self.iou_threshold:
+                    break
+                track = live[ti]
+                if visible[fi] is not None or track.last_seen == self.frame:
+                    continue
+                track.face = faces[fi]
+                track.bbox = faces[fi]["bbox"]
+                track.last_seen = self.frame
+                track.hits += 1
+                visible[fi] = track
+
+        for fi, face in enumerate(faces):
+            if visible[fi] is None:
+                track = Track(next(self._ids), face, self.frame)
+                self.tracks[track.id] = track
+                visible[fi] = track
+
+        lost = [
+            t for t in self.tracks.values()
+            if self.frame - t.last_seen > self.max_missed
+        ]
+        for t in lost:
+            del self.tracks[t.id]
+        return visible, lost
+
+    def needs_embedding(self, track: Track):
+        if track.embedding is None or track.match is None:
+            return True
+        if not track.match["recognized"] or track.match["score"] < self.confident_score:
+            return True
+        return self.frame - track.embedded_at >= self.refresh_every
+
+    def identify(self, track: Track, embedding, match):
+        """
+        Attach a fresh embedding + gallery match to `track`. Returns the
+        track that now owns the face (an earlier, missing track on re-id)
+        and whether its recognized student changed.
+        """
+        if track.embedding is None:
+            missing = [
+                t for t in self.tracks.values()
+                if t.last_seen < self.frame and t.embedding is not None
+            ]
+            if missing:
+                sims = np.stack([t.embedding for t in missing]) @ embedding
+                best = int(sims.argmax())
+                if sims[best] >= self.reid_similarity:
+                    old = missing[best]
+                    del self.tracks[track.id]
+                    old.face = track.face
+                    old.bbox = track.bbox
+                    old.last_seen = self.frame
+                    old.hits += 1
+                    track = old
+
+        before = track.student_id
+        track.embedding = np.asarray(embedding, dtype=np.float32)
+        track.match = match
+        track.embedded_at = self.frame
+        return track, track.student_id is not None and track.student_id != before
@@ -0,0 +1,709 @@
+# backend/app/services/gallery.py
+import os
+import asyncio
+import threading
+from datetime import datetime
+from collections import OrderedDict
+import numpy as np
+from app.db import mongo as mongo_module
+from app.services.face_engine import match_embeddings, normalize_rows
+from app.services.search_index import make_backend
+from app.services.embedding_codec import decode_many, EMBEDDING_MODEL
+from app.services.gallery_snapshot import (
+    GALLERY_SNAPSHOT_PATH,
+    GALLERY_SNAPSHOT_DELAY_S,
+    ChangeLog,
+    write_snapshot,
+    read_snapshot,
+    changed_students,
+    replayable,
+)
+from app.services.templates import (
+    TEMPLATE_MARGIN,
+    TEMPLATE_SHORTLIST,
+    templates_enabled,
+)
+
+EMBEDDING_DIM = 512
+# dtype of the in-memory matrix: float16 halves resident memory, scores are
+# still computed in float32 (chunk by chunk, see face_engine.score_rows)
+GALLERY_DTYPE = np.dtype(os.getenv("GALLERY_DTYPE", "float32").lower())
+
+# student fields that must equal the session's for a student to be in the
+# session's candidate gallery
+SESSION_SCOPE_FIELDS = [
+    f.strip()
+    for f in os.getenv("SESSION_SCOPE_FIELDS", "dept,sem,course_name").split(",")
+    if f.strip()
+]
+# faces not recognized inside the session's gallery are retried against
+# everyone (reported with scope="all")
+SESSION_SCOPE_FALLBACK = os.getenv("SESSION_SCOPE_FALLBACK", "true").lower() == "true"
+MAX_CACHED_SCOPES = 64
+
+STUDENT_META_FIELDS = ("name", "dept", "sem", "course_name")
+
+
+def _norm(v):
+    return "" if v is None else str(v).strip().casefold()
+
+
+def session_scope(session_doc):
+    """
+    Hashable key describing which students may attend a session.
+    Sessions of the same class share one key (and one cached sub-gallery).
+    """
+    if not session_doc or not SESSION_SCOPE_FIELDS:
+        return None
+    return tuple((f, _norm(session_doc.get(f))) for f in SESSION_SCOPE_FIELDS)
+
+
+class GallerySnapshot:
+    """
+    Immutable view of the gallery at one version.
+    Row i of `embeddings` belongs to embedding_ids[i] / student_ids[i] / names[i].
+
+    `parent` / `origin` tie it to an earlier snapshot of the same gallery:
+    row j came from row origin[j] of the parent (-1 for rows added since),
+    so its index can be derived from the parent's instead of rebuilt.
+    """
+
+    def __init__(
+        self, version, embeddings, embedding_ids, student_ids, names, backend=None,
+        parent=None, origin=None,
+    ):
+        self.version = version
+        self.embeddings = embeddings
+        self.embedding_ids = embedding_ids
+        self.student_ids = student_ids
+        self.names = names
+        self.backend = backend
+        self._index = None
+        self._index_lock = threading.Lock()
+        self._lineage = None
+        # skip parents nobody matched against: their index was never built
+        while backend is not None and parent is not None and origin is not None:
+            if parent._index is not None:
+                self._lineage = (parent, origin)
+                break
+            lineage = parent._lineage
+            if lineage is None:
+                break
+            parent, up = lineage
+            origin = np.where(origin >= 0, up[np.maximum(origin, 0)], -1)
+
+    def __len__(self):
+        return len(self.student_ids)
+
+    def subset(self, mask):
+        return GallerySnapshot(
+            self.version,
+            self.embeddings[mask],
+            self.embedding_ids[mask],
+            self.student_ids[mask],
+            self.names[mask],
+        )
+
+    @property
+    def index(self):
+        """
+        Search index for this snapshot, built on first use.
+        None means plain brute force (subsets, no backend configured).
+        Concurrent first matches wait for one build instead of each
+        building (and discarding) their own.
+        """
+        if self._index is None and self.backend is not None and len(self):
+            with self._index_lock:
+                if self._index is None:
+                    if self._lineage is not None:
+                        parent, origin = self._lineage
+                        self._index = self.backend.update(
+                            parent._index, self.embeddings, self.embedding_ids, origin
+                        )
+                    else:
+                        self._index = self.backend.build(self.embeddings, self.embedding_ids)
+                    self._lineage = None
+        return self._index
+
+    def match(self, query_embs, threshold=0.55, top_k=1):
+        """
+        Match every face of a frame against this snapshot in one BLAS call
+        (or through the configured ANN backend).
+        """
+        return match_embeddings(
+            normalize_rows(query_embs),
+            self.embeddings,
+            self.student_ids,
+            self.names,
+            threshold=threshold,
+            top_k=top_k,
+            index=self.index,
+        )
+
+
+class GalleryIndex:
+    """
+    Process-resident matrix of face vectors read from one Mongo collection
+    (raw enrollment images or aggregated templates).
+
+    Built once at startup from Mongo, then kept up to date by the enroll /
+    student routes so recognition never touches the database.
+    Rows live in a contiguous, pre-normalized GALLERY_DTYPE matrix (so a
+    match is a plain dot product) that grows by doubling; readers always
+    work on a snapshot, so appends and removals never disturb a match that
+    is already running in another thread.
+    """
+
+    def __init__(self, collection: str = "face_embeddings", dim: int = EMBEDDING_DIM, backend=None):
+        self.collection = collection
+        self.dim = dim
+        self.backend = backend
+        self.ready = False
+        self.version = 0
+        self._lock = threading.Lock()
+        self._matrix = np.empty((0, dim), dtype=GALLERY_DTYPE)
+        self._size = 0
+        self._embedding_ids = []
+        self._student_ids = []
+        self._names = []
+        self._snapshot = None
+        # lineage of the rows since the last snapshot: the first `_carried`
+        # rows are its rows unchanged, unless removals produced `_origin`
+        # (that snapshot's row per current row, -1 for added rows);
+        # None after a wholesale replace
+        self._carried = 0
+        self._origin = None
+
+    def __len__(self):
+        return self._size
+
+    # ---------- reads ----------
+    def snapshot(self) -> GallerySnapshot:
+        snap = self._snapshot
+        if snap is not None and snap.version == self.version:
+            return snap
+        with self._lock:
+            if self._snapshot is None or self._snapshot.version != self.version:
+                n = self._size
+                self._snapshot = GallerySnapshot(
+                    self.version,
+                    self._matrix[:n],
+                    np.array(self._embedding_ids, dtype=object),
+                    np.array(self._student_ids, dtype=object),
+                    np.array(self._names, dtype=object),
+                    self.backend,
+                    parent=self._snapshot,
+                    origin=self._origin_array(),
+                )
+                self._carried, self._origin = n, None
+            return self._snapshot
+
+    # ---------- writes ----------
+    def _origin_array(self):
+        if self._carried is None:
+            return None
+        origin = np.arange(self._carried) if self._origin is None else self._origin
+        added = np.full(self._size - len(origin), -1, dtype=np.int64)
+        return np.concatenate([origin, added])
+
+    def _reserve(self, extra: int):
+        needed = self._size + extra
+        if needed <= self._matrix.shape[0]:
+            return
+        capacity = max(needed, 2 * self._matrix.shape[0], 64)
+        grown = np.empty((capacity, self.dim), dtype=GALLERY_DTYPE)
+        grown[: self._size] = self._matrix[: self._size]
+        self._matrix = grown
+
+    def add_many(self, embedding_ids, student_ids, names, embeddings):
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dim)
+        if not len(embeddings):
+            return
+        embeddings = normalize_rows(embeddings)
+        with self._lock:
+            self._reserve(len(embeddings))
+            # rows past _size are invisible to existing snapshots, so
+            # writing them in place is safe
+            self._matrix[self._size: self._size + len(embeddings)] = embeddings
+            self._size += len(embeddings)
+            self._embedding_ids.extend(str(e) for e in embedding_ids)
+            self._student_ids.extend(str(s) for s in student_ids)
+            self._names.extend(names)
+            self.version += 1
+
+    def add(self, embedding_id, student_id, name, embedding):
+        self.add_many([embedding_id], [student_id], [name], [embedding])
+
+    def remove_students(self, student_ids):
+        drop = {str(s) for s in student_ids}
+        with self._lock:
+            keep = [i for i, s in enumerate(self._student_ids) if s not in drop]
+            if len(keep) == self._size:
+                return 0
+            removed = self._size - len(keep)
+            # fresh buffer: old snapshots keep pointing at the old one
+            matrix = np.empty((max(len(keep), 64), self.dim), dtype=GALLERY_DTYPE)
+            matrix[: len(keep)] = self._matrix[keep]
+            self._matrix = matrix
+            origin = self._origin_array()
+            self._origin = None if origin is None else origin[keep]
+            self._size = len(keep)
+            self._embedding_ids = [self._embedding_ids[i] for i in keep]
+            self._student_ids = [self._student_ids[i] for i in keep]
+            self._names = [self._names[i] for i in keep]
+            self.version += 1
+            return removed
+
+    def remove_student(self, student_id):
+        return self.remove_students([student_id])
+
+    def replace_all(self, embedding_ids, student_ids, names, embeddings):
+        """
+        Swap in a whole new gallery at once (readers never see it empty).
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dim)
+        matrix = normalize_rows(embeddings) if len(embeddings) else embeddings
+        with self._lock:
+            self._matrix = np.ascontiguousarray(matrix, dtype=GALLERY_DTYPE)
+            self._size = len(matrix)
+            self._embedding_ids = [str(e) for e in embedding_ids]
+            self._student_ids = [str(s) for s in student_ids]
+            self._names = list(names)
+            self._carried = self._origin = None
+            self.version += 1
+
+    def clear(self):
+        self.replace_all([], [], [], [])
+
+    def adopt(self, matrix, embedding_ids, student_ids, names):
+        """
+        Take over an already-normalized matrix as is (e.g. a read-only
+        memmap of the snapshot file). Its capacity is exactly its size, so
+        the first add copies it into private memory instead of writing
+        into the mapping.
+        """
+        with self._lock:
+            self._matrix = matrix
+            self._size = len(matrix)
+            self._embedding_ids = [str(e) for e in embedding_ids]
+            self._student_ids = [str(s) for s in student_ids]
+            self._names = list(names)
+            self._carried = self._origin = None
+            self.version += 1
+        self.ready = True
+
+    # ---------- Mongo sync ----------
+    async def _student_names(self, query=None):
+        db = mongo_module.db
+        names = {}
+        async for d in db["students"].find(query or {}, {"name": 1}):
+            names[str(d["_id"])] = d.get("name")
+        return names
+
+    async def _load_rows(self, names, query=None):
+        db = mongo_module.db
+        ids, sids, blobs, fmts = [], [], [], []
+        cursor = db[self.collection].find(
+            query or {}, {"student_id": 1, "embedding": 1, "embedding_format": 1}
+        )
+        async for d in cursor:
+            sid = d.get("student_id")
+            if sid not in names:
+                continue  # orphaned embedding
+            fmt = d.get("embedding_format")
+            if fmt and fmt.get("model", EMBEDDING_MODEL) != EMBEDDING_MODEL:
+                continue  # written by another recognition model, not comparable
+            ids.append(d["_id"])
+            sids.append(sid)
+            blobs.append(d["embedding"])
+            fmts.append(fmt)
+
+        # one vectorized decode for the whole cursor; wrong-sized rows are dropped
+        rows, kept = decode_many(blobs, fmts, dim=self.dim)
+        ids = [ids[i] for i in kept]
+        sids = [sids[i] for i in kept]
+        return ids, sids, [names[s] for s in sids], rows
+
+    async def load(self, names=None):
+        """
+        Full (re)build from Mongo: one query for student names, one cursor
+        over the collection.
+        """
+        if names is None:
+            names = await self._student_names()
+        ids, sids, nms, rows = await self._load_rows(names)
+        self.replace_all(ids, sids, nms, rows)
+        self.ready = True
+        return len(self)
+
+    async def refresh_student(self, student):
+        """
+        Replace one student's rows with what is currently stored in Mongo.
+        """
+        sid = str(student.id)
+        ids, sids, nms, rows = await self._load_rows(
+            {sid: student.name}, {"student_id": sid}
+        )
+        self.replace_student(sid, ids, [student.name] * len(ids), rows)
+        return len(rows)
+
+    def replace_student(self, student_id, embedding_ids, names, embeddings):
+        self.remove_student(student_id)
+        self.add_many(embedding_ids, [student_id] * len(embedding_ids), names, embeddings)
+
+    async def reload_students(self, names, student_ids):
+        """
+        Replace the rows of `student_ids` with what Mongo holds now; students
+        missing from `names` end up with no rows.
+        """
+        student_ids = [str(s) for s in student_ids]
+        ids, sids, nms, rows = await self._load_rows(
+            names, {"student_id": {"$in": student_ids}}
+        )
+        self.remove_students(student_ids)
+        self.add_many(ids, sids, nms, rows)
+        return len(ids)
+
+
+class FaceGallery:
+    """
+    Everything recognition matches against: the raw enrollment images plus
+    the per-student templates built on finalize_enrollment.
+
+    With templates enabled the first pass searches one or a few template
+    rows per student (and the raw rows of students that have no templates
+    yet). Only faces whose best score lands within TEMPLATE_MARGIN of the
+    threshold are re-scored against the raw images of the shortlisted
+    students.
+    """
+
+    def __init__(self):
+        self.raw = GalleryIndex("face_embeddings", backend=make_backend())
+        self.templates = GalleryIndex("face_templates")
+        self._search_backend = make_backend()
+        self._search = None
+        self._search_key = None
+        # student_id -> {name, dept, sem, course_name}, for session scoping
+        self.students = {}
+        self._scoped = OrderedDict()
+        # match() runs on inference pool threads; guards the derived caches
+        self._cache_lock = threading.RLock()
+        # on-disk snapshot + change log (see gallery_snapshot.py)
+        self.changes = ChangeLog()
+        self.loaded_from = None
+        self._since = None       # changes up to here are in the gallery
+        self._snapshot_task = None
+        self.snapshot_writes = 0
+
+    def __len__(self):
+        return len(self.raw)
+
+    @property
+    def ready(self):
+        return self.raw.ready
+
+    async def _student_meta(self, query=None):
+        projection = {f: 1 for f in STUDENT_META_FIELDS}
+        students = {}
+        async for d in mongo_module.db["students"].find(query or {}, projection):
+            students[str(d["_id"])] = {f: d.get(f) for f in STUDENT_META_FIELDS}
+        return students
+
+    async def load(self):
+        """
+        Start from the on-disk snapshot when there is a usable one (plus
+        replay of the change log), else read everything from Mongo.
+        """
+        if GALLERY_SNAPSHOT_PATH and await self._load_snapshot():
+            self.loaded_from = "snapshot"
+            return len(self.raw)
+
+        # changes logged while we read are replayed from the next snapshot
+        since = datetime.utcnow()
+        students = await self._student_meta()
+        names = {sid: m["name"] for sid, m in students.items()}
+
+        await self.raw.load(names)
+        await self.templates.load(names)
+        self.students = students
+        self._since = since
+        self.loaded_from = "mongo"
+        self.schedule_snapshot()
+        return len(self.raw)
+
+    async def _load_snapshot(self):
+        loop = asyncio.get_running_loop()
+        snap = await loop.run_in_executor(None, read_snapshot, GALLERY_SNAPSHOT_PATH)
+        if snap is None:
+            return False
+        header, indexes, students = snap
+        if (
+            header.get("model") != EMBEDDING_MODEL
+            or header.get("dim") != self.raw.dim
+            or np.dtype(header.get("dtype")) != GALLERY_DTYPE
+            or not replayable(header)
+        ):
+            print("⚠️ gallery snapshot is stale or from another config, loading from Mongo")
+            return False
+
+        for index, name in ((self.raw, "raw"), (self.templates, "templates")):
+            matrix, eids, sids = indexes[name]
+            index.adopt(matrix, eids, sids, [students.get(s, {}).get("name") for s in sids])
+        self.students = students
+
+        # everything logged after the snapshot was taken
+        since = datetime.utcnow()
+        touched = await changed_students(datetime.fromisoformat(header["since"]))
+        if touched:
+            await self.reload_students(touched)
+            self.schedule_snapshot()
+        self._since = since
+        print(f"🗂️ Gallery snapshot mapped, {len(touched)} changed students replayed")
+        return True
+
+    async def reload_students(self, student_ids):
+        """
+        Bring the given students (rows, templates, metadata) in line with
+        Mongo; deleted students are dropped.
+        """
+        from bson import ObjectId
+
+        student_ids = [str(s) for s in student_ids]
+        oids = [ObjectId(s) for s in student_ids if ObjectId.is_valid(s)]
+        students = await self._student_meta({"_id": {"$in": oids}})
+        names = {sid: m["name"] for sid, m in students.items()}
+
+        for sid in student_ids:
+            if sid in students:
+                self.students[sid] = students[sid]
+            else:
+                self.students.pop(sid, None)
+        await self.raw.reload_students(names, student_ids)
+        await self.templates.reload_students(names, student_ids)
+
+    # ---------- snapshot ----------
+    def schedule_snapshot(self):
+        """
+        Rewrite the snapshot file GALLERY_SNAPSHOT_DELAY_S after the last
+        burst of writes.
+        """
+        if not GALLERY_SNAPSHOT_PATH or self._snapshot_task is not None:
+            return
+        try:
+            self._snapshot_task = asyncio.ensure_future(self._delayed_snapshot())
+        except RuntimeError:
+            pass  # no event loop (scripts)
+
+    async def _delayed_snapshot(self):
+        try:
+            await asyncio.sleep(GALLERY_SNAPSHOT_DELAY_S)
+        finally:
+            self._snapshot_task = None
+        await self.save_snapshot()
+
+    async def save_snapshot(self):
+        if not GALLERY_SNAPSHOT_PATH or self._since is None:
+            return False
+        raw, tpl = self.raw.snapshot(), self.templates.snapshot()
+        meta = {
+            "model": EMBEDDING_MODEL,
+            "dim": self.raw.dim,
+            "dtype": GALLERY_DTYPE.name,
+            "since": self._since.isoformat(),
+            "written_at": datetime.utcnow().isoformat(),
+        }
+        indexes = {
+            "raw": (raw.embeddings, raw.embedding_ids, raw.student_ids),
+            "templates": (tpl.embeddings, tpl.embedding_ids, tpl.student_ids),
+        }
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                None, write_snapshot, GALLERY_SNAPSHOT_PATH, meta, indexes, dict(self.students)
+            )
+            self.snapshot_writes += 1
+            return True
+        except Exception as e:
+            print("❌ gallery snapshot write failed:", e)
+            return False
+
+    async def flush_snapshot(self):
+        """
+        Write a pending snapshot now (shutdown).
+        """
+        if self._snapshot_task is not None:
+            self._snapshot_task.cancel()
+            self._snapshot_task = None
+            await self.save_snapshot()
+
+    def synced_since(self):
+        return self._since
+
+    def mark_synced(self, at):
+        """
+        Changes logged up to `at` are applied (gallery_sync); later
+        snapshots replay from there.
+        """
+        if at is not None and (self._since is None or at > self._since):
+            self._since = at
+
+    def _changed(self, op, student_ids):
+        self.changes.record(op, student_ids)
+        self.schedule_snapshot()
+
+    def remember_student(self, student):
+        self.students[str(student.id)] = {
+            f: getattr(student, f, None) for f in STUDENT_META_FIELDS
+        }
+
+    # ---------- writes ----------
+    def add(self, embedding_id, student, embedding):
+        self.remember_student(student)
+        self.raw.add(embedding_id, student.id, student.name, embedding)
+        self._changed("upsert", [student.id])
+
+    def remove_students(self, student_ids):
+        student_ids = [str(s) for s in student_ids]
+        for sid in student_ids:
+            self.students.pop(sid, None)
+        self.templates.remove_students(student_ids)
+        self._changed("remove", student_ids)
+        return self.raw.remove_students(student_ids)
+
+    def remove_student(self, student_id):
+        return self.remove_students([student_id])
+
+    async def refresh_student(self, student):
+        self.remember_student(student)
+        self._changed("upsert", [student.id])
+        return await self.raw.refresh_student(student)
+
+    def set_templates(self, student, template_ids, templates):
+        sid = str(student.id)
+        self.templates.replace_student(
+            sid, template_ids, [student.name] * len(template_ids), templates
+        )
+        self._changed("upsert", [sid])
+
+    def student_rows(self, student_id):
+        snap = self.raw.snapshot()
+        return snap.embeddings[snap.student_ids == str(student_id)]
+
+    # ---------- reads ----------
+    def snapshot(self) -> GallerySnapshot:
+        return self.raw.snapshot()
+
+    def search_snapshot(self) -> GallerySnapshot:
+        """
+        First-pass search space: templates + raw rows of untemplated students.
+        Rebuilt only when either index changes.
+        """
+        raw = self.raw.snapshot()
+        tpl = self.templates.snapshot()
+        if not templates_enabled() or not len(tpl):
+            return raw
+
+        key = (raw.version, tpl.version)
+        with self._cache_lock:
+            return self._build_search(raw, tpl, key)
+
+    def _build_search(self, raw, tpl, key):
+        if self._search_key != key:
+            untemplated = ~np.isin(raw.student_ids, np.unique(tpl.student_ids))
+            extra = raw.subset(untemplated)
+            self._search = GallerySnapshot(
+                key,
+                np.concatenate([tpl.embeddings, extra.embeddings]),
+                np.concatenate([tpl.embedding_ids, extra.embedding_ids]),
+                np.concatenate([tpl.student_ids, extra.student_ids]),
+                np.concatenate([tpl.names, extra.names]),
+                self._search_backend,
+            )
+            self._search_key = key
+        return self._search
+
+    def scoped(self, scope):
+        """
+        (search, raw) snapshots restricted to the students eligible for
+        `scope`. Cached per scope until either index changes.
+        """
+        search = self.search_snapshot()
+        raw = self.raw.snapshot()
+        key = (search.version, raw.version)
+        with self._cache_lock:
+            return self._build_scoped(scope, search, raw, key)
+
+    def _build_scoped(self, scope, search, raw, key):
+        hit = self._scoped.get(scope)
+        if hit is not None and hit[0] == key:
+            self._scoped.move_to_end(scope)
+            return hit[1], hit[2]
+
+        wanted = dict(scope)
+        eligible = np.array(
+            [
+                sid for sid, meta in list(self.students.items())
+                if all(_norm(meta.get(f)) == v for f, v in wanted.items())
+            ],
+            dtype=object,
+        )
+        raw_sub = raw.subset(np.isin(raw.student_ids, eligible))
+        search_sub = raw_sub if search is raw else search.subset(
+            np.isin(search.student_ids, eligible)
+        )
+
+        self._scoped[scope] = (key, search_sub, raw_sub)
+        self._scoped.move_to_end(scope)
+        while len(self._scoped) > MAX_CACHED_SCOPES:
+            self._scoped.popitem(last=False)
+        return search_sub, raw_sub
+
+    def _match_in(self, search, raw, queries, threshold, top_k):
+        if search is raw:
+            return raw.match(queries, threshold=threshold, top_k=top_k)
+
+        shortlist = max(top_k, TEMPLATE_SHORTLIST)
+        matches = search.match(queries, threshold=threshold, top_k=shortlist)
+
+        for q, m in enumerate(matches):
+            if abs(m["score"] - threshold) <= TEMPLATE_MARGIN and m["candidates"]:
+                # near the decision boundary: settle it on the raw images
+                cand = [c["student_id"] for c in m["candidates"]]
+                sub = raw.subset(np.isin(raw.student_ids, cand))
+                if len(sub):
+                    matches[q] = sub.match(queries[q], threshold=threshold, top_k=top_k)[0]
+                    continue
+            m["candidates"] = m["candidates"][:top_k]
+        return matches
+
+    def match(self, query_embs, threshold=0.55, top_k=1, scope=None):
+        """
+        Match the faces of one frame. With a session `scope` only that
+        session's eligible students are searched first; unrecognized faces
+        fall back to the whole gallery when SESSION_SCOPE_FALLBACK is on.
+        """
+        queries = normalize_rows(query_embs)
+        if scope is None:
+            return self._match_in(
+                self.search_snapshot(), self.raw.snapshot(), queries, threshold, top_k
+            )
+
+        search, raw = self.scoped(scope)
+        matches = self._match_in(search, raw, queries, threshold, top_k)
+        for m in matches:
+            m["scope"] = "session"
+
+        if SESSION_SCOPE_FALLBACK:
+            misses = [q for q, m in enumerate(matches) if not m["recognized"]]
+            if misses:
+                wide = self._match_in(
+                    self.search_snapshot(), self.raw.snapshot(),
+                    queries[misses], threshold, top_k,
+                )
+                for q, m in zip(misses, wide):
+                    if m["recognized"]:
+                        m["scope"] = "all"
+                        matches[q] = m
+        return matches
+
+
+gallery = FaceGallery()
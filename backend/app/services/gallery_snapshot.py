@@ -0,0 +1,197 @@
+# backend/app/services/gallery_snapshot.py
+"""
+On-disk copy of the recognition gallery, so a restarted worker can match
+straight away instead of reading every embedding out of Mongo.
+
+File layout (one file, little-endian):
+
+    0      8  magic b"GALSNAP1"
+    8      8  header length (uint64)
+    16        JSON header, zero-padded to HEADER_SIZE
+    4096      vector blocks, page aligned (raw rows, then template rows)
+    ...       id table (JSON): row ids per index + student metadata
+
+The vector blocks are opened with np.memmap (read-only), so every uvicorn
+worker on the host shares one copy through the page cache. Writes go to a
+temp file that replaces the old one (atomic rename), so readers only ever
+see a complete snapshot.
+
+Anything that changed after the snapshot was taken is replayed from the
+`gallery_changes` collection: every gallery write logs the students it
+touched, and on load those students are re-read from Mongo.
+"""
+import os
+import json
+import socket
+import asyncio
+from datetime import datetime, timedelta
+import numpy as np
+from app.db import mongo as mongo_module
+from app.db.models_mongo import GALLERY_CHANGE_RETENTION_S
+
+# "" disables the snapshot (always load from Mongo)
+GALLERY_SNAPSHOT_PATH = os.getenv(
+    "GALLERY_SNAPSHOT_PATH",
+    os.path.join(os.path.dirname(__file__), "../../.gallery/gallery.snap"),
+)
+# gallery writes are collected for this long before the file is rewritten
+GALLERY_SNAPSHOT_DELAY_S = float(os.getenv("GALLERY_SNAPSHOT_DELAY_S", "2"))
+# replay also covers changes logged this long before the snapshot's mark
+# (clock skew between API hosts)
+GALLERY_REPLAY_SKEW_S = float(os.getenv("GALLERY_REPLAY_SKEW_S", "5"))
+
+# tags change log entries, so a worker can skip the ones it wrote itself
+ORIGIN = f"{socket.gethostname()}:{os.getpid()}"
+
+MAGIC = b"GALSNAP1"
+FORMAT_VERSION = 1
+HEADER_SIZE = 4096
+ALIGN = 4096
+INDEXES = ("raw", "templates")
+
+
+def _aligned(n):
+    return -(-n // ALIGN) * ALIGN
+
+
+# =========================
+# FILE I/O
+# =========================
+def write_snapshot(path, meta, indexes, students):
+    """
+    indexes: {"raw" | "templates": (matrix, embedding_ids, student_ids)}
+    students: {student_id: {name, dept, sem, course_name}}
+    """
+    header = {"format": FORMAT_VERSION, **meta, "indexes": {}}
+    offset = HEADER_SIZE
+    for name in INDEXES:
+        matrix, _, _ = indexes[name]
+        header["indexes"][name] = {"rows": int(len(matrix)), "offset": offset}
+        offset = _aligned(offset + matrix.nbytes)
+    id_table = json.dumps({
+        "indexes": {
+            name: {"embedding_ids": list(map(str, eids)), "student_ids": list(map(str, sids))}
+            for name, (_, eids, sids) in indexes.items()
+        },
+        "students": students,
+    }, default=str).encode()
+    header["ids"] = {"offset": offset, "length": len(id_table)}
+
+    head = json.dumps(header).encode()
+    if len(head) > HEADER_SIZE - 16:
+        raise ValueError("gallery snapshot header too large")
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(MAGIC)
+            f.write(np.uint64(len(head)).tobytes())
+            f.write(head)
+            for name in INDEXES:
+                matrix = np.ascontiguousarray(indexes[name][0])
+                f.seek(header["indexes"][name]["offset"])
+                if matrix.size:
+                    matrix.tofile(f)
+            f.seek(header["ids"]["offset"])
+            f.write(id_table)
+            f.flush()
+            os.fsync(f.fileno())
+        # workers that already mapped the old file keep their inode
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def read_snapshot(path):
+    """
+    (header, {name: (memmap, embedding_ids, student_ids)}, students),
+    or None when there is no usable file.
+    """
+    try:
+        with open(path, "rb") as f:
+            if f.read(8) != MAGIC:
+                return None
+            size = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+            header = json.loads(f.read(size))
+            if header.get("format") != FORMAT_VERSION:
+                return None
+            f.seek(header["ids"]["offset"])
+            table = json.loads(f.read(header["ids"]["length"]))
+
+        dtype, dim = np.dtype(header["dtype"]), header["dim"]
+        indexes = {}
+        for name in INDEXES:
+            info = header["indexes"][name]
+            if info["rows"]:
+                matrix = np.memmap(
+                    path, dtype=dtype, mode="r", offset=info["offset"], shape=(info["rows"], dim)
+                )
+            else:
+                matrix = np.empty((0, dim), dtype=dtype)
+            ids = table["indexes"][name]
+            indexes[name] = (matrix, ids["embedding_ids"], ids["student_ids"])
+        return header, indexes, table["students"]
+    except (OSError, ValueError, KeyError, TypeError):
+        # missing, truncated or foreign file
+        return None
+
+
+# =========================
+# CHANGE LOG
+# =========================
+class ChangeLog:
+    """
+    Buffers the students touched by gallery writes and appends them to
+    `gallery_changes` in one insert per event-loop turn (a bulk enroll
+    adding hundreds of images logs each student once).
+    """
+
+    def __init__(self):
+        self._pending = {}   # student_id -> op
+        self._task = None
+
+    def record(self, op, student_ids):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return  # CLI / scripts: nothing else reads this process's gallery
+        for sid in student_ids:
+            self._pending[str(sid)] = op
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._flush())
+
+    async def _flush(self):
+        await asyncio.sleep(0)
+        batch, self._pending = self._pending, {}
+        self._task = None
+        if not batch:
+            return
+        now = datetime.utcnow()
+        try:
+            await mongo_module.db["gallery_changes"].insert_many([
+                {"student_id": sid, "op": op, "at": now, "origin": ORIGIN}
+                for sid, op in batch.items()
+            ])
+        except Exception as e:
+            # the next full load / snapshot rebuild picks the change up
+            print("❌ gallery change log write failed:", e)
+
+
+async def changed_students(since: datetime):
+    """
+    Students touched since `since` (minus GALLERY_REPLAY_SKEW_S).
+    """
+    cutoff = since - timedelta(seconds=GALLERY_REPLAY_SKEW_S)
+    return await mongo_module.db["gallery_changes"].distinct(
+        "student_id", {"at": {"$gte": cutoff}}
+    )
+
+
+def replayable(header):
+    """
+    True while the change log still covers everything after the snapshot.
+    """
+    since = datetime.fromisoformat(header["since"])
+    return datetime.utcnow() - since < timedelta(seconds=GALLERY_CHANGE_RETENTION_S)
@@ -0,0 +1,241 @@
+# backend/app/services/gallery_sync.py
+"""
+Keeps every API worker's in-memory gallery in step with the others.
+
+Each gallery write is logged to `gallery_changes` (see gallery_snapshot.py).
+Every worker tails that log and re-reads the touched students from Mongo,
+so an enrollment or delete on one worker / replica reaches all of them
+within a moment:
+
+    change stream  replica sets / Atlas: pushed as soon as it's inserted
+    polling        standalone servers: `at` watermark every GALLERY_SYNC_POLL_S
+
+Also purges the face rows of deleted students (bulk, one delete per
+collection). Clean up rows orphaned before that existed with:
+
+    cd backend
+    python -m app.services.gallery_sync --purge-orphans
+"""
+import os
+import time
+import asyncio
+from datetime import datetime, timedelta
+from pymongo.errors import OperationFailure
+from app.db import mongo as mongo_module
+from app.services.gallery import gallery
+from app.services.gallery_snapshot import ORIGIN, GALLERY_REPLAY_SKEW_S
+
+# "auto" (change stream, polling when unsupported) | "stream" | "poll" | "off"
+GALLERY_SYNC = os.getenv("GALLERY_SYNC", "auto").lower()
+GALLERY_SYNC_POLL_S = float(os.getenv("GALLERY_SYNC_POLL_S", "2"))
+# changes arriving within this window are applied together
+GALLERY_SYNC_BATCH_MS = float(os.getenv("GALLERY_SYNC_BATCH_MS", "50"))
+
+FACE_COLLECTIONS = ("face_embeddings", "face_templates")
+
+
+async def purge_student_faces(student_ids):
+    """
+    Delete every embedding / template row of `student_ids`.
+    Returns {collection: deleted rows}.
+    """
+    sids = [str(s) for s in student_ids]
+    if not sids:
+        return {}
+    db = mongo_module.db
+    out = {}
+    for col in FACE_COLLECTIONS:
+        res = await db[col].delete_many({"student_id": {"$in": sids}})
+        out[col] = int(res.deleted_count)
+    return out
+
+
+async def purge_orphans():
+    """
+    Delete face rows whose student no longer exists.
+    """
+    db = mongo_module.db
+    existing = {str(d["_id"]) async for d in db["students"].find({}, {"_id": 1})}
+    orphaned = set()
+    for col in FACE_COLLECTIONS:
+        for sid in await db[col].distinct("student_id"):
+            if sid is not None and str(sid) not in existing:
+                orphaned.add(str(sid))
+    deleted = await purge_student_faces(orphaned)
+    if orphaned:
+        # running workers may still hold their rows
+        now = datetime.utcnow()
+        await db["gallery_changes"].insert_many([
+            {"student_id": sid, "op": "remove", "at": now, "origin": ORIGIN}
+            for sid in orphaned
+        ])
+    return len(orphaned), deleted
+
+
+def _streams_unsupported(e: OperationFailure):
+    # 40573: "The $changeStream stage is only supported on replica sets"
+    return e.code == 40573 or "replica set" in str(e).lower()
+
+
+class GallerySync:
+    """
+    Tails `gallery_changes` and applies other workers' changes to this
+    worker's gallery, a batch of students at a time.
+    """
+
+    def __init__(self, gallery, mode: str = GALLERY_SYNC):
+        self.gallery = gallery
+        self.mode = mode
+        self.active = None          # "stream" | "poll" while running
+        self._task = None
+        self._watermark = None      # `at` of the newest change applied
+        self._seen = {}             # change _id -> at, within the skew window
+        self.applied = 0
+        self.batches = 0
+        self.errors = 0
+        self.last_applied = None    # monotonic time
+
+    # ---------- apply ----------
+    async def _apply(self, changes):
+        """
+        Reload the students of `changes` (raw change-log docs).
+        """
+        students = set()
+        for c in changes:
+            at = c.get("at")
+            if at is not None and (self._watermark is None or at > self._watermark):
+                self._watermark = at
+            if c.get("origin") == ORIGIN:
+                continue  # already in this worker's gallery
+            students.add(c["student_id"])
+        if not students:
+            return
+        await self.gallery.reload_students(students)
+        self.gallery.mark_synced(self._watermark)
+        self.applied += len(students)
+        self.batches += 1
+        self.last_applied = time.monotonic()
+
+    # ---------- change stream ----------
+    async def _stream(self):
+        col = mongo_module.db["gallery_changes"]
+        pipeline = [{"$match": {"operationType": "insert"}}]
+        resume = None
+        while True:
+            try:
+                async with col.watch(
+                    pipeline,
+                    resume_after=resume,
+                    # bounds how long try_next() waits for the rest of a batch
+                    max_await_time_ms=max(1, int(GALLERY_SYNC_BATCH_MS)),
+                ) as stream:
+                    self.active = "stream"
+                    if resume is None:
+                        # whatever was logged before the stream opened
+                        await self._poll_once()
+                    async for change in stream:
+                        resume = stream.resume_token
+                        batch = [change["fullDocument"]]
+                        # gather whatever else is already waiting
+                        deadline = time.monotonic() + GALLERY_SYNC_BATCH_MS / 1000.0
+                        while time.monotonic() < deadline:
+                            more = await stream.try_next()
+                            if more is None:
+                                break
+                            batch.append(more["fullDocument"])
+                            resume = stream.resume_token
+                        await self._apply(batch)
+            except OperationFailure as e:
+                if _streams_unsupported(e):
+                    raise
+                self.errors += 1
+                print("❌ gallery change stream failed, resuming:", e)
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                print("❌ gallery change stream failed, resuming:", e)
+                await asyncio.sleep(1)
+
+    # ---------- polling ----------
+    async def _poll_once(self):
+        # overlap by the skew window: a late writer's clock may lag ours
+        cutoff = self._watermark - timedelta(seconds=GALLERY_REPLAY_SKEW_S)
+        fresh = []
+        async for c in mongo_module.db["gallery_changes"].find(
+            {"at": {"$gte": cutoff}}
+        ).sort("at", 1):
+            if c["_id"] not in self._seen:
+                self._seen[c["_id"]] = c["at"]
+                fresh.append(c)
+        self._seen = {k: at for k, at in self._seen.items() if at >= cutoff}
+        if fresh:
+            await self._apply(fresh)
+
+    async def _poll(self):
+        self.active = "poll"
+        while True:
+            try:
+                await self._poll_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                print("❌ gallery sync poll failed:", e)
+            await asyncio.sleep(GALLERY_SYNC_POLL_S)
+
+    async def run(self):
+        if self.mode in ("auto", "stream"):
+            try:
+                await self._stream()
+            except OperationFailure as e:
+                if self.mode == "stream":
+                    print("❌ gallery change stream unavailable:", e)
+                    return
+                print("ℹ️ change streams unavailable (standalone Mongo), polling gallery changes")
+        await self._poll()
+
+    def start(self):
+        if self.mode == "off" or self._task is not None:
+            return
+        # the gallery already holds everything up to its load / snapshot mark
+        self._watermark = self.gallery.synced_since() or datetime.utcnow()
+        self._task = asyncio.ensure_future(self.run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+            self.active = None
+
+    def stats(self):
+        return {
+            "mode": self.active or "off",
+            "students_applied": self.applied,
+            "batches": self.batches,
+            "errors": self.errors,
+            "last_change_at": self._watermark.isoformat() if self._watermark else None,
+            "seconds_since_applied": (
+                round(time.monotonic() - self.last_applied, 1) if self.last_applied else None
+            ),
+        }
+
+
+gallery_sync = GallerySync(gallery)
+
+
+if __name__ == "__main__":
+    import argparse
+    from app.db.mongo import init_db
+
+    parser = argparse.ArgumentParser(description="Gallery maintenance")
+    parser.add_argument("--purge-orphans", action="store_true", required=True)
+    args = parser.parse_args()
+
+    async def main():
+        await init_db()
+        students, deleted = await purge_orphans()
+        print(f"✅ {students} deleted students had face rows left: {deleted}")
+
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+# backend/app/services/inference_pool.py
+import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+
+# ONNX Runtime releases the GIL while it runs, so plain threads give real
+# parallelism for detection / embedding and image decoding.
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "0")) or (os.cpu_count() or 1)
+# jobs allowed in the pool at once (running + waiting); beyond that the
+# request is refused with 429 instead of piling up behind the cameras
+INFERENCE_MAX_PENDING = int(os.getenv("INFERENCE_MAX_PENDING", "0")) or 2 * INFERENCE_WORKERS
+
+
+class InferenceBusy(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=429,
+            detail="Face engine busy, retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+
+class InferencePool:
+    """
+    Dedicated executor for every CPU-bound face-engine call, so the event
+    loop stays free for sessions, marking and exports while cameras stream.
+    """
+
+    def __init__(self, workers: int = INFERENCE_WORKERS, max_pending: int = INFERENCE_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="face-engine"
+        )
+
+    async def run(self, fn, *args, **kwargs):
+        # only touched from the event loop thread, no lock needed
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise InferenceBusy()
+        return await self.run_admitted(fn, *args, **kwargs)
+
+    async def run_admitted(self, fn, *args, **kwargs):
+        """
+        Skip the admission check: for callers that already bound their own
+        concurrency (the recognition micro-batcher) and must not be refused
+        half-way through a request.
+        """
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor, functools.partial(fn, *args, **kwargs)
+            )
+        finally:
+            self.pending -= 1
+
+    def intra_op_threads(self):
+        """
+        ORT intra-op threads per model session so the workers split the
+        cores between them instead of each session starting one thread per
+        core. 0 (ORT default) for a single worker.
+        """
+        if self.workers <= 1:
+            return 0
+        return max(1, (os.cpu_count() or 1) // self.workers)
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "intra_op_threads": self.intra_op_threads(),
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+inference_pool = InferencePool()
+
+
+async def run_inference(fn, *args, **kwargs):
+    return await inference_pool.run(fn, *args, **kwargs)
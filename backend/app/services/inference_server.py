@@ -0,0 +1,345 @@
+# backend/app/services/inference_server.py
+"""
+Local multi-process inference service for the face engine.
+
+    cd backend
+    python -m app.services.inference_server
+
+Starts INFERENCE_SERVER_WORKERS processes, each pinned to its own slice of
+cores and running one InsightFace engine whose ONNX Runtime sessions use
+exactly that many intra-op threads. API processes started with
+INFERENCE_MODE=server never load the model: they copy each frame into a
+shared-memory block and send only its name/shape over a local socket, and
+the workers pull jobs from one shared queue.
+
+Messages on the socket are pickled, so whoever can connect can run code in
+the server: a TCP address needs INFERENCE_SERVER_AUTHKEY, and without a
+key only a unix socket (mode 0600) is served.
+"""
+import os
+import time
+import queue
+import itertools
+import threading
+import multiprocessing as mp
+from multiprocessing import shared_memory, resource_tracker
+from multiprocessing.connection import Listener, Client
+import numpy as np
+
+INFERENCE_SERVER_ADDRESS = os.getenv("INFERENCE_SERVER_ADDRESS", "/tmp/face-engine.sock")
+# shared secret of server and API processes; required for TCP addresses
+INFERENCE_SERVER_AUTHKEY = os.getenv("INFERENCE_SERVER_AUTHKEY", "")
+# a job not answered in this long fails (worker hung / killed)
+INFERENCE_SERVER_TIMEOUT_S = float(os.getenv("INFERENCE_SERVER_TIMEOUT_S", "30"))
+INFERENCE_THREADS_PER_WORKER = int(os.getenv("INFERENCE_THREADS_PER_WORKER", "2"))
+INFERENCE_SERVER_WORKERS = int(os.getenv("INFERENCE_SERVER_WORKERS", "0"))  # 0 -> cores / threads
+
+
+def _address(addr: str = INFERENCE_SERVER_ADDRESS):
+    """
+    "host:port" -> TCP, anything else -> unix socket path.
+    """
+    if ":" in addr and not addr.startswith("/"):
+        host, port = addr.rsplit(":", 1)
+        return (host, int(port))
+    return addr
+
+
+def _authkey(address):
+    """
+    authkey for Listener / Client, or None for an unauthenticated unix
+    socket. Refuses TCP without a key.
+    """
+    if INFERENCE_SERVER_AUTHKEY:
+        return INFERENCE_SERVER_AUTHKEY.encode()
+    if not isinstance(address, str):
+        raise RuntimeError(
+            "INFERENCE_SERVER_AUTHKEY must be set to serve on a TCP address "
+            f"({address[0]}:{address[1]})"
+        )
+    return None
+
+
+def _available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def core_slices(workers: int, threads: int):
+    cores = _available_cores()
+    return [
+        [cores[(w * threads + t) % len(cores)] for t in range(threads)]
+        for w in range(workers)
+    ]
+
+
+def _attach(name):
+    """
+    Open a block created by another process without letting this
+    process's resource tracker unlink it on exit.
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+    return shm
+
+
+# =========================
+# WORKER PROCESS
+# =========================
+def _worker_main(worker_id, cores, threads, jobs, results, current):
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+
+    from app.services import face_engine
+    from app.services.detection_profiles import get_profile, PROFILES
+
+    face_engine.ORT_INTRA_OP_THREADS = threads
+    # load + run every detection size before taking jobs
+    face_engine.warm_up(list(PROFILES.values()))
+    results.put(("ready", worker_id, None))
+
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        req_id, shm_name, shape, dtype, profile_name = job
+        # shared memory, not a queue message: still readable by the server
+        # if this process is killed before its queue feeder runs
+        current[worker_id] = req_id
+        try:
+            shm = _attach(shm_name)
+            try:
+                # own copy, so the block can be closed before inference
+                img = np.array(np.ndarray(shape, dtype=dtype, buffer=shm.buf))
+            finally:
+                shm.close()
+            profile = get_profile(profile_name) if profile_name else None
+            faces = face_engine.detect_and_embed(img, profile)
+            out = [
+                {
+                    "bbox": f["bbox"],
+                    "det_score": f["det_score"],
+                    "kps": np.asarray(f["kps"], np.float32),
+                    "embedding": np.asarray(f["embedding"], np.float32),
+                }
+                for f in faces
+            ]
+            results.put(("result", worker_id, (req_id, "ok", out)))
+        except Exception as e:
+            results.put(("result", worker_id, (req_id, "error", repr(e))))
+        current[worker_id] = -1
+
+
+# =========================
+# SERVER (dispatcher)
+# =========================
+class InferenceServer:
+    def __init__(
+        self,
+        workers: int = INFERENCE_SERVER_WORKERS,
+        threads: int = INFERENCE_THREADS_PER_WORKER,
+        address: str = INFERENCE_SERVER_ADDRESS,
+    ):
+        self.threads = max(1, threads)
+        self.workers = workers or max(1, len(_available_cores()) // self.threads)
+        self.address = _address(address)
+        self._ids = itertools.count()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._procs = []
+        self._cores = []
+        self.respawns = 0
+
+    def _spawn(self, wid):
+        p = self._ctx.Process(
+            target=_worker_main,
+            args=(wid, self._cores[wid], self.threads, self._jobs, self._results, self._current),
+            daemon=True,
+        )
+        p.start()
+        return p
+
+    def start(self):
+        self._ctx = mp.get_context("spawn")
+        self._jobs = self._ctx.Queue()
+        self._results = self._ctx.Queue()
+        self._cores = core_slices(self.workers, self.threads)
+        # req_id each worker is working on, -1 when idle
+        self._current = self._ctx.Array("q", [-1] * self.workers, lock=False)
+        self._procs = [self._spawn(wid) for wid in range(self.workers)]
+
+        ready = 0
+        while ready < self.workers:
+            try:
+                tag, wid, _ = self._results.get(timeout=1)
+            except queue.Empty:
+                dead = [p for p in self._procs if not p.is_alive()]
+                if dead:
+                    raise RuntimeError("inference worker died while loading the model")
+                continue
+            if tag == "ready":
+                ready += 1
+                print(f"🧠 inference worker {wid} ready")
+
+        threading.Thread(target=self._collect, daemon=True).start()
+        threading.Thread(target=self._monitor, daemon=True).start()
+
+    def _finish(self, req_id, result):
+        with self._lock:
+            slot = self._pending.pop(req_id, None)
+        if slot is not None:
+            slot["result"] = result
+            slot["done"].set()
+
+    def _collect(self):
+        while True:
+            tag, wid, data = self._results.get()
+            if tag == "result":
+                req_id, status, payload = data
+                self._finish(req_id, (status, payload))
+            elif tag == "ready":
+                print(f"🧠 inference worker {wid} ready")
+
+    def _monitor(self):
+        # a crashed / OOM-killed worker fails its job and is replaced
+        while True:
+            time.sleep(1)
+            for wid, p in enumerate(self._procs):
+                if p.is_alive():
+                    continue
+                print(f"❌ inference worker {wid} died (exit code {p.exitcode}), restarting")
+                req_id, self._current[wid] = self._current[wid], -1
+                if req_id >= 0:
+                    self._finish(req_id, ("error", f"inference worker {wid} died"))
+                self._procs[wid] = self._spawn(wid)
+                self.respawns += 1
+
+    def submit(self, shm_name, shape, dtype, profile_name=None, timeout=INFERENCE_SERVER_TIMEOUT_S):
+        req_id = next(self._ids)
+        slot = {"done": threading.Event(), "result": None}
+        with self._lock:
+            self._pending[req_id] = slot
+        self._jobs.put((req_id, shm_name, shape, dtype, profile_name))
+        if not slot["done"].wait(timeout):
+            with self._lock:
+                self._pending.pop(req_id, None)
+            return ("error", f"inference timed out after {timeout:.0f}s")
+        return slot["result"]
+
+    def _handle(self, conn):
+        with conn:
+            while True:
+                try:
+                    msg = conn.recv()
+                except (EOFError, OSError):
+                    return
+                if msg[0] == "ping":
+                    conn.send(("ok", {
+                        "workers": self.workers,
+                        "threads": self.threads,
+                        "respawns": self.respawns,
+                    }))
+                elif msg[0] == "detect":
+                    _, shm_name, shape, dtype, profile_name = msg
+                    conn.send(self.submit(shm_name, shape, dtype, profile_name))
+                else:
+                    conn.send(("error", f"unknown request {msg[0]!r}"))
+
+    def serve_forever(self):
+        authkey = _authkey(self.address)   # before loading any model
+        self.start()
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+        listener = Listener(self.address, authkey=authkey)
+        if isinstance(self.address, str):
+            # only this user's processes may connect
+            os.chmod(self.address, 0o600)
+        print(
+            f"✅ Inference server on {self.address}: "
+            f"{self.workers} workers × {self.threads} threads"
+        )
+        try:
+            while True:
+                conn = listener.accept()
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+        finally:
+            listener.close()
+            for _ in self._procs:
+                self._jobs.put(None)
+
+
+# =========================
+# CLIENT (API processes)
+# =========================
+_local = threading.local()
+
+
+def _connection():
+    # one connection per calling thread; Connection objects aren't thread-safe
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        address = _address()
+        conn = Client(address, authkey=_authkey(address))
+        _local.conn = conn
+    return conn
+
+
+def ping(timeout=5.0):
+    """
+    The server's status (workers, threads, respawns); raises when it can't
+    be reached or doesn't answer within `timeout`.
+    """
+    conn = _connection()
+    try:
+        conn.send(("ping",))
+        if not conn.poll(timeout):
+            conn.close()
+            raise TimeoutError("inference server did not answer")
+        status, payload = conn.recv()
+    except (EOFError, OSError):
+        _local.conn = None
+        raise
+    if status != "ok":
+        raise RuntimeError(f"inference server: {payload}")
+    return payload
+
+
+def remote_faces_and_embeddings(image_bgr, profile=None):
+    """
+    Same contract as face_engine.detect_and_embed(), served by the
+    inference server.
+    """
+    img = np.ascontiguousarray(image_bgr)
+    shm = shared_memory.SharedMemory(create=True, size=max(img.nbytes, 1))
+    try:
+        np.ndarray(img.shape, dtype=img.dtype, buffer=shm.buf)[...] = img
+        conn = _connection()
+        try:
+            conn.send((
+                "detect", shm.name, img.shape, img.dtype.str,
+                profile.name if profile is not None else None,
+            ))
+            # the server answers every job within its own timeout; silence
+            # past that means it's gone
+            if not conn.poll(INFERENCE_SERVER_TIMEOUT_S + 5):
+                conn.close()
+                raise TimeoutError("inference server did not answer")
+            status, payload = conn.recv()
+        except (EOFError, OSError):
+            _local.conn = None
+            raise
+    finally:
+        shm.close()
+        shm.unlink()
+
+    if status != "ok":
+        raise RuntimeError(f"inference server: {payload}")
+    return payload
+
+
+if __name__ == "__main__":
+    InferenceServer().serve_forever()
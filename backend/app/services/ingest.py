@@ -0,0 +1,209 @@
+# backend/app/services/ingest.py
+"""
+Upload → BGR frame, doing as little work as the detection profile needs.
+
+* size checks first: byte size, then width × height read from the JPEG /
+  PNG header, so a huge upload is refused (413) before anything is decoded
+* JPEGs are decoded at 1/2, 1/4 or 1/8 scale straight from the DCT
+  (IMREAD_REDUCED_COLOR_*) when the profile would downscale the frame to
+  its max_side anyway; the decoded frame never gets smaller than that
+* the upload is decoded from a view of the spooled request body (BytesIO
+  buffer or mmap of the temp file), not from a copied bytes object
+
+Frames decoded at reduced scale carry `scale` (< 1); face coordinates
+found on them are mapped back with to_original().
+"""
+import io
+import os
+import mmap
+import time
+import struct
+from collections import deque
+import numpy as np
+import cv2
+from fastapi import HTTPException
+
+INGEST_REDUCED_DECODE = os.getenv("INGEST_REDUCED_DECODE", "true").lower() == "true"
+# decoded frames keep at least this long side, whatever the profile (crop quality)
+INGEST_MIN_DECODE_SIDE = int(os.getenv("INGEST_MIN_DECODE_SIDE", "0"))
+INGEST_MAX_BYTES = int(os.getenv("INGEST_MAX_BYTES", str(25 * 1024 * 1024)))
+INGEST_MAX_PIXELS = int(os.getenv("INGEST_MAX_PIXELS", str(50_000_000)))
+
+REDUCED_FLAGS = {
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+# JPEG start-of-frame markers (all but DHT / JPG / DAC)
+SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+class ImageTooLarge(HTTPException):
+    def __init__(self, detail):
+        super().__init__(status_code=413, detail=detail)
+
+
+class Frame:
+    """
+    A decoded upload: `image` is `scale` × the original resolution.
+    """
+
+    def __init__(self, image, scale=1.0, original_size=None, decode_ms=0.0):
+        self.image = image
+        self.scale = scale
+        self.original_size = original_size   # (w, h) as displayed (EXIF-rotated), or None
+        self.decode_ms = decode_ms
+
+
+# =========================
+# HEADER PARSING
+# =========================
+def image_size(buf):
+    """
+    (width, height, "jpeg" | "png") from the first bytes of an encoded
+    image, or None for other / broken formats.
+    """
+    head = bytes(buf[:32])
+    if head[:8] == b"\x89PNG\r\n\x1a\n" and head[12:16] == b"IHDR":
+        w, h = struct.unpack(">II", head[16:24])
+        return w, h, "png"
+    if head[:2] != b"\xff\xd8":
+        return None
+
+    view = memoryview(buf)
+    i, n = 2, len(view)
+    while i + 4 <= n:
+        if view[i] != 0xFF:
+            return None
+        marker = view[i + 1]
+        if marker == 0xFF:          # fill byte
+            i += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            i += 2                  # markers without a length
+            continue
+        length = (view[i + 2] << 8) | view[i + 3]
+        if marker in SOF_MARKERS:
+            if i + 9 > n:
+                return None
+            h = (view[i + 5] << 8) | view[i + 6]
+            w = (view[i + 7] << 8) | view[i + 8]
+            return w, h, "jpeg"
+        i += 2 + length
+    return None
+
+
+def reduction_for(width, height, target_side):
+    """
+    Largest DCT reduction (1, 2, 4, 8) that keeps the long side >= target_side.
+    """
+    target = max(target_side, INGEST_MIN_DECODE_SIDE)
+    if not target:
+        return 1
+    side = max(width, height)
+    for factor in (8, 4, 2):
+        if side // factor >= target:
+            return factor
+    return 1
+
+
+# =========================
+# DECODE
+# =========================
+def decode_image(buf, target_side: int = 0):
+    """
+    Frame from an encoded image (bytes / memoryview / mmap).
+    `target_side` is the long side the caller will downscale to (a
+    detection profile's max_side); 0 decodes at full resolution.
+    """
+    if len(buf) > INGEST_MAX_BYTES:
+        raise ImageTooLarge(f"Image larger than {INGEST_MAX_BYTES} bytes")
+
+    size = image_size(buf)
+    if size and size[0] * size[1] > INGEST_MAX_PIXELS:
+        raise ImageTooLarge(f"Image has more than {INGEST_MAX_PIXELS} pixels")
+
+    factor = 1
+    if INGEST_REDUCED_DECODE and size and size[2] == "jpeg":
+        factor = reduction_for(size[0], size[1], target_side)
+
+    started = time.perf_counter()
+    arr = np.frombuffer(buf, dtype=np.uint8)
+    img = cv2.imdecode(arr, REDUCED_FLAGS[factor] if factor > 1 else cv2.IMREAD_COLOR)
+    del arr   # drop the view so the caller can release the buffer
+    decode_ms = (time.perf_counter() - started) * 1000
+    ingest_metrics.record(decode_ms, factor)
+
+    if img is None:
+        return None
+    # from the factor, not from the decoded size: imdecode applies the EXIF
+    # orientation, so a portrait phone photo comes out with w / h swapped
+    scale = 1.0 / factor
+    original = None
+    if size:
+        w, h = size[:2]
+        if (img.shape[1] > img.shape[0]) != (w > h):
+            w, h = h, w
+        original = (w, h)
+    return Frame(img, scale, original, decode_ms)
+
+
+def read_upload(fileobj, target_side: int = 0):
+    """
+    decode_image() over a request upload (UploadFile.file) without copying
+    the body: in-memory uploads are viewed through their BytesIO buffer,
+    spilled ones are mmapped.
+    """
+    raw = getattr(fileobj, "_file", fileobj)   # SpooledTemporaryFile -> its storage
+    if isinstance(raw, io.BytesIO):
+        view = raw.getbuffer()
+        try:
+            return decode_image(view, target_side)
+        finally:
+            view.release()
+
+    try:
+        fd = raw.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        fd = None
+    if fd is not None and os.fstat(fd).st_size > 0:
+        with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mm:
+            return decode_image(mm, target_side)
+
+    fileobj.seek(0)
+    return decode_image(fileobj.read(), target_side)
+
+
+def to_original(bbox, scale):
+    """
+    Map a box found on a reduced-decode frame back to the uploaded image.
+    """
+    if scale == 1.0:
+        return bbox
+    return [int(round(v / scale)) for v in bbox]
+
+
+# =========================
+# METRICS
+# =========================
+class IngestMetrics:
+    def __init__(self, window: int = 512):
+        self.samples = deque(maxlen=window)
+        self.reduced = {1: 0, 2: 0, 4: 0, 8: 0}
+
+    def record(self, decode_ms, factor):
+        self.samples.append(decode_ms)
+        self.reduced[factor] += 1
+
+    def stats(self):
+        out = {"decoded": sum(self.reduced.values()), "by_reduction": dict(self.reduced)}
+        if self.samples:
+            s = np.asarray(self.samples)
+            out.update(
+                decode_p50_ms=round(float(np.percentile(s, 50)), 2),
+                decode_p95_ms=round(float(np.percentile(s, 95)), 2),
+            )
+        return out
+
+
+ingest_metrics = IngestMetrics()
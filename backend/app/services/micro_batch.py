@@ -0,0 +1,160 @@
+# backend/app/services/micro_batch.py
+import os
+import time
+import asyncio
+import numpy as np
+from app.services import face_engine
+from app.services.detection_profiles import get_profile, record_latency
+from app.services.inference_pool import run_inference, inference_pool, InferenceBusy
+
+RECOGNITION_BATCHING = os.getenv("RECOGNITION_BATCHING", "true").lower() == "true"
+RECOGNITION_MAX_BATCH = int(os.getenv("RECOGNITION_MAX_BATCH", "32"))
+RECOGNITION_MAX_WAIT_MS = float(os.getenv("RECOGNITION_MAX_WAIT_MS", "5"))
+# crops allowed to wait for a batch before new requests get 429
+RECOGNITION_MAX_QUEUED = int(os.getenv("RECOGNITION_MAX_QUEUED", "256"))
+
+
+class MicroBatcher:
+    """
+    Collects work items from concurrent requests for up to `max_wait_ms`
+    (or until `max_batch` items are waiting) and runs them through `fn` in
+    one call on the inference pool. `fn` takes a list of items and returns
+    one result per item, in order.
+
+    At most `max_inflight` batches run at once; while they do, new items
+    keep queueing and go out together as the next (bigger) batch.
+    """
+
+    def __init__(
+        self,
+        fn,
+        max_batch: int = RECOGNITION_MAX_BATCH,
+        max_wait_ms: float = RECOGNITION_MAX_WAIT_MS,
+        max_inflight: int = None,
+        max_queued: int = RECOGNITION_MAX_QUEUED,
+    ):
+        self.fn = fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_inflight = max_inflight or max(1, inference_pool.workers)
+        self.max_queued = max_queued
+        self._waiting = []   # [(items, future)]
+        self._count = 0
+        self._timer = None
+        self._inflight = 0
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, items):
+        items = list(items)
+        if not items:
+            return []
+        if self._count >= self.max_queued:
+            raise InferenceBusy()
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._waiting.append((items, fut))
+        self._count += len(items)
+
+        if self._count >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await fut
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while self._waiting and self._inflight < self.max_inflight:
+            # whole requests only; a single oversized request goes alone
+            batch, size = [], 0
+            while self._waiting and (not batch or size + len(self._waiting[0][0]) <= self.max_batch):
+                items, fut = self._waiting.pop(0)
+                batch.append((items, fut))
+                size += len(items)
+            self._count -= size
+            self._inflight += 1
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch):
+        flat = [it for items, _ in batch for it in items]
+        try:
+            out = await inference_pool.run_admitted(self.fn, flat)
+        except BaseException as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        finally:
+            self._inflight -= 1
+            if self._waiting:
+                # whatever queued up meanwhile goes out now
+                self._flush()
+
+        self.batches += 1
+        self.items += len(flat)
+        start = 0
+        for items, fut in batch:
+            if not fut.done():
+                fut.set_result(out[start: start + len(items)])
+            start += len(items)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "queued": self._count,
+            "inflight": self._inflight,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000.0,
+        }
+
+
+recognition_batcher = MicroBatcher(face_engine.embed_crops)
+
+
+async def embed_crops_batched(crops):
+    """
+    Embeddings for aligned crops, through the shared batch when enabled.
+    """
+    if not RECOGNITION_BATCHING:
+        return await run_inference(face_engine.embed_crops, crops)
+    return await recognition_batcher.submit(crops)
+
+
+async def get_faces_and_embeddings_batched(image_bgr, profile=None):
+    """
+    Async drop-in for face_engine.get_faces_and_embeddings(): detection runs
+    per frame, the recognition model runs on crops pooled across all
+    concurrent requests.
+
+    `profile` is a DetectionProfile; its latency (detection + embedding,
+    queueing included) is recorded for /recognize/metrics.
+    """
+    profile = profile or get_profile()
+    started = time.perf_counter()
+
+    if not RECOGNITION_BATCHING or face_engine.INFERENCE_MODE == "server":
+        faces = await run_inference(face_engine.get_faces_and_embeddings, image_bgr, profile)
+        record_latency(profile, started, len(faces))
+        return faces
+
+    faces = await run_inference(face_engine.detect_and_align, image_bgr, profile)
+    if not faces:
+        record_latency(profile, started, 0)
+        return []
+
+    embs = await embed_crops_batched([f["crop"] for f in faces])
+    record_latency(profile, started, len(faces))
+    return [
+        {
+            "bbox": f["bbox"],
+            "det_score": f["det_score"],
+            "kps": f["kps"],
+            "embedding": np.asarray(e, np.float32),
+        }
+        for f, e in zip(faces, embs)
+    ]
@@ -0,0 +1,392 @@
+# backend/app/services/rollups.py
+"""
+Daily attendance rollups.
+
+    attendance_daily     one doc per (day, session): session metadata and
+                         the set of students present
+    attendance_presence  one doc per (student, month): bitmap of days present
+
+Both are written with idempotent $addToSet / $bit-or upserts as marks land
+(auto-mark flushes and the manual mark endpoint), so replaying a mark is
+harmless. Backfill or repair with:
+
+    cd backend
+    python -m app.services.rollups --rebuild [--since YYYY-MM-DD]
+"""
+import asyncio
+from datetime import datetime, date, timezone
+from pymongo import UpdateOne
+from app.db import mongo as mongo_module
+from app.services.session_cache import get_session
+
+SESSION_META_FIELDS = ("dept", "sem", "subject", "course_name")
+BULK_BATCH = 1000
+
+
+def _day(value) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _daily_id(day: date, session_id: str):
+    return f"{day.isoformat()}:{session_id}"
+
+
+def _presence_id(student_id: str, month: str):
+    return f"{student_id}:{month}"
+
+
+def _meta(session_doc):
+    if not session_doc:
+        return {f: None for f in SESSION_META_FIELDS}
+    meta = {f: session_doc.get(f) for f in SESSION_META_FIELDS}
+    if meta["sem"] is not None:
+        meta["sem"] = str(meta["sem"])
+    return meta
+
+
+def _updates(day: date, session_id: str, meta, student_ids):
+    """
+    Upserts adding `student_ids` to one (day, session) and to their months.
+    """
+    daily = UpdateOne(
+        {"_id": _daily_id(day, session_id)},
+        {
+            "$setOnInsert": {
+                "day": datetime.combine(day, datetime.min.time()),
+                "session_id": session_id,
+                **meta,
+            },
+            "$addToSet": {"students": {"$each": sorted(student_ids)}},
+        },
+        upsert=True,
+    )
+    month = day.strftime("%Y-%m")
+    presence = [
+        UpdateOne(
+            {"_id": _presence_id(sid, month)},
+            {
+                "$setOnInsert": {"student_id": sid, "month": month},
+                "$bit": {"days": {"or": 1 << (day.day - 1)}},
+            },
+            upsert=True,
+        )
+        for sid in student_ids
+    ]
+    return daily, presence
+
+
+async def _write(daily_ops, presence_ops):
+    db = mongo_module.db
+    for i in range(0, len(daily_ops), BULK_BATCH):
+        await db["attendance_daily"].bulk_write(daily_ops[i:i + BULK_BATCH], ordered=False)
+    for i in range(0, len(presence_ops), BULK_BATCH):
+        await db["attendance_presence"].bulk_write(presence_ops[i:i + BULK_BATCH], ordered=False)
+
+
+async def record_marks(logs):
+    """
+    Fold freshly inserted AttendanceLog rows into the rollups. Never raises:
+    a failed update is repaired by the next --rebuild.
+    """
+    groups = {}
+    for log in logs:
+        key = (_day(log.date), str(log.session_id))
+        groups.setdefault(key, set()).add(str(log.student_id))
+    if not groups:
+        return
+
+    daily_ops, presence_ops = [], []
+    try:
+        for (day, session_id), students in groups.items():
+            meta = _meta(await get_session(session_id))
+            daily, presence = _updates(day, session_id, meta, students)
+            daily_ops.append(daily)
+            presence_ops.extend(presence)
+        await _write(daily_ops, presence_ops)
+    except Exception as e:
+        print("❌ rollup update failed:", e)
+
+
+async def rebuild(since: date = None):
+    """
+    Recompute both rollups from attendance_logs (everything, or from
+    `since` on). Returns the number of (day, session) docs written.
+    """
+    db = mongo_module.db
+    match = {}
+    if since:
+        # presence bitmaps are per month, so the month of `since` is redone whole
+        start = datetime(since.year, since.month, 1)
+        match = {"date": {"$gte": start}}
+        await db["attendance_daily"].delete_many({"day": {"$gte": start}})
+        await db["attendance_presence"].delete_many({"month": {"$gte": start.strftime("%Y-%m")}})
+    else:
+        await db["attendance_daily"].delete_many({})
+        await db["attendance_presence"].delete_many({})
+
+    groups = db["attendance_logs"].aggregate([
+        {"$match": match},
+        {"$group": {
+            "_id": {"date": "$date", "session_id": "$session_id"},
+            "students": {"$addToSet": "$student_id"},
+        }},
+    ], allowDiskUse=True)
+
+    sessions = {}
+    daily_ops, presence_ops, written = [], [], 0
+    async for g in groups:
+        session_id = str(g["_id"]["session_id"])
+        if session_id not in sessions:
+            sessions[session_id] = _meta(await get_session(session_id))
+        daily, presence = _updates(
+            _day(g["_id"]["date"]), session_id, sessions[session_id],
+            [str(s) for s in g["students"]],
+        )
+        daily_ops.append(daily)
+        presence_ops.extend(presence)
+        if len(daily_ops) >= BULK_BATCH:
+            await _write(daily_ops, presence_ops)
+            written += len(daily_ops)
+            daily_ops, presence_ops = [], []
+
+    if daily_ops:
+        await _write(daily_ops, presence_ops)
+        written += len(daily_ops)
+    return written
+
+
+# =========================
+# SUMMARIES
+# =========================
+async def _held_sessions(start: date, end: date = None, **meta):
+    """
+    {subject: sessions held} for sessions starting in [start, end] that
+    have started by now (later ones today are scheduled, not held).
+    Held sessions nobody attended have no rollup doc, so these come from
+    `sessions` itself (small, indexed).
+    """
+    upto = datetime.now(timezone.utc)
+    if end:
+        upto = min(upto, datetime.combine(end, datetime.max.time(), tzinfo=timezone.utc))
+    q = {"start_time": {
+        "$gte": datetime.combine(start, datetime.min.time()),
+        "$lte": upto,
+    }}
+    for k, v in meta.items():
+        if v is not None:
+            q[k] = str(v) if k == "sem" else v
+    out = {}
+    async for g in mongo_module.db["sessions"].aggregate([
+        {"$match": q},
+        {"$group": {"_id": "$subject", "n": {"$sum": 1}}},
+    ]):
+        out[g["_id"]] = g["n"]
+    return out
+
+
+async def _class_sizes(pairs):
+    """
+    {(dept, sem, course_name): enrolled students} for the given classes.
+    """
+    sizes = {}
+    for dept, sem, course in pairs:
+        q = {"dept": dept, "course_name": course}
+        try:
+            q["sem"] = int(sem)
+        except (TypeError, ValueError):
+            q["sem"] = sem
+        sizes[(dept, sem, course)] = await mongo_module.db["students"].count_documents(q)
+    return sizes
+
+
+def _pct(part, whole):
+    return round(100.0 * part / whole, 2) if whole else None
+
+
+async def subject_summary(start: date, end: date = None, dept=None, sem=None):
+    """
+    Per subject: sessions held, marks, and attendance % against the
+    enrolled headcount of each session's class.
+    """
+    match = {"day": {"$gte": datetime.combine(start, datetime.min.time())}}
+    if end:
+        match["day"]["$lte"] = datetime.combine(end, datetime.min.time())
+    if dept:
+        match["dept"] = dept
+    if sem is not None:
+        match["sem"] = str(sem)
+
+    rows = []
+    async for g in mongo_module.db["attendance_daily"].aggregate([
+        {"$match": match},
+        {"$group": {
+            "_id": {"subject": "$subject", "dept": "$dept", "sem": "$sem",
+                    "course_name": "$course_name"},
+            "sessions": {"$addToSet": "$session_id"},
+            "present": {"$sum": {"$size": "$students"}},
+        }},
+    ]):
+        rows.append(g)
+
+    sizes = await _class_sizes({
+        (g["_id"]["dept"], g["_id"]["sem"], g["_id"]["course_name"]) for g in rows
+    })
+    held = await _held_sessions(start, end, dept=dept, sem=sem)
+
+    subjects = {}
+    for g in rows:
+        k = g["_id"]
+        s = subjects.setdefault(k["subject"], {
+            "subject": k["subject"], "sessions_held": held.get(k["subject"], 0),
+            "sessions_attended": 0, "present": 0, "expected": 0,
+        })
+        size = sizes[(k["dept"], k["sem"], k["course_name"])]
+        s["sessions_attended"] += len(g["sessions"])
+        s["present"] += g["present"]
+        s["expected"] += size * len(g["sessions"])
+
+    for subject, n in held.items():
+        subjects.setdefault(subject, {
+            "subject": subject, "sessions_held": n,
+            "sessions_attended": 0, "present": 0, "expected": 0,
+        })
+
+    out = []
+    for s in subjects.values():
+        s["sessions_held"] = max(s["sessions_held"], s["sessions_attended"])
+        s["percentage"] = _pct(s["present"], s["expected"])
+        out.append(s)
+    return sorted(out, key=lambda s: str(s["subject"]))
+
+
+async def student_summary(student: dict, start: date, end: date = None):
+    """
+    Per subject attended / held for one student (raw `students` doc), plus
+    days present from the monthly bitmaps.
+    """
+    sid = str(student["_id"])
+    match = {
+        "students": sid,
+        "day": {"$gte": datetime.combine(start, datetime.min.time())},
+    }
+    if end:
+        match["day"]["$lte"] = datetime.combine(end, datetime.min.time())
+
+    attended = {}
+    async for g in mongo_module.db["attendance_daily"].aggregate([
+        {"$match": match},
+        {"$group": {"_id": "$subject", "n": {"$sum": 1}}},
+    ]):
+        attended[g["_id"]] = g["n"]
+
+    held = await _held_sessions(
+        start, end,
+        dept=student.get("dept"),
+        sem=student.get("sem"),
+        course_name=student.get("course_name"),
+    )
+
+    subjects = []
+    total_held = total_attended = 0
+    for subject in sorted(set(held) | set(attended), key=str):
+        a = attended.get(subject, 0)
+        h = max(held.get(subject, 0), a)
+        total_held += h
+        total_attended += a
+        subjects.append({
+            "subject": subject,
+            "held": h,
+            "attended": a,
+            "percentage": _pct(a, h),
+        })
+
+    days_present = 0
+    q = {"student_id": sid, "month": {"$gte": start.strftime("%Y-%m")}}
+    if end:
+        q["month"]["$lte"] = end.strftime("%Y-%m")
+    async for p in mongo_module.db["attendance_presence"].find(q):
+        bits = int(p.get("days", 0))
+        year, month = (int(x) for x in p["month"].split("-"))
+        for d in range(31):
+            if bits >> d & 1:
+                day = date(year, month, d + 1)
+                if day >= start and (end is None or day <= end):
+                    days_present += 1
+
+    return {
+        "student_id": sid,
+        "name": student.get("name"),
+        "roll_no": student.get("roll_no"),
+        "held": total_held,
+        "attended": total_attended,
+        "percentage": _pct(total_attended, total_held),
+        "days_present": days_present,
+        "subjects": subjects,
+    }
+
+
+async def class_summary(start: date, end: date = None, dept=None, sem=None, course_name=None):
+    """
+    Attendance % for every student of a class (dept + sem [+ course]).
+    """
+    match = {"day": {"$gte": datetime.combine(start, datetime.min.time())}}
+    if end:
+        match["day"]["$lte"] = datetime.combine(end, datetime.min.time())
+    if dept:
+        match["dept"] = dept
+    if sem is not None:
+        match["sem"] = str(sem)
+    if course_name:
+        match["course_name"] = course_name
+
+    attended = {}
+    async for g in mongo_module.db["attendance_daily"].aggregate([
+        {"$match": match},
+        {"$unwind": "$students"},
+        {"$group": {"_id": "$students", "n": {"$sum": 1}}},
+    ]):
+        attended[g["_id"]] = g["n"]
+
+    held = sum((await _held_sessions(
+        start, end, dept=dept, sem=sem, course_name=course_name
+    )).values())
+
+    student_q = {}
+    if dept:
+        student_q["dept"] = dept
+    if sem is not None:
+        student_q["sem"] = int(sem)
+    if course_name:
+        student_q["course_name"] = course_name
+
+    out = []
+    async for s in mongo_module.db["students"].find(
+        student_q, {"name": 1, "roll_no": 1}
+    ).sort("roll_no", 1):
+        a = attended.get(str(s["_id"]), 0)
+        out.append({
+            "student_id": str(s["_id"]),
+            "roll_no": s.get("roll_no"),
+            "name": s.get("name"),
+            "held": max(held, a),
+            "attended": a,
+            "percentage": _pct(a, max(held, a)),
+        })
+    return out
+
+
+if __name__ == "__main__":
+    import argparse
+    from app.db.mongo import init_db
+
+    parser = argparse.ArgumentParser(description="Rebuild daily attendance rollups")
+    parser.add_argument("--rebuild", action="store_true", required=True)
+    parser.add_argument("--since", type=date.fromisoformat, default=None)
+    args = parser.parse_args()
+
+    async def main():
+        await init_db()
+        n = await rebuild(args.since)
+        print(f"✅ Rebuilt {n} daily rollups")
+
+    asyncio.run(main())
@@ -0,0 +1,296 @@
+# backend/app/services/search_index.py
+import os
+import threading
+import numpy as np
+from app.services.face_engine import score_rows
+
+# "exact" -> brute-force matrix product over the whole gallery
+# "ivf"   -> inverted-file ANN: only the rows of the nprobe closest clusters
+GALLERY_SEARCH_BACKEND = os.getenv("GALLERY_SEARCH_BACKEND", "exact").lower()
+IVF_NLIST = int(os.getenv("IVF_NLIST", "0"))          # 0 -> ~sqrt(N)
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))
+# below this many rows brute force is already faster than probing lists
+IVF_MIN_ROWS = int(os.getenv("IVF_MIN_ROWS", "20000"))
+# lists are rebuilt once rows added / removed since the last build pass
+# this fraction of the gallery (until then they are updated in place)
+IVF_REBUILD_FRACTION = float(os.getenv("IVF_REBUILD_FRACTION", "0.1"))
+
+
+def _top_rows(scores, k):
+    """
+    Column indices of the k best scores of every row, best first.
+    """
+    n = scores.shape[1]
+    k = min(k, n)
+    if k < n:
+        idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        idx = np.tile(np.arange(n), (scores.shape[0], 1))
+    part = np.take_along_axis(scores, idx, axis=1)
+    order = np.argsort(-part, axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(idx, order, axis=1)
+
+
+class ExactIndex:
+    """
+    Brute force: one (M×D)·(D×N) product. Exact, and the fastest option
+    for small and mid-size galleries.
+    """
+
+    name = "exact"
+    exhaustive = True
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+
+    def __len__(self):
+        return len(self.embeddings)
+
+    def search(self, queries, k):
+        """
+        Returns (scores, rows), both M×k, best first.
+        """
+        return _top_rows(score_rows(queries, self.embeddings), k)
+
+
+def train_centroids(embeddings, nlist, iters=10, seed=0):
+    """
+    Spherical k-means on (a sample of) unit-length rows.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(embeddings)
+    sample = embeddings
+    if n > nlist * 64:
+        sample = embeddings[rng.choice(n, nlist * 64, replace=False)]
+    sample = np.asarray(sample, dtype=np.float32)
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+
+    for _ in range(iters):
+        assign = (sample @ centroids.T).argmax(axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        counts = np.bincount(assign, minlength=nlist)
+        empty = counts == 0
+        # re-seed empty lists so every centroid stays useful
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-8)
+    return centroids.astype(np.float32)
+
+
+class InvertedLists:
+    """
+    Rows bucketed by their closest centroid, stored bucket-contiguous so a
+    probed bucket is one slice. `positions[i]` is the gallery row of list
+    row i in the snapshot the index serves; -1 marks a removed row.
+    """
+
+    def __init__(self, rows, positions, assign, nlist):
+        order = np.argsort(assign, kind="stable")
+        self.rows = rows[order]
+        self.positions = positions[order]
+        self.assign = assign[order]
+        counts = np.bincount(assign, minlength=nlist)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def __len__(self):
+        return len(self.positions)
+
+    def remapped(self, remap):
+        """
+        Same rows (shared, not copied) at the positions of a later snapshot.
+        """
+        lists = object.__new__(InvertedLists)
+        lists.rows, lists.assign, lists.offsets = self.rows, self.assign, self.offsets
+        lists.positions = np.where(self.positions >= 0, remap[np.maximum(self.positions, 0)], -1)
+        return lists
+
+
+class IVFIndex:
+    """
+    Inverted-file index: rows are bucketed by their closest centroid and a
+    query only scores the rows of its `nprobe` closest buckets.
+    Rows are stored bucket-contiguous (one extra copy of the gallery), so
+    every probed bucket is scored for all the queries that probe it in one
+    product on a slice instead of gathering rows per query.
+
+    A later snapshot of the gallery gets its index from updated(): the
+    built lists are shared, removed rows are masked out and added rows go
+    to a small second set of lists (the tail), so an enrollment or delete
+    doesn't copy the whole gallery again.
+    """
+
+    name = "ivf"
+    exhaustive = False
+
+    def __init__(self, embeddings, centroids, assign, nprobe=IVF_NPROBE):
+        self.centroids = centroids
+        self.nprobe = min(nprobe, len(centroids))
+        self.size = len(embeddings)
+        self.segments = [
+            InvertedLists(embeddings, np.arange(self.size), assign, len(centroids))
+        ]
+        self.dead = 0
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def tail_rows(self):
+        return sum(len(s) for s in self.segments[1:])
+
+    def updated(self, embeddings, origin, added_assign):
+        """
+        Index for a later snapshot: `origin[j]` is the row of this index's
+        snapshot that row j of `embeddings` came from, -1 for rows added
+        since (assigned to `added_assign`, in row order).
+        """
+        remap = np.full(self.size, -1, dtype=np.int64)
+        kept = np.flatnonzero(origin >= 0)
+        remap[origin[kept]] = kept
+        segments = [s.remapped(remap) for s in self.segments]
+
+        added = np.flatnonzero(origin < 0)
+        if len(added):
+            rows, positions, assign = embeddings[added], added, added_assign
+            if len(segments) > 1:
+                # fold the old tail's live rows into the new one
+                old = segments.pop()
+                live = old.positions >= 0
+                rows = np.concatenate([old.rows[live], rows])
+                positions = np.concatenate([old.positions[live], positions])
+                assign = np.concatenate([old.assign[live], assign])
+            segments.append(InvertedLists(rows, positions, assign, len(self.centroids)))
+
+        index = object.__new__(IVFIndex)
+        index.centroids = self.centroids
+        index.nprobe = self.nprobe
+        index.size = len(embeddings)
+        index.segments = segments
+        index.dead = int(sum(np.count_nonzero(s.positions < 0) for s in segments))
+        return index
+
+    def search(self, queries, k):
+        m = len(queries)
+        probes = _top_rows(queries @ self.centroids.T, self.nprobe)[1]
+        parts_s = [[] for _ in range(m)]
+        parts_r = [[] for _ in range(m)]
+
+        for lists in self.segments:
+            for c in np.unique(probes):
+                lo, hi = lists.offsets[c], lists.offsets[c + 1]
+                if lo == hi:
+                    continue
+                qs = np.flatnonzero((probes == c).any(axis=1))
+                scores = queries[qs] @ lists.rows[lo:hi].T
+                positions = lists.positions[lo:hi]
+                if self.dead:
+                    scores[:, positions < 0] = -np.inf
+                s, r = _top_rows(scores, k)
+                for j, q in enumerate(qs):
+                    parts_s[q].append(s[j])
+                    parts_r[q].append(positions[r[j]])
+
+        all_scores = np.full((m, k), -np.inf, dtype=np.float32)
+        all_rows = np.zeros((m, k), dtype=np.int64)
+        for q in range(m):
+            if not parts_s[q]:
+                continue
+            s, r = _top_rows(np.concatenate(parts_s[q])[None, :], k)
+            all_scores[q, : s.shape[1]] = s[0]
+            all_rows[q, : r.shape[1]] = np.concatenate(parts_r[q])[r[0]]
+        # removed rows can only surface with -inf, which callers skip
+        all_rows[~np.isfinite(all_scores)] = 0
+        return all_scores, all_rows
+
+
+class IVFBackend:
+    """
+    Builds IVF indexes for successive gallery snapshots.
+
+    Centroids are trained once and only retrained when the gallery has
+    doubled since; list assignments are cached per embedding id so a full
+    build only has to assign the rows that were added. Between full
+    builds, update() derives a snapshot's index from the previous one;
+    once added + removed rows pass IVF_REBUILD_FRACTION of the gallery the
+    lists are rebuilt (with the cached assignments, no training).
+    """
+
+    def __init__(self, nlist=IVF_NLIST, nprobe=IVF_NPROBE, min_rows=IVF_MIN_ROWS):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_rows = min_rows
+        self.centroids = None
+        self._trained_rows = 0
+        self._assign = {}
+        self._lock = threading.Lock()
+
+    def build(self, embeddings, embedding_ids):
+        n = len(embeddings)
+        if n < self.min_rows:
+            return ExactIndex(embeddings)
+
+        with self._lock:
+            if self.centroids is None or n > 2 * self._trained_rows:
+                nlist = self.nlist or max(1, int(np.sqrt(n)))
+                self.centroids = train_centroids(embeddings, min(nlist, n))
+                self._trained_rows = n
+                self._assign = {}
+
+            assign = np.empty(n, dtype=np.int64)
+            missing = []
+            for i, eid in enumerate(embedding_ids):
+                a = self._assign.get(eid)
+                if a is None:
+                    missing.append(i)
+                else:
+                    assign[i] = a
+            if missing:
+                missing = np.array(missing)
+                assign[missing] = (embeddings[missing] @ self.centroids.T).argmax(axis=1)
+            # keep only ids that still exist so removals don't accumulate
+            self._assign = dict(zip(embedding_ids, assign.tolist()))
+
+            return IVFIndex(embeddings, self.centroids, assign, self.nprobe)
+
+    def update(self, index, embeddings, embedding_ids, origin):
+        """
+        Index for a snapshot derived from the one `index` serves (see
+        IVFIndex.updated for `origin`).
+        """
+        n = len(embeddings)
+        if (
+            not isinstance(index, IVFIndex)
+            or n < self.min_rows
+            or index.centroids is not self.centroids
+            or n > 2 * self._trained_rows
+        ):
+            return self.build(embeddings, embedding_ids)
+
+        with self._lock:
+            added = np.flatnonzero(origin < 0)
+            assign = np.empty(0, dtype=np.int64)
+            if len(added):
+                assign = (embeddings[added] @ self.centroids.T).argmax(axis=1)
+                for i, a in zip(added.tolist(), assign.tolist()):
+                    self._assign[embedding_ids[i]] = a
+            updated = index.updated(embeddings, origin, assign)
+        if updated.tail_rows + updated.dead > IVF_REBUILD_FRACTION * n:
+            return self.build(embeddings, embedding_ids)
+        return updated
+
+
+class ExactBackend:
+    def build(self, embeddings, embedding_ids):
+        return ExactIndex(embeddings)
+
+    def update(self, index, embeddings, embedding_ids, origin):
+        return ExactIndex(embeddings)
+
+
+def make_backend(name: str = None):
+    name = (name or GALLERY_SEARCH_BACKEND).lower()
+    if name == "ivf":
+        return IVFBackend()
+    if name == "exact":
+        return ExactBackend()
+    raise ValueError(f"Unknown GALLERY_SEARCH_BACKEND: {name}")
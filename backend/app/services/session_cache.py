@@ -0,0 +1,46 @@
+# backend/app/services/session_cache.py
+from bson import ObjectId
+from app.db import mongo as mongo_module
+
+# sessions are never edited after creation, so a looked-up session can be
+# kept for the life of the process (bounded, oldest evicted first)
+MAX_CACHED_SESSIONS = 1024
+
+_sessions = {}
+
+
+async def get_session(session_id):
+    """
+    Raw `sessions` document for session_id, or None.
+    Only the first call per session reaches Mongo.
+    """
+    if not session_id:
+        return None
+    session_id = str(session_id)
+    doc = _sessions.get(session_id)
+    if doc is not None:
+        return doc
+
+    try:
+        oid = ObjectId(session_id)
+    except Exception:
+        return None
+
+    doc = await mongo_module.db["sessions"].find_one({"_id": oid})
+    if doc is None:
+        return None
+
+    if len(_sessions) >= MAX_CACHED_SESSIONS:
+        _sessions.pop(next(iter(_sessions)))
+    _sessions[session_id] = doc
+    return doc
+
+
+def remember_session(session):
+    """
+    Seed the cache from a freshly created SessionModel.
+    """
+    doc = session.dict()
+    doc["_id"] = session.id
+    doc.pop("id", None)
+    _sessions[str(session.id)] = doc
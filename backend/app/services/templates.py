@@ -0,0 +1,167 @@
+# backend/app/services/templates.py
+"""
+Per-student templates: one centroid (and optional k-medoid exemplars) per
+student, searched before the raw enrollment images.
+
+Off by default. Students without templates are still matched on their raw
+images, but to switch an existing deployment on, build templates for
+everyone enrolled so far first:
+
+    cd backend
+    TEMPLATE_MODE=centroid python -m app.services.templates --rebuild
+"""
+import os
+import asyncio
+import numpy as np
+from beanie import PydanticObjectId
+from app.db.models_mongo import FaceTemplate
+from app.services.face_engine import normalize_rows
+from app.services.embedding_codec import encode_fields
+
+# "off"     -> match raw enrollment images only (old behaviour)
+# "centroid"-> one mean template per student
+# "medoids" -> centroid + up to TEMPLATE_EXEMPLARS k-medoid exemplars
+TEMPLATE_MODE = os.getenv("TEMPLATE_MODE", "off").lower()
+TEMPLATE_EXEMPLARS = int(os.getenv("TEMPLATE_EXEMPLARS", "2"))
+
+# template scores within this distance of the threshold are re-checked
+# against the raw enrollment images of the shortlisted students
+TEMPLATE_MARGIN = float(os.getenv("TEMPLATE_MARGIN", "0.05"))
+TEMPLATE_SHORTLIST = int(os.getenv("TEMPLATE_SHORTLIST", "3"))
+
+
+def templates_enabled() -> bool:
+    return TEMPLATE_MODE in ("centroid", "medoids")
+
+
+def centroid(embeddings) -> np.ndarray:
+    """
+    Unit-length mean of a student's (unit-length) embeddings.
+    """
+    e = normalize_rows(embeddings)
+    return normalize_rows(e.mean(axis=0))[0]
+
+
+def k_medoids(embeddings, k: int, max_iter: int = 20) -> np.ndarray:
+    """
+    Indices of k medoids under cosine distance.
+    Farthest-first initialisation from the most central image, then
+    alternate assign / re-pick until the medoids stop moving.
+    """
+    e = normalize_rows(embeddings)
+    n = len(e)
+    if k >= n:
+        return np.arange(n)
+
+    dist = 1.0 - e @ e.T
+    medoids = [int(dist.sum(axis=1).argmin())]
+    while len(medoids) < k:
+        medoids.append(int(dist[:, medoids].min(axis=1).argmax()))
+    medoids = np.array(medoids)
+
+    for _ in range(max_iter):
+        assign = dist[:, medoids].argmin(axis=1)
+        updated = medoids.copy()
+        for c in range(k):
+            members = np.flatnonzero(assign == c)
+            if len(members):
+                within = dist[np.ix_(members, members)].sum(axis=1)
+                updated[c] = members[within.argmin()]
+        if np.array_equal(updated, medoids):
+            break
+        medoids = updated
+    return medoids
+
+
+def build_templates(embeddings, mode: str = None, exemplars: int = None):
+    """
+    Returns [(kind, unit_vector), ...] for one student.
+    """
+    mode = mode or TEMPLATE_MODE
+    exemplars = TEMPLATE_EXEMPLARS if exemplars is None else exemplars
+    e = normalize_rows(embeddings)
+    if not len(e):
+        return []
+
+    out = [("centroid", centroid(e))]
+    if mode == "medoids" and exemplars > 0 and len(e) > 1:
+        for i in k_medoids(e, exemplars):
+            out.append(("medoid", e[i]))
+    return out
+
+
+async def save_student_templates(student, embeddings, mode: str = None):
+    """
+    Rebuild and persist the templates of one student.
+    Returns (template_ids, template_matrix) for the in-memory gallery.
+    """
+    sid = str(student.id)
+    await FaceTemplate.find({"student_id": sid}).delete()
+
+    built = build_templates(embeddings, mode)
+    if not built:
+        return [], []
+
+    # ids assigned up front so they are known without re-reading
+    docs = [
+        FaceTemplate(
+            id=PydanticObjectId(),
+            student_id=sid,
+            kind=kind,
+            **encode_fields(vec),
+            source_images=len(embeddings),
+        )
+        for kind, vec in built
+    ]
+    await FaceTemplate.insert_many(docs)
+    return [d.id for d in docs], np.stack([vec for _, vec in built])
+
+
+async def rebuild_all(mode: str = None):
+    """
+    Templates for every student, from the images stored in face_embeddings.
+    Returns the number of students templated. Running API workers pick the
+    new templates up on their next gallery load / sync.
+    """
+    from types import SimpleNamespace
+    from app.db import mongo as mongo_module
+    from app.services.embedding_codec import decode_many
+
+    mode = mode or TEMPLATE_MODE
+    done = 0
+    async for g in mongo_module.db["face_embeddings"].aggregate([
+        {"$group": {
+            "_id": "$student_id",
+            # rows written before formats existed have no embedding_format
+            "rows": {"$push": {
+                "data": "$embedding",
+                "fmt": {"$ifNull": ["$embedding_format", None]},
+            }},
+        }},
+    ], allowDiskUse=True):
+        rows = g["rows"]
+        vecs, _ = decode_many([r["data"] for r in rows], [r["fmt"] for r in rows])
+        if not len(vecs):
+            continue
+        await save_student_templates(SimpleNamespace(id=g["_id"]), vecs, mode)
+        done += 1
+    return done
+
+
+if __name__ == "__main__":
+    import argparse
+    from app.db.mongo import init_db
+
+    parser = argparse.ArgumentParser(description="Backfill per-student templates")
+    parser.add_argument("--rebuild", action="store_true", required=True)
+    parser.add_argument("--mode", choices=["centroid", "medoids"], default=None,
+                        help="default: TEMPLATE_MODE (centroid when that is off)")
+    args = parser.parse_args()
+
+    async def main():
+        await init_db()
+        mode = args.mode or (TEMPLATE_MODE if templates_enabled() else "centroid")
+        n = await rebuild_all(mode)
+        print(f"✅ Built {mode} templates for {n} students")
+
+    asyncio.run(main())
@@ -0,0 +1,123 @@
+# backend/app/services/warmup.py
+import os
+import time
+import asyncio
+from app.services import face_engine
+from app.services.detection_profiles import PROFILES
+from app.services.inference_pool import inference_pool
+from app.services.micro_batch import RECOGNITION_BATCHING, RECOGNITION_MAX_BATCH
+
+# load the model and run it once per shape at startup, instead of on the
+# first request; /health/ready stays 503 until it is done
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "false").lower() == "true"
+# /health/ready gives Mongo (and the inference server) this long to answer a ping
+READY_PING_TIMEOUT_S = float(os.getenv("READY_PING_TIMEOUT_S", "1"))
+
+
+async def _ping_inference_server():
+    from app.services.inference_server import ping
+
+    loop = asyncio.get_running_loop()
+    return await asyncio.wait_for(
+        loop.run_in_executor(None, ping, READY_PING_TIMEOUT_S),
+        timeout=READY_PING_TIMEOUT_S + 1,
+    )
+
+
+def _batch_sizes():
+    # a spread of the batch sizes the micro-batcher sends, up to its cap
+    if not RECOGNITION_BATCHING:
+        return [1]
+    sizes, n = [], 1
+    while n < RECOGNITION_MAX_BATCH:
+        sizes.append(n)
+        n *= 2
+    return sizes + [RECOGNITION_MAX_BATCH]
+
+
+class Readiness:
+    """
+    What /health/ready reports: startup finished, gallery loaded, Mongo
+    and (INFERENCE_MODE=server) the inference server reachable and, when
+    enabled, the face engine warmed up.
+    """
+
+    def __init__(self):
+        self.started = False
+        self.warmup = "disabled"   # "disabled" | "running" | "done" | "failed"
+        self.warmup_timings = {}
+        self.warmup_s = None
+        self._task = None
+
+    async def _warm(self):
+        self.warmup = "running"
+        t = time.perf_counter()
+        try:
+            if face_engine.INFERENCE_MODE == "server":
+                # the inference server's workers warm themselves up; only
+                # make sure it is there
+                await _ping_inference_server()
+                self.warmup_timings = {}
+            else:
+                # one run is enough: every pool thread shares the same ONNX
+                # Runtime sessions, which plan each shape the first time it runs
+                self.warmup_timings = await inference_pool.run_admitted(
+                    face_engine.warm_up, list(PROFILES.values()), _batch_sizes()
+                )
+            self.warmup = "done"
+            self.warmup_s = round(time.perf_counter() - t, 2)
+            print(f"🔥 Face engine warmed up in {self.warmup_s}s")
+        except Exception as e:
+            self.warmup = "failed"
+            print("❌ face engine warm-up failed:", e)
+
+    def start_warmup(self):
+        if WARMUP_ON_STARTUP and self._task is None:
+            self.warmup = "running"
+            self._task = asyncio.ensure_future(self._warm())
+
+    async def check(self, gallery):
+        from app.db import mongo as mongo_module
+
+        checks = {
+            "startup": self.started,
+            "gallery": gallery.ready,
+            # a failed warm-up still serves, just with a slow first request
+            "warmup": self.warmup in ("disabled", "done", "failed"),
+        }
+        try:
+            await asyncio.wait_for(
+                mongo_module.db.command("ping"), timeout=READY_PING_TIMEOUT_S
+            )
+            checks["mongo"] = True
+        except Exception:
+            checks["mongo"] = False
+        # without the unique index a mark can be written twice
+        checks["mark_index"] = False
+        if checks["mongo"]:
+            try:
+                checks["mark_index"] = await asyncio.wait_for(
+                    mongo_module.has_unique_marks(), timeout=READY_PING_TIMEOUT_S
+                )
+            except Exception:
+                pass
+        if face_engine.INFERENCE_MODE == "server":
+            try:
+                await _ping_inference_server()
+                checks["inference_server"] = True
+            except Exception:
+                checks["inference_server"] = False
+        return all(checks.values()), checks
+
+    def stats(self):
+        from app.db import mongo as mongo_module
+
+        return {
+            "warmup": self.warmup,
+            "warmup_s": self.warmup_s,
+            "timings_ms": self.warmup_timings,
+            "missing_indexes": mongo_module.missing_indexes,
+        }
+
+
+readiness = Readiness()
@@ -0,0 +1,351 @@
+# backend/benchmarks/bench_load.py
+"""
+End-to-end load test of the API: recognize, mark, preview and export
+under concurrent clients, with p50 / p95 / p99 and throughput per endpoint.
+
+    cd backend
+    # in-process app (httpx ASGI transport) on a scratch database, e.g. of
+    # the mongo service in docker-compose.mongo.yml or any local mongod
+    python -m benchmarks.bench_load --mongo-uri mongodb://localhost:27017/attendance_bench \
+        --students 1000 --concurrency 16 --out load.json
+
+    # a running server started on that same scratch database; it picks the
+    # seeded students up through its gallery sync
+    python -m benchmarks.bench_load --mongo-uri mongodb://localhost:27017/attendance_bench \
+        --url http://localhost:8000
+
+    python -m benchmarks.bench_load --mongo-uri ... --baseline load.json   # exit 1 on regressions
+
+The run writes to and deletes from --mongo-uri, and the in-process app
+runs its startup there, so it must be given explicitly and must not be
+the app's own MONGODB_URI database.
+
+Seeds `--students` synthetic students (dept BENCH) with random unit
+embeddings, one open session for the mark / recognize traffic and a week
+of attendance logs for preview / export; all of it is deleted afterwards
+unless --keep. Recognize posts synthetic face frames (or --images).
+
+Latencies and throughput count 2xx responses only; everything else shows
+up in `failed` / `status`.
+"""
+import os
+
+# a benchmark run must not replace the real gallery snapshot or follow
+# other workers; set before the app is imported
+os.environ.setdefault("GALLERY_SNAPSHOT_PATH", "")
+os.environ.setdefault("GALLERY_SYNC", "off")
+
+import argparse
+import asyncio
+import itertools
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+import httpx
+import numpy as np
+from bson import ObjectId
+from benchmarks.common import (
+    summarize, image_set, parse_sizes, emit, check_regressions,
+)
+
+SCENARIOS = ("recognize", "mark", "preview", "export")
+BENCH_DEPT = "BENCH"
+# seeded roll / exam numbers start here, clear of real students
+ROLL_BASE = 900_000_000
+API = "/api/v1"
+
+
+# =========================
+# SEEDING
+# =========================
+async def seed(students, images, logs_per_day, run_id, announce=False):
+    """
+    Insert the synthetic data set. Returns ids the scenarios use.
+    `announce` logs the students to gallery_changes for running servers.
+    """
+    from app.db import mongo as mongo_module
+    from app.db.models_mongo import Student, FaceEmbedding, SessionModel, AttendanceLog
+    from app.services.embedding_codec import encode_fields
+    from benchmarks.bench_search import synthetic_gallery
+
+    existing = await Student.find({"roll_no": {"$gte": ROLL_BASE}}).count()
+    roll0 = ROLL_BASE + existing
+    docs = [
+        Student(
+            roll_no=roll0 + i,
+            exam_no=roll0 + i,
+            name=f"Bench Student {i}",
+            course_name="Benchmark",
+            dept=BENCH_DEPT,
+            sem=1,
+            enrolled_images=images,
+            enroll_status="COMPLETED",
+        )
+        for i in range(students)
+    ]
+    res = await Student.insert_many(docs)
+    sids = [str(i) for i in res.inserted_ids]
+
+    _, labels, rows = synthetic_gallery(students * images, images=images)
+    await FaceEmbedding.insert_many([
+        FaceEmbedding(student_id=sids[label], **encode_fields(row))
+        for label, row in zip(labels, rows)
+    ])
+
+    now = datetime.now(timezone.utc)
+    live = SessionModel(
+        dept=BENCH_DEPT, sem="1", subject=f"bench-{run_id}", course_name="Benchmark",
+        start_time=now - timedelta(minutes=10), end_time=now + timedelta(hours=2),
+        duration_mins=130,
+    )
+    await live.insert()
+
+    # one past session a day for a week, `logs_per_day` marks each
+    rng = np.random.default_rng(0)
+    session_ids, logs = [str(live.id)], []
+    for day in range(1, 8):
+        start = now - timedelta(days=day)
+        past = SessionModel(
+            dept=BENCH_DEPT, sem="1", subject=f"bench-{run_id}-{day}", course_name="Benchmark",
+            start_time=start, end_time=start + timedelta(hours=1), duration_mins=60,
+        )
+        await past.insert()
+        session_ids.append(str(past.id))
+        present = rng.choice(students, size=min(logs_per_day, students), replace=False)
+        logs.extend(
+            AttendanceLog(
+                session_id=str(past.id), student_id=sids[i], student_name=f"Bench Student {i}",
+                date=start.date(), in_time=start, confidence=0.9,
+            )
+            for i in present
+        )
+    if logs:
+        await AttendanceLog.insert_many(logs)
+
+    if announce:
+        # running servers reload these students through their gallery sync
+        at = datetime.utcnow()
+        await mongo_module.db["gallery_changes"].insert_many([
+            {"student_id": sid, "op": "add", "at": at, "origin": f"bench:{run_id}"} for sid in sids
+        ])
+    return {"students": sids, "session_id": str(live.id), "session_ids": session_ids, "logs": len(logs)}
+
+
+async def cleanup(seeded, run_id, announce=False):
+    from app.db import mongo as mongo_module
+
+    db = mongo_module.db
+    sids, sessions = seeded["students"], seeded["session_ids"]
+    await db["face_embeddings"].delete_many({"student_id": {"$in": sids}})
+    await db["face_templates"].delete_many({"student_id": {"$in": sids}})
+    await db["attendance_logs"].delete_many({"session_id": {"$in": sessions}})
+    await db["attendance_daily"].delete_many({"session_id": {"$in": sessions}})
+    await db["attendance_presence"].delete_many({"student_id": {"$in": sids}})
+    await db["sessions"].delete_many({"subject": {"$regex": f"^bench-{run_id}"}})
+    await db["students"].delete_many({"_id": {"$in": [ObjectId(s) for s in sids]}})
+    if announce:
+        await db["gallery_changes"].insert_many([
+            {"student_id": sid, "op": "remove", "at": datetime.utcnow(), "origin": f"bench:{run_id}"}
+            for sid in sids
+        ])
+
+
+# =========================
+# LOAD
+# =========================
+def requests_for(seeded, frames, profile):
+    """
+    scenario -> async fn(client, i) sending the i-th request.
+    """
+    students = seeded["students"]
+
+    async def recognize(client, i):
+        label, data = frames[i % len(frames)]
+        return await client.post(
+            f"{API}/recognize/",
+            params={"profile": profile},
+            data={"session_id": seeded["session_id"]},
+            files={"file": (f"{label}.jpg", data, "image/jpeg")},
+        )
+
+    async def mark(client, i):
+        # one student per request; past the roster they come back 400 (already marked)
+        sid = students[i % len(students)]
+        return await client.post(
+            f"{API}/sessions/{seeded['session_id']}/mark",
+            json={"student_id": sid, "student_name": "Bench", "confidence": 0.9},
+        )
+
+    async def preview(client, i):
+        return await client.get(
+            f"{API}/attendance/preview", params={"range": "week", "dept": BENCH_DEPT}
+        )
+
+    async def export(client, i):
+        return await client.get(
+            f"{API}/attendance/export",
+            params={"range": "week", "dept": BENCH_DEPT, "format": "csv"},
+        )
+
+    return {"recognize": recognize, "mark": mark, "preview": preview, "export": export}
+
+
+async def run_scenario(client, name, send, total, concurrency, warmup):
+    for i in range(warmup):
+        await send(client, i)
+
+    times, statuses = [], Counter()
+    counter = itertools.count(warmup)
+    last = warmup + total
+
+    async def worker():
+        while True:
+            i = next(counter)
+            if i >= last:
+                return
+            t = time.perf_counter()
+            try:
+                r = await send(client, i)
+                status = str(r.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            statuses[status] += 1
+            # a fast 429 / 500 isn't a fast request: only successes are timed
+            if status.startswith("2"):
+                times.append((time.perf_counter() - t) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    return {
+        "name": name,
+        "concurrency": concurrency,
+        "requests": total,
+        **summarize(times, elapsed),
+        "failed": total - len(times),
+        "status": dict(statuses),
+    }
+
+
+def _database(uri):
+    # (hosts, database) a URI points at; the app falls back to attendance_db
+    from pymongo.uri_parser import parse_uri
+
+    parsed = parse_uri(uri)
+    return sorted(parsed["nodelist"]), parsed["database"] or "attendance_db"
+
+
+def _app_mongo_uri():
+    from dotenv import dotenv_values
+
+    return os.environ.get("MONGODB_URI") or dotenv_values(".env").get("MONGODB_URI")
+
+
+async def run(args):
+    run_id = uuid.uuid4().hex[:8]
+    frames = image_set(args.images, parse_sizes(args.frames), args.frame_faces)
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+
+    async def drive(client, seeded):
+        send = requests_for(seeded, frames, args.profile)
+        out = []
+        for name in scenarios:
+            print(f"⏱️ {name}: {args.requests} requests, {args.concurrency} clients")
+            out.append(await run_scenario(
+                client, name, send[name], args.requests, args.concurrency, args.warmup
+            ))
+        return out
+
+    timeout = httpx.Timeout(args.timeout)
+    if args.url:
+        from app.db.mongo import init_db
+
+        await init_db()
+        seeded = await seed(
+            args.students, args.images_per_student, args.logs_per_day, run_id, announce=True
+        )
+        try:
+            # give the server's gallery sync a moment to load the students
+            await asyncio.sleep(args.settle)
+            async with httpx.AsyncClient(base_url=args.url, timeout=timeout) as client:
+                results = await drive(client, seeded)
+        finally:
+            if not args.keep:
+                await cleanup(seeded, run_id, announce=True)
+    else:
+        from main import app
+        from app.services.gallery import gallery
+
+        async with app.router.lifespan_context(app):
+            seeded = await seed(args.students, args.images_per_student, args.logs_per_day, run_id)
+            try:
+                await gallery.load()
+                # a failing request counts as a 500, it doesn't end the run
+                transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+                async with httpx.AsyncClient(
+                    transport=transport, base_url="http://bench", timeout=timeout
+                ) as client:
+                    results = await drive(client, seeded)
+            finally:
+                if not args.keep:
+                    await cleanup(seeded, run_id)
+
+    hosts, database = _database(args.mongo_uri)
+    meta = {
+        "target": args.url or "in-process",
+        "database": f"{','.join(f'{h}:{port}' for h, port in hosts)}/{database}",
+        "students": args.students,
+        "gallery_rows": args.students * args.images_per_student,
+        "attendance_logs": seeded["logs"],
+        "frames": [label for label, _ in frames],
+        "profile": args.profile,
+    }
+    return results, meta
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    p.add_argument("--mongo-uri", required=True,
+                   help="scratch database to seed and run against (not the app's MONGODB_URI)")
+    p.add_argument("--scenarios", default=",".join(SCENARIOS))
+    p.add_argument("--students", type=int, default=1000)
+    p.add_argument("--images-per-student", type=int, default=3)
+    p.add_argument("--logs-per-day", type=int, default=500)
+    p.add_argument("--requests", type=int, default=200, help="per scenario")
+    p.add_argument("--concurrency", type=int, default=8)
+    p.add_argument("--warmup", type=int, default=5, help="untimed requests per scenario")
+    p.add_argument("--frames", default="1280x720", help="synthetic recognize frame sizes")
+    p.add_argument("--frame-faces", type=int, default=4)
+    p.add_argument("--images", help="directory of real photos for recognize")
+    p.add_argument("--profile", default="default", help="detection profile for recognize")
+    p.add_argument("--timeout", type=float, default=60)
+    p.add_argument("--settle", type=float, default=5, help="--url only: seconds before load starts")
+    p.add_argument("--keep", action="store_true", help="leave the seeded data in place")
+    p.add_argument("--out")
+    p.add_argument("--baseline", help="earlier --out report; exit 1 when a p95 regressed")
+    p.add_argument("--tolerance", type=float, default=0.2)
+    args = p.parse_args()
+
+    unknown = {s.strip() for s in args.scenarios.split(",") if s.strip()} - set(SCENARIOS)
+    if unknown:
+        p.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+    try:
+        target = _database(args.mongo_uri)
+    except Exception as e:
+        p.error(f"invalid --mongo-uri: {e}")
+    app_uri = _app_mongo_uri()
+    if app_uri and _database(app_uri) == target:
+        p.error("--mongo-uri is the app's MONGODB_URI database; use a scratch database")
+
+    # app.db.mongo connects to MONGODB_URI when first imported
+    os.environ["MONGODB_URI"] = args.mongo_uri
+    results, meta = asyncio.run(run(args))
+    report = emit("load", results, args.out, meta=meta)
+    if args.baseline:
+        raise SystemExit(check_regressions(report, args.baseline, args.tolerance))
+
+
+if __name__ == "__main__":
+    main()
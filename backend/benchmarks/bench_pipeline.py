@@ -0,0 +1,153 @@
+# backend/benchmarks/bench_pipeline.py
+"""
+Microbenchmarks of the recognition pipeline, one stage at a time.
+
+    cd backend
+    python -m benchmarks.bench_pipeline --out pipeline.json
+    python -m benchmarks.bench_pipeline --only match --sizes 1000,10000,100000
+    python -m benchmarks.bench_pipeline --only decode,faces --images ./photos
+    python -m benchmarks.bench_pipeline --baseline pipeline.json   # exit 1 on regressions
+
+    match   match_embedding (one face, list of enrolled dicts) and
+            match_embeddings (a frame's faces against the prepared matrix)
+            on synthetic galleries of --sizes rows
+    decode  read_imagefile (full decode) vs ingest.decode_image (reduced
+            decode for each detection profile) on JPEGs of --frames sizes
+    faces   get_faces_and_embeddings per detection profile, plus detection
+            and batched embedding on their own (needs the face model)
+
+Images are synthetic drawn faces unless --images points at real photos;
+synthetic faces exercise decode / resize / detection cost, but the
+detector may not find them, so use real photos for embed timings.
+"""
+import argparse
+import io
+import numpy as np
+import cv2
+from app.services import face_engine
+from app.services.detection_profiles import PROFILES
+from app.services.ingest import decode_image
+from app.services.search_index import ExactIndex
+from app.utils.image import read_imagefile
+from benchmarks.bench_search import synthetic_gallery, synthetic_queries
+from benchmarks.common import time_calls, image_set, parse_sizes, emit, check_regressions
+
+SECTIONS = ("match", "decode", "faces")
+
+
+def bench_match(sizes, faces, repeat):
+    results = []
+    for n in sizes:
+        centres, labels, rows = synthetic_gallery(n)
+        sids = labels.astype(str).astype(object)
+        _, queries = synthetic_queries(centres, faces)
+        # the shape the old per-request path built from Mongo rows
+        enrolled = [
+            {"embedding": r, "student_id": s, "name": s} for r, s in zip(rows, sids)
+        ]
+        index = ExactIndex(rows)
+        # the big gallery makes the legacy path slow; fewer runs
+        legacy_repeat = max(3, repeat // max(1, n // 10000))
+        results.append({
+            "rows": n,
+            "faces": faces,
+            "match_embedding": time_calls(
+                lambda: face_engine.match_embedding(queries[0], enrolled), legacy_repeat
+            ),
+            "match_embeddings": time_calls(
+                lambda: face_engine.match_embeddings(queries, rows, sids, sids, index=index),
+                repeat,
+            ),
+        })
+    return results
+
+
+def bench_decode(images, repeat):
+    results = []
+    for label, data in images:
+        entry = {
+            "image": label,
+            "bytes": len(data),
+            "read_imagefile": time_calls(lambda: read_imagefile(io.BytesIO(data)), repeat),
+            "decode_image": {},
+        }
+        for name, profile in PROFILES.items():
+            frame = decode_image(data, profile.max_side)
+            entry["decode_image"][name] = {
+                "decoded": f"{frame.image.shape[1]}x{frame.image.shape[0]}",
+                **time_calls(lambda: decode_image(data, profile.max_side), repeat),
+            }
+        results.append(entry)
+    return results
+
+
+def bench_faces(images, repeat, batch_sizes):
+    face_engine.warm_up(list(PROFILES.values()), batch_sizes)
+    results = []
+    for label, data in images:
+        img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        entry = {"image": label, "profiles": {}}
+        for name, profile in PROFILES.items():
+            found = face_engine.get_faces_and_embeddings(img, profile)
+            entry["profiles"][name] = {
+                "faces_found": len(found),
+                "get_faces_and_embeddings": time_calls(
+                    lambda: face_engine.get_faces_and_embeddings(img, profile), repeat
+                ),
+                "detect_and_align": time_calls(
+                    lambda: face_engine.detect_and_align(img, profile), repeat
+                ),
+            }
+        results.append(entry)
+
+    # recognition alone, on zero crops: its cost doesn't depend on the face
+    embed = {}
+    for n in batch_sizes:
+        crops = list(np.zeros((n, 112, 112, 3), dtype=np.uint8))
+        s = time_calls(lambda: face_engine.embed_crops(crops), repeat)
+        s["per_face_ms"] = round(s["mean_ms"] / n, 3)
+        embed[str(n)] = s
+    return {"images": results, "embed_crops": embed}
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--only", default=",".join(SECTIONS), help="comma list of " + ", ".join(SECTIONS))
+    p.add_argument("--sizes", default="1000,10000,100000", help="gallery rows")
+    p.add_argument("--faces", type=int, default=8, help="faces per frame for match_embeddings")
+    p.add_argument("--frames", default="640x480,1280x720,1920x1080,4000x3000", help="synthetic frame sizes")
+    p.add_argument("--frame-faces", type=int, default=4, help="faces drawn per synthetic frame")
+    p.add_argument("--images", help="directory of real photos instead of synthetic frames")
+    p.add_argument("--batch-sizes", default="1,4,16")
+    p.add_argument("--repeat", type=int, default=20)
+    p.add_argument("--out")
+    p.add_argument("--baseline", help="earlier --out report; exit 1 when a p95 regressed")
+    p.add_argument("--tolerance", type=float, default=0.2)
+    args = p.parse_args()
+
+    only = [s.strip() for s in args.only.split(",") if s.strip()]
+    unknown = set(only) - set(SECTIONS)
+    if unknown:
+        p.error(f"unknown section(s): {', '.join(sorted(unknown))}")
+
+    images = None
+    if "decode" in only or "faces" in only:
+        images = image_set(args.images, parse_sizes(args.frames), args.frame_faces)
+
+    results = {}
+    if "match" in only:
+        results["match"] = bench_match([int(s) for s in args.sizes.split(",")], args.faces, args.repeat)
+    if "decode" in only:
+        results["decode"] = bench_decode(images, args.repeat)
+    if "faces" in only:
+        results["faces"] = bench_faces(
+            images, args.repeat, [int(s) for s in args.batch_sizes.split(",")]
+        )
+
+    report = emit("pipeline", results, args.out, meta={"repeat": args.repeat})
+    if args.baseline:
+        raise SystemExit(check_regressions(report, args.baseline, args.tolerance))
+
+
+if __name__ == "__main__":
+    main()
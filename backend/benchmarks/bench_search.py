@@ -0,0 +1,125 @@
+# backend/benchmarks/bench_search.py
+"""
+Recall-vs-latency of the gallery search backends against the exact path.
+
+    cd backend
+    python -m benchmarks.bench_search --sizes 10000,100000 --nprobe 1,4,8,16,32
+
+Galleries are synthetic: `--images` noisy unit vectors around one random
+centre per student, queries are fresh noisy samples of random students.
+Prints one JSON document (also written to --out when given).
+"""
+import argparse
+import json
+import time
+import numpy as np
+from app.services.face_engine import normalize_rows, match_embeddings
+from app.services.search_index import ExactIndex, IVFBackend
+
+
+def _jitter(centres, spread, rng):
+    """
+    Unit vectors at roughly 1/sqrt(1+spread²) cosine from their centre;
+    spread=0.8 gives ~0.6 between two images of the same student, about
+    what buffalo_s produces for real enrollment photos.
+    """
+    noise = normalize_rows(rng.standard_normal(centres.shape))
+    return normalize_rows(centres + spread * noise)
+
+
+def synthetic_gallery(n_rows, images=5, dim=512, spread=0.8, seed=0):
+    rng = np.random.default_rng(seed)
+    students = max(1, n_rows // images)
+    centres = normalize_rows(rng.standard_normal((students, dim)))
+    labels = np.arange(n_rows) % students
+    return centres, labels, _jitter(centres[labels], spread, rng)
+
+
+def synthetic_queries(centres, n, spread=0.8, seed=1):
+    rng = np.random.default_rng(seed)
+    who = rng.integers(0, len(centres), n)
+    return who, _jitter(centres[who], spread, rng)
+
+
+def timed(fn, repeat):
+    times = []
+    out = None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        out = fn()
+        times.append((time.perf_counter() - t) * 1000)
+    return out, float(np.median(times))
+
+
+def run(sizes, nprobes, faces, repeat, images):
+    report = []
+    for n in sizes:
+        centres, labels, rows = synthetic_gallery(n, images=images)
+        ids = np.arange(n).astype(str).astype(object)
+        sids = labels.astype(str).astype(object)
+        who, queries = synthetic_queries(centres, faces)
+
+        exact = ExactIndex(rows)
+        truth, exact_ms = timed(
+            lambda: match_embeddings(queries, rows, sids, sids, index=exact), repeat
+        )
+        truth_ids = [m["student_id"] for m in truth]
+        entry = {
+            "rows": n,
+            "faces": faces,
+            "exact": {
+                "latency_ms": round(exact_ms, 3),
+                "accuracy": float(np.mean([t == str(w) for t, w in zip(truth_ids, who)])),
+            },
+            "ivf": [],
+        }
+
+        backend = IVFBackend(min_rows=0)
+        t = time.perf_counter()
+        backend.build(rows, ids)
+        entry["ivf_build_ms"] = round((time.perf_counter() - t) * 1000, 1)
+        entry["ivf_nlist"] = int(len(backend.centroids))
+
+        for nprobe in nprobes:
+            backend.nprobe = nprobe
+            index = backend.build(rows, ids)
+            got, ms = timed(
+                lambda: match_embeddings(queries, rows, sids, sids, index=index), repeat
+            )
+            got_ids = [m["student_id"] for m in got]
+            entry["ivf"].append({
+                "nprobe": nprobe,
+                "latency_ms": round(ms, 3),
+                "recall_at_1": float(np.mean([a == b for a, b in zip(got_ids, truth_ids)])),
+                "speedup": round(exact_ms / ms, 2) if ms else None,
+            })
+        report.append(entry)
+    return report
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--sizes", default="10000,100000")
+    p.add_argument("--nprobe", default="1,4,8,16,32")
+    p.add_argument("--faces", type=int, default=40, help="faces per frame")
+    p.add_argument("--images", type=int, default=5, help="images per student")
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--out")
+    args = p.parse_args()
+
+    report = run(
+        [int(s) for s in args.sizes.split(",")],
+        [int(s) for s in args.nprobe.split(",")],
+        args.faces,
+        args.repeat,
+        args.images,
+    )
+    text = json.dumps({"benchmark": "gallery_search", "results": report}, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+# backend/benchmarks/common.py
+"""
+Helpers shared by the benchmarks: latency summaries, synthetic face
+images, JSON output and comparison against a saved baseline.
+"""
+import glob
+import json
+import os
+import time
+import numpy as np
+import cv2
+
+
+def summarize(times_ms, elapsed_s=None):
+    """
+    p50 / p95 / p99 / mean / max of a list of latencies (ms). Throughput is
+    calls per wall-clock second when `elapsed_s` is given (concurrent
+    runs), otherwise 1000 / mean (sequential runs).
+    """
+    if not times_ms:
+        return {"n": 0}
+    t = np.asarray(times_ms, dtype=np.float64)
+    p50, p95, p99 = np.percentile(t, [50, 95, 99])
+    mean = float(t.mean())
+    if elapsed_s:
+        throughput = len(t) / elapsed_s
+    else:
+        throughput = 1000.0 / mean if mean else 0.0
+    return {
+        "n": int(len(t)),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "mean_ms": round(mean, 3),
+        "max_ms": round(float(t.max()), 3),
+        "throughput_per_s": round(throughput, 2),
+    }
+
+
+def time_calls(fn, repeat, warmup=1):
+    """
+    Call fn() `warmup` + `repeat` times; summary of the timed calls.
+    """
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t) * 1000)
+    return summarize(times)
+
+
+# =========================
+# SYNTHETIC IMAGES
+# =========================
+def _draw_face(img, cx, cy, size, rng):
+    skin = tuple(int(c) for c in rng.integers([90, 120, 160], [140, 170, 220]))
+    w, h = int(size * 0.38), int(size * 0.5)
+    cv2.ellipse(img, (cx, cy), (w, h), 0, 0, 360, skin, -1)
+    # hair, eyes, nose, mouth at the usual proportions of a frontal face
+    cv2.ellipse(img, (cx, cy - int(h * 0.55)), (w, int(h * 0.5)), 0, 180, 360, (30, 30, 40), -1)
+    ey, ex, er = cy - int(h * 0.15), int(w * 0.42), max(2, size // 22)
+    for sx in (-1, 1):
+        cv2.ellipse(img, (cx + sx * ex, ey), (er * 2, er), 0, 0, 360, (245, 245, 245), -1)
+        cv2.circle(img, (cx + sx * ex, ey), er, (40, 30, 20), -1)
+    cv2.line(img, (cx, ey + er * 2), (cx - er, cy + int(h * 0.2)), (70, 90, 130), max(1, er // 2))
+    cv2.ellipse(
+        img, (cx, cy + int(h * 0.45)), (int(w * 0.4), int(h * 0.12)), 0, 0, 180,
+        (60, 60, 150), max(1, er // 2),
+    )
+
+
+def synthetic_face_image(width, height, faces=1, seed=0):
+    """
+    BGR frame with `faces` drawn frontal faces on a textured background.
+    Not a face model's idea of a face, but the decode / resize / detection
+    cost depends on the frame, not on who is in it.
+    """
+    rng = np.random.default_rng(seed)
+    img = rng.integers(60, 200, (height // 8 + 1, width // 8 + 1, 3), dtype=np.uint8)
+    img = cv2.resize(img, (width, height), interpolation=cv2.INTER_CUBIC)
+    cols = int(np.ceil(np.sqrt(faces * width / height))) or 1
+    rows = int(np.ceil(faces / cols)) or 1
+    size = int(min(width / cols, height / rows) * 0.8)
+    for i in range(faces):
+        r, c = divmod(i, cols)
+        cx = int((c + 0.5) * width / cols)
+        cy = int((r + 0.5) * height / rows)
+        _draw_face(img, cx, cy, size, rng)
+    img = cv2.GaussianBlur(img, (3, 3), 0)
+    noise = rng.normal(0, 4, img.shape)
+    return np.clip(img + noise, 0, 255).astype(np.uint8)
+
+
+def encode_jpeg(img, quality=90):
+    ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise RuntimeError("JPEG encoding failed")
+    return buf.tobytes()
+
+
+def image_set(directory=None, sizes=((1280, 720),), faces=1):
+    """
+    [(label, JPEG bytes)]: every image of `directory` when given (real
+    photos detect real faces), otherwise one synthetic frame per size.
+    """
+    if directory:
+        paths = sorted(
+            p for ext in ("jpg", "jpeg", "png")
+            for p in glob.glob(os.path.join(directory, f"*.{ext}"))
+        )
+        if not paths:
+            raise SystemExit(f"no .jpg / .png images in {directory}")
+        out = []
+        for p in paths:
+            with open(p, "rb") as f:
+                out.append((os.path.basename(p), f.read()))
+        return out
+    return [
+        (f"{w}x{h}", encode_jpeg(synthetic_face_image(w, h, faces, seed=i)))
+        for i, (w, h) in enumerate(sizes)
+    ]
+
+
+def parse_sizes(text):
+    # "640x480,1920x1080" -> [(640, 480), (1920, 1080)]
+    return [tuple(int(v) for v in s.lower().split("x")) for s in text.split(",") if s]
+
+
+# =========================
+# OUTPUT / REGRESSIONS
+# =========================
+def emit(name, results, out=None, meta=None):
+    report = {
+        "benchmark": name,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        **(meta or {}),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if out:
+        with open(out, "w") as f:
+            f.write(text)
+    return report
+
+
+def _latencies(node, path=()):
+    # every {"p95_ms": ...} summary in a report, keyed by its JSON path
+    if isinstance(node, dict):
+        if "p95_ms" in node:
+            yield "/".join(path), node
+        for k, v in node.items():
+            yield from _latencies(v, path + (str(k),))
+    elif isinstance(node, list):
+        for i, v in enumerate(node):
+            key = v.get("name", i) if isinstance(v, dict) else i
+            yield from _latencies(v, path + (str(key),))
+
+
+def compare(report, baseline_path, tolerance=0.2, metric="p95_ms"):
+    """
+    Summaries whose `metric` got more than `tolerance` slower than in the
+    baseline report. Returns a list of {path, baseline, current, ratio}.
+    """
+    with open(baseline_path) as f:
+        baseline = dict(_latencies(json.load(f)["results"]))
+    slower = []
+    for path, summary in _latencies(report["results"]):
+        old = baseline.get(path, {}).get(metric)
+        new = summary.get(metric)
+        if not old or new is None:
+            continue
+        ratio = new / old
+        if ratio > 1 + tolerance:
+            slower.append({"path": path, "baseline": old, "current": new, "ratio": round(ratio, 3)})
+    return slower
+
+
+def check_regressions(report, baseline_path, tolerance):
+    """
+    Print regressions against the baseline; exit code for the CLI.
+    """
+    slower = compare(report, baseline_path, tolerance)
+    for s in slower:
+        print(f"⚠️ {s['path']}: p95 {s['baseline']} → {s['current']} ms (x{s['ratio']})")
+    if not slower:
+        print(f"✅ no p95 regression over {tolerance:.0%} against {baseline_path}")
+    return 1 if slower else 0
@@ -14,6 +14,8 @@ from app.api.v1 import (
     routes_unknowns,
     routes_sessions,
     routes_attendance_export,
+    routes_events,
+    routes_health,
 )
 
 # Beanie/Mongo init
@@ -52,6 +54,9 @@ app.include_router(routes_enroll.router, prefix="/api/v1/enroll", tags=["enroll"
 app.include_router(routes_recognize.router, prefix="/api/v1/recognize", tags=["recognize"])
 app.include_router(routes_students.router, prefix="/api/v1/students", tags=["students"])
 app.include_router(routes_attendance.router, prefix="/api/v1/attendance", tags=["attendance"])
+app.include_router(routes_events.router, prefix="/api/v1/events", tags=["events"])
+# load balancer probes
+app.include_router(routes_health.router, prefix="/health", tags=["health"])
 # app.include_router(routes_unknowns.router, prefix="/api/v1/unknowns", tags=["unknowns"])
 
 
@@ -75,6 +80,10 @@ async def root():
 
 from datetime import datetime, timedelta
 from app.db.models_mongo import Student
+from app.services.gallery import gallery
+from app.services.gallery_sync import gallery_sync
+from app.services.warmup import readiness
+from app.services.events import session_scheduler
 
 @app.on_event("startup")
 async def on_startup():
@@ -82,6 +91,9 @@ async def on_startup():
         await init_db()
         print("✅ Mongo / Beanie initialized.")
 
+        # 🔥 optional: load + run the face engine while the rest starts up
+        readiness.start_warmup()
+
         # 🔥 Cleanup only STALE enrollments (older than 10 minutes)
         result = await Student.find(
             {
@@ -94,7 +106,32 @@ async def on_startup():
 
         print(f"🧹 Cleaned {result.deleted_count} stale enrollments")
 
+        # 🧠 Build the in-memory recognition gallery once
+        loaded = await gallery.load()
+        print(f"🧠 Gallery loaded: {loaded} embeddings (from {gallery.loaded_from})")
+
+        # 🔄 follow other workers' enrollments / deletes
+        gallery_sync.start()
+
+        # 📡 session status transitions for the event feed
+        session_scheduler.start()
+
+        readiness.started = True
+
     except Exception as e:
         traceback.print_exc()
         print("❌ Mongo init failed")
         raise RuntimeError("Database initialization failed") from e
+
+
+from app.services.inference_pool import inference_pool
+from app.services.auto_mark import attendance_writer
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    # don't lose auto-marks still waiting for their batch
+    await attendance_writer.flush()
+    await gallery.flush_snapshot()
+    session_scheduler.stop()
+    gallery_sync.stop()
+    inference_pool.shutdown()
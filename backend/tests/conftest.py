@@ -0,0 +1,11 @@
+# backend/tests/conftest.py
+import os
+import sys
+
+# app.db.mongo needs a URI at import time; the client connects lazily and
+# these tests never reach a server
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017/attendance_test")
+# tests must not read or write the real gallery snapshot
+os.environ.setdefault("GALLERY_SNAPSHOT_PATH", "")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,62 @@
+# backend/tests/test_attendance_export.py
+import asyncio
+from datetime import date, datetime
+import pytest
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+from app.api.v1 import routes_attendance_export as export
+
+TODAY = datetime.combine(date.today(), datetime.min.time())
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = AsyncMongoMockClient()["attendance_test"]
+    monkeypatch.setattr(export.mongo_module, "db", db)
+    cse, ece = ObjectId(), ObjectId()
+    asyncio.run(db["sessions"].insert_many([
+        {"_id": cse, "dept": "CSE", "sem": "3", "subject": "Maths"},
+        {"_id": ece, "dept": "ECE", "sem": "3", "subject": "Circuits"},
+    ]))
+    logs = [
+        ("s1", "Asha Rao", cse),
+        ("s2", "Ravi Kumar", cse),
+        ("s3", None, cse),
+        ("s4", "", cse),
+        ("s5", "Asha Menon", ece),
+    ]
+    asyncio.run(db["attendance_logs"].insert_many([
+        {"student_id": sid, "student_name": n, "session_id": str(sess),
+         "date": TODAY, "in_time": TODAY, "confidence": 0.9}
+        for sid, n, sess in logs
+    ] + [
+        # missing student_name entirely
+        {"student_id": "s6", "session_id": str(cse), "date": TODAY, "in_time": TODAY},
+    ]))
+    return db
+
+
+def _rows(dept=None, sem=None, name=None):
+    async def run():
+        out = []
+        async for chunk in export._export_rows(dept, sem, name, date.today(), date.today()):
+            out.extend(chunk)
+        return sorted(r[3] for r in out)
+    return asyncio.run(run())
+
+
+def test_export_without_filters_has_every_log(db):
+    assert _rows() == ["s1", "s2", "s3", "s4", "s5", "s6"]
+
+
+def test_name_filter_keeps_logs_without_a_name(db):
+    assert _rows(name="asha") == ["s1", "s3", "s4", "s5", "s6"]
+
+
+def test_name_filter_is_literal(db):
+    assert _rows(name="a.ha") == ["s3", "s4", "s6"]
+
+
+def test_session_filters_combine_with_the_name_filter(db):
+    assert _rows(dept="CSE", sem="3", name="ravi") == ["s2", "s3", "s4", "s6"]
+    assert _rows(dept="ECE") == ["s5"]
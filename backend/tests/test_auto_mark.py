@@ -0,0 +1,172 @@
+# backend/tests/test_auto_mark.py
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+import pytest
+from app.services import auto_mark
+from app.services.auto_mark import AttendanceWriter
+
+
+class _Logs:
+    # stands in for the attendance_logs collection / AttendanceLog model
+    # (one session); it doesn't enforce the unique index, `unique` only
+    # says whether it exists
+    def __init__(self, existing=()):
+        self.existing = list(existing)
+        self.inserted = []
+        self.unique = True
+
+    async def index_information(self):
+        return {auto_mark.mongo_module.UNIQUE_MARK_INDEX: {}} if self.unique else {}
+
+    async def distinct(self, field, query):
+        ids = self.existing + [log.student_id for log in self.inserted]
+        wanted = query.get("student_id", {}).get("$in")
+        return [s for s in ids if wanted is None or s in wanted]
+
+    async def insert_many(self, docs, ordered=False):
+        self.inserted.extend(docs)
+
+
+@pytest.fixture
+def logs(monkeypatch):
+    logs = _Logs()
+    monkeypatch.setattr(auto_mark.mongo_module, "db", {"attendance_logs": logs})
+    monkeypatch.setattr(auto_mark.mongo_module, "unique_marks", False)
+    monkeypatch.setattr(
+        auto_mark, "AttendanceLog",
+        type("Log", (SimpleNamespace,), {"insert_many": staticmethod(logs.insert_many)}),
+    )
+
+    async def no_rollups(rows):
+        return None
+
+    monkeypatch.setattr(auto_mark, "record_marks", no_rollups)
+    monkeypatch.setattr(auto_mark, "publish_marks", lambda rows: None)
+    return logs
+
+
+def _session(start=-10, end=60):
+    now = datetime.now(timezone.utc)
+    return {
+        "_id": "s1",
+        "start_time": now + timedelta(minutes=start),
+        "end_time": now + timedelta(minutes=end),
+    }
+
+
+def _match(student_id, score=0.8, scope=None):
+    m = {"recognized": True, "student_id": student_id, "name": student_id, "score": score}
+    if scope:
+        m["scope"] = scope
+    return m
+
+
+def _observe(writer, session, matches):
+    async def run():
+        statuses = await writer.observe(session, matches)
+        await writer.flush()
+        return statuses
+
+    return asyncio.run(run())
+
+
+def test_marks_once_per_student(logs):
+    w = AttendanceWriter()
+    s = _session()
+    assert _observe(w, s, [_match("a"), _match("b", score=0.3)]) == ["marked", None]
+    assert _observe(w, s, [_match("a")]) == ["already_marked"]
+    assert [log.student_id for log in logs.inserted] == ["a"]
+
+
+def test_existing_marks_are_not_rewritten(logs):
+    logs.existing = ["a"]
+    assert _observe(AttendanceWriter(), _session(), [_match("a")]) == ["already_marked"]
+    assert logs.inserted == []
+
+
+def test_fallback_match_outside_session_is_not_marked(logs):
+    w = AttendanceWriter()
+    statuses = _observe(w, _session(), [_match("a", scope="session"), _match("b", scope="all")])
+    assert statuses == ["marked", "not_eligible"]
+    assert [log.student_id for log in logs.inserted] == ["a"]
+
+
+def test_needs_enough_sightings(logs):
+    w = AttendanceWriter(min_sightings=2, window_s=60)
+    s = _session()
+    assert _observe(w, s, [_match("a")]) == ["pending"]
+    assert _observe(w, s, [_match("a")]) == ["marked"]
+
+
+def test_sessions_outside_their_window_are_not_marked(logs):
+    w = AttendanceWriter()
+    assert _observe(w, _session(start=10, end=70), [_match("a")]) == ["not_live"]
+    assert _observe(w, _session(start=-70, end=-10), [_match("a")]) == ["not_live"]
+    assert logs.inserted == []
+
+
+def test_state_of_ended_sessions_is_dropped(logs):
+    w = AttendanceWriter(min_sightings=3, window_s=60)
+    live = _session()
+    _observe(w, live, [_match("a"), _match("b")])
+    assert w.stats()["sessions"] == 1 and w.stats()["sightings"] == 2
+
+    # the session ends: the next sweep forgets it
+    w._ends["s1"] = datetime.now(timezone.utc) - timedelta(seconds=1)
+    w._sweep()
+    assert w.stats()["sessions"] == 0 and w.stats()["sightings"] == 0
+
+    # and a frame for an expired session drops whatever was left
+    _observe(w, live, [_match("a")])
+    _observe(w, _session(start=-70, end=-10), [_match("a")])
+    assert w.stats()["sessions"] == 0 and w.stats()["sightings"] == 0
+
+
+def test_without_the_unique_index_other_workers_marks_are_not_rewritten(logs):
+    logs.unique = False
+    s = _session()
+    # two API workers, both seeded before either wrote "a"
+    first, second = AttendanceWriter(), AttendanceWriter()
+
+    async def run():
+        await first.observe(s, [_match("a")])
+        await second.observe(s, [_match("a")])
+        await first.flush()
+        await second.flush()
+
+    asyncio.run(run())
+    assert [log.student_id for log in logs.inserted] == ["a"]
+    assert second.stats()["duplicates"] == 1
+
+
+def test_mark_endpoint_checks_for_a_mark_without_the_unique_index(logs, monkeypatch):
+    from fastapi import HTTPException
+    from app.api.v1 import routes_sessions
+
+    logs.unique = False
+    session = _session()
+
+    async def get_session(session_id):
+        return session
+
+    async def find_one(query):
+        return next((log for log in logs.inserted if log.student_id == query["student_id"]), None)
+
+    async def insert(self):
+        logs.inserted.append(self)
+
+    Log = type("Log", (SimpleNamespace,), {
+        "find_one": staticmethod(find_one), "insert": insert,
+    })
+    monkeypatch.setattr(routes_sessions, "AttendanceLog", Log)
+    monkeypatch.setattr(routes_sessions, "get_session", get_session)
+    monkeypatch.setattr(routes_sessions, "record_marks", auto_mark.record_marks)
+    monkeypatch.setattr(routes_sessions, "publish_marks", lambda rows: None)
+
+    payload = {"student_id": "a", "student_name": "A", "confidence": 0.9}
+    assert asyncio.run(routes_sessions.mark_attendance("s1", payload))["success"]
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(routes_sessions.mark_attendance("s1", payload))
+    assert e.value.status_code == 400
+    assert [log.student_id for log in logs.inserted] == ["a"]
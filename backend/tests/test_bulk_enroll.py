@@ -0,0 +1,72 @@
+# backend/tests/test_bulk_enroll.py
+import io
+import os
+import tarfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+import pytest
+from app.services.bulk_enroll import ImageEntry, archive_entries, group_by_roll, roll_from_path
+
+FILES = {
+    f"{roll}/{i}.jpg": os.urandom(50_000)
+    for roll in (1001, 1002, 1003) for i in range(4)
+}
+
+
+def _zip():
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in FILES.items():
+            zf.writestr(name, data)
+        zf.writestr("__MACOSX/1001/._0.jpg", b"x")
+        zf.writestr("notes.txt", b"x")
+    buf.seek(0)
+    return buf
+
+
+def _tar():
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tf:
+        for name, data in FILES.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+    buf.seek(0)
+    return buf
+
+
+@pytest.mark.parametrize("make, filename", [(_zip, "photos.zip"), (_tar, "photos.tar.gz")])
+def test_archive_entries_read_concurrently(make, filename):
+    entries = archive_entries(make(), filename)
+    assert sorted(e.name for e in entries) == sorted(FILES)
+    # bulk enroll reads entries from several worker threads at once
+    with ThreadPoolExecutor(8) as pool:
+        data = list(pool.map(lambda e: e.read(), entries * 3))
+    assert data == [FILES[e.name] for e in entries * 3]
+
+
+def test_roll_from_path():
+    assert roll_from_path("1042/front.jpg") == 1042
+    assert roll_from_path("class/1042_2.jpg") == 1042
+    assert roll_from_path("1042.png") == 1042
+    assert roll_from_path("1042 (1).jpg") == 1042
+    assert roll_from_path("C:\\photos\\77\\a.jpg") == 77
+    assert roll_from_path("front.jpg") is None
+    assert roll_from_path("a1042.jpg") is None
+
+
+def test_group_by_roll():
+    entries = archive_entries(_zip(), "photos.zip")
+    entries.append(type(entries[0])("front.jpg", lambda: b""))
+    groups, unmatched = group_by_roll(entries)
+    assert {k: len(v) for k, v in groups.items()} == {1001: 4, 1002: 4, 1003: 4}
+    assert unmatched == ["front.jpg"]
+
+
+def test_upload_entries_read_the_whole_file_every_time():
+    upload = SimpleNamespace(filename="7_1.jpg", file=io.BytesIO(b"jpeg bytes"))
+    entry = ImageEntry.from_upload(upload)
+    assert entry.name == "7_1.jpg"
+    assert entry.read() == b"jpeg bytes"
+    assert entry.read() == b"jpeg bytes"
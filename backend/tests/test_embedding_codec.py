@@ -0,0 +1,61 @@
+# backend/tests/test_embedding_codec.py
+import numpy as np
+import pytest
+from app.services.embedding_codec import decode, decode_many, encode, encode_fields
+
+
+def _vec(seed=0, dim=512, length=23.0):
+    v = np.random.default_rng(seed).normal(size=dim).astype(np.float32)
+    return v / np.linalg.norm(v) * length
+
+
+@pytest.mark.parametrize("dtype, size, min_cos", [
+    ("float32", 4, 0.999999),
+    ("float16", 2, 0.9999),
+    ("int8", 1, 0.999),
+])
+def test_round_trip(dtype, size, min_cos):
+    v = _vec()
+    data, fmt = encode(v, dtype)
+    assert len(data) == 512 * size
+    assert fmt["dtype"] == dtype and fmt["dim"] == 512
+    assert fmt["norm"] == pytest.approx(23.0, rel=1e-5)
+
+    out = decode(data, fmt)
+    assert out.dtype == np.float32
+    assert np.linalg.norm(out) == pytest.approx(1.0, abs=1e-3)
+    assert float(out @ (v / 23.0)) >= min_cos
+
+
+def test_rows_without_a_format_are_raw_float32():
+    v = _vec(length=1.0)
+    assert np.array_equal(decode(v.tobytes()), v)
+
+
+def test_decode_many_mixes_formats_and_keeps_row_order():
+    vecs = [_vec(i) for i in range(6)]
+    encoded = [encode(v, dt) for v, dt in zip(vecs, ["int8", "float16", "float32"] * 2)]
+    blobs = [e[0] for e in encoded]
+    fmts = [e[1] for e in encoded]
+    # a truncated row and an unknown dtype are dropped, the rest stay in order
+    blobs[2] = blobs[2][:-4]
+    fmts[4] = dict(fmts[4], dtype="bfloat16")
+
+    matrix, kept = decode_many(blobs, fmts, dim=512)
+    assert kept == [0, 1, 3, 5]
+    units = np.stack([vecs[i] / np.linalg.norm(vecs[i]) for i in kept])
+    assert np.all(np.sum(matrix * units, axis=1) > 0.999)
+
+
+def test_decode_many_drops_rows_of_the_wrong_size():
+    data, fmt = encode(_vec(), "float16")
+    matrix, kept = decode_many([data[:-2]], [fmt], dim=512)
+    assert kept == [] and matrix.shape == (0, 512)
+
+
+def test_encode_fields_and_unknown_dtype():
+    fields = encode_fields(_vec(), "int8")
+    assert set(fields) == {"embedding", "embedding_format"}
+    assert fields["embedding_format"]["scale"] > 0
+    with pytest.raises(ValueError):
+        encode(_vec(), "float64")
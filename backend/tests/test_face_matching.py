@@ -0,0 +1,43 @@
+# backend/tests/test_face_matching.py
+import numpy as np
+from app.services.face_engine import _top_students, match_embeddings, normalize_rows
+
+
+def test_top_students_keeps_each_students_best_image():
+    row = np.array([0.9, 0.2, 0.85, 0.7, 0.8, 0.1], dtype=np.float32)
+    sids = np.array(["a", "b", "a", "c", "a", "b"], dtype=object)
+    names = np.array(["A", "B", "A", "C", "A", "B"], dtype=object)
+    top = _top_students(row, sids, names, 3)
+    assert [(t["student_id"], t["name"]) for t in top] == [("a", "A"), ("c", "C"), ("b", "B")]
+    assert [round(t["score"], 2) for t in top] == [0.9, 0.7, 0.2]
+
+
+def test_top_students_widens_past_one_students_many_images():
+    # the best 40 rows all belong to one student: the first window
+    # (top_k * 4) holds no second student
+    row = np.concatenate([np.linspace(0.99, 0.9, 40), [0.5, 0.4]]).astype(np.float32)
+    sids = np.array(["a"] * 40 + ["b", "c"], dtype=object)
+    top = _top_students(row, sids, sids, 3)
+    assert [t["student_id"] for t in top] == ["a", "b", "c"]
+
+
+def test_top_students_with_fewer_students_than_asked():
+    row = np.array([0.3, 0.6, 0.5], dtype=np.float32)
+    sids = np.array(["a", "b", "a"], dtype=object)
+    top = _top_students(row, sids, sids, 5)
+    assert [t["student_id"] for t in top] == ["b", "a"]
+    assert top[1]["score"] == np.float32(0.5)
+
+
+def test_match_embeddings_thresholds_and_candidates():
+    gallery = normalize_rows(np.eye(4, 8, dtype=np.float32))
+    sids = np.array(["a", "a", "b", "c"], dtype=object)
+    queries = normalize_rows(np.array([
+        [1, 0.9, 0, 0, 0, 0, 0, 0],     # between a's two images
+        [0, 0, 0, 0, 0, 0, 0, 1],       # nobody
+    ], dtype=np.float32))
+    hit, miss = match_embeddings(queries, gallery, sids, sids, threshold=0.55, top_k=2)
+    assert hit["recognized"] and hit["student_id"] == "a"
+    assert [c["student_id"] for c in hit["candidates"]] == ["a", "b"]
+    assert not miss["recognized"]
+    assert match_embeddings(queries[:0], gallery, sids, sids) == []
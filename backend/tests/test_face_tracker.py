@@ -0,0 +1,99 @@
+# backend/tests/test_face_tracker.py
+import numpy as np
+import pytest
+from app.services.face_tracker import FaceTracker, iou_matrix
+
+
+def _face(x, y, size=100):
+    return {"bbox": [x, y, x + size, y + size]}
+
+
+def _unit(*v):
+    v = np.asarray(v, dtype=np.float32)
+    return v / np.linalg.norm(v)
+
+
+def _recognized(sid, score=0.9):
+    return {"recognized": True, "student_id": sid, "score": score}
+
+
+def test_iou_matrix():
+    ious = iou_matrix([[0, 0, 10, 10]], [[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]])
+    assert ious.shape == (1, 3)
+    assert ious[0] == pytest.approx([1.0, 1 / 3, 0.0])
+    assert iou_matrix(np.empty((0, 4)), [[0, 0, 1, 1]]).shape == (0, 1)
+
+
+def test_moving_faces_keep_their_tracks():
+    t = FaceTracker(iou_threshold=0.35)
+    first, _ = t.update([_face(0, 0), _face(300, 0)])
+    # both moved a little; detections come back in the other order
+    second, lost = t.update([_face(310, 5), _face(10, 5)])
+    assert [tr.id for tr in second] == [first[1].id, first[0].id]
+    assert second[0].hits == 2 and not lost
+
+
+def test_greedy_matching_gives_each_track_its_best_detection():
+    t = FaceTracker(iou_threshold=0.1)
+    a, b = t.update([_face(0, 0), _face(60, 0)])[0]
+    # one detection overlaps both tracks: the better overlap (b) wins it,
+    # and a starts a new track elsewhere instead of stealing it
+    visible, _ = t.update([_face(55, 0), _face(500, 500)])
+    assert visible[0] is b
+    assert visible[1].id not in (a.id, b.id)
+
+
+def test_tracks_are_lost_after_max_missed_frames():
+    t = FaceTracker(max_missed=2)
+    (track,), _ = t.update([_face(0, 0)])
+    assert t.update([])[1] == []
+    assert t.update([])[1] == []
+    assert t.update([])[1] == [track]
+    assert t.tracks == {}
+
+
+def test_needs_embedding_until_confident_then_every_refresh():
+    t = FaceTracker(refresh_every=3, confident_score=0.65)
+    (track,), _ = t.update([_face(0, 0)])
+    assert t.needs_embedding(track)
+    t.identify(track, _unit(1, 0), _recognized("s1", score=0.5))
+    assert t.needs_embedding(track)              # not confident yet
+    t.identify(track, _unit(1, 0), _recognized("s1"))
+    t.update([_face(0, 0)])
+    t.update([_face(0, 0)])
+    assert not t.needs_embedding(track)
+    t.update([_face(0, 0)])
+    assert t.needs_embedding(track)              # refresh due
+
+
+def test_identify_reports_student_changes():
+    t = FaceTracker()
+    (track,), _ = t.update([_face(0, 0)])
+    assert t.identify(track, _unit(1, 0), _recognized("s1"))[1]
+    assert not t.identify(track, _unit(1, 0), _recognized("s1"))[1]
+    assert t.identify(track, _unit(1, 0), _recognized("s2"))[1]
+
+
+def test_new_track_close_to_a_missing_one_is_reidentified():
+    t = FaceTracker(reid_similarity=0.6)
+    (old,), _ = t.update([_face(0, 0)])
+    t.identify(old, _unit(1, 0), _recognized("s1"))
+    # occluded for a frame, then back somewhere else
+    t.update([])
+    (new,), _ = t.update([_face(400, 400)])
+    assert new.id != old.id
+    owner, changed = t.identify(new, _unit(0.95, 0.1), _recognized("s1"))
+    assert owner is old and not changed
+    assert list(t.tracks) == [old.id]
+    assert old.bbox == [400, 400, 500, 500]
+
+
+def test_dissimilar_new_track_is_not_merged():
+    t = FaceTracker(reid_similarity=0.6)
+    (old,), _ = t.update([_face(0, 0)])
+    t.identify(old, _unit(1, 0), _recognized("s1"))
+    t.update([])
+    (new,), _ = t.update([_face(400, 400)])
+    owner, changed = t.identify(new, _unit(0, 1), _recognized("s2"))
+    assert owner is new and changed
+    assert set(t.tracks) == {old.id, new.id}
@@ -0,0 +1,91 @@
+# backend/tests/test_gallery.py
+import time
+import threading
+import numpy as np
+from app.services.gallery import GalleryIndex
+from app.services.search_index import IVFBackend
+
+
+def _unit(rows, dim=8, seed=0):
+    v = np.random.default_rng(seed).normal(size=(rows, dim)).astype(np.float32)
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+class SlowBackend:
+    """Counts builds; slow enough that racing threads overlap."""
+
+    def __init__(self):
+        self.builds = 0
+
+    def build(self, embeddings, embedding_ids):
+        self.builds += 1
+        time.sleep(0.05)
+        return object()
+
+
+def _gallery(rows=4, backend=None):
+    g = GalleryIndex(dim=8, backend=backend)
+    g.add_many(
+        [f"e{i}" for i in range(rows)],
+        [f"s{i}" for i in range(rows)],
+        [f"name{i}" for i in range(rows)],
+        _unit(rows),
+    )
+    return g
+
+
+def test_snapshot_is_reused_until_the_gallery_changes():
+    g = _gallery()
+    snap = g.snapshot()
+    assert g.snapshot() is snap
+    assert list(snap.student_ids) == ["s0", "s1", "s2", "s3"]
+
+    g.add("e4", "s4", "name4", _unit(1, seed=1)[0])
+    assert len(snap) == 4            # old snapshot is untouched
+    assert len(g.snapshot()) == 5
+
+
+def test_remove_students_leaves_old_snapshots_alone():
+    g = _gallery()
+    snap = g.snapshot()
+    assert g.remove_students(["s1", "s3"]) == 2
+    assert list(g.snapshot().student_ids) == ["s0", "s2"]
+    assert list(snap.student_ids) == ["s0", "s1", "s2", "s3"]
+
+
+def test_concurrent_first_matches_build_the_index_once():
+    backend = SlowBackend()
+    snap = _gallery(backend=backend).snapshot()
+    seen = []
+    threads = [threading.Thread(target=lambda: seen.append(snap.index)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert backend.builds == 1
+    assert all(i is seen[0] for i in seen)
+
+
+def test_subsets_and_empty_snapshots_have_no_index():
+    backend = SlowBackend()
+    snap = _gallery(backend=backend).snapshot()
+    assert snap.subset(np.array([True, False, True, False])).index is None
+    assert GalleryIndex(dim=8, backend=backend).snapshot().index is None
+    assert backend.builds == 0
+
+
+def test_a_write_updates_the_previous_index_instead_of_rebuilding():
+    backend = IVFBackend(nlist=8, nprobe=8, min_rows=0)
+    g = _gallery(rows=400, backend=backend)
+    base = g.snapshot().index.segments[0].rows
+
+    g.add_many(["x0", "x1"], ["new", "new"], ["New", "New"], _unit(2, seed=1))
+    g.snapshot()                      # never searched: its index is skipped
+    g.remove_students(["s3", "s10"])
+    snap = g.snapshot()
+    index = snap.index
+    assert index.segments[0].rows is base
+    assert index.tail_rows == 2 and index.dead == 2
+
+    _, rows = index.search(snap.embeddings, 1)
+    assert list(rows[:, 0]) == list(range(len(snap)))
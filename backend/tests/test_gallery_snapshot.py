@@ -0,0 +1,79 @@
+# backend/tests/test_gallery_snapshot.py
+import os
+from datetime import datetime, timedelta
+import numpy as np
+from app.services import gallery_snapshot
+from app.services.gallery_snapshot import ALIGN, read_snapshot, replayable, write_snapshot
+
+DIM = 8
+
+
+def _rows(n, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, DIM)).astype(np.float16)
+
+
+def _write(path, raw=3, templates=2):
+    meta = {"dtype": "float16", "dim": DIM, "since": datetime.utcnow().isoformat()}
+    indexes = {
+        "raw": (_rows(raw), [f"e{i}" for i in range(raw)], [f"s{i % 2}" for i in range(raw)]),
+        "templates": (_rows(templates, 1), [f"t{i}" for i in range(templates)], ["s0", "s1"][:templates]),
+    }
+    students = {"s0": {"name": "Asha", "dept": "CSE", "sem": 3}, "s1": {"name": "Ravi"}}
+    write_snapshot(path, meta, indexes, students)
+    return indexes, students
+
+
+def test_write_then_read(tmp_path):
+    path = str(tmp_path / "g.snap")
+    indexes, students = _write(path)
+
+    header, loaded, loaded_students = read_snapshot(path)
+    assert header["dim"] == DIM and header["dtype"] == "float16"
+    assert loaded_students == students
+    for name in ("raw", "templates"):
+        matrix, eids, sids = loaded[name]
+        assert isinstance(matrix, np.memmap)
+        assert header["indexes"][name]["offset"] % ALIGN == 0
+        assert np.array_equal(matrix, indexes[name][0])
+        assert eids == indexes[name][1] and sids == indexes[name][2]
+    # no temp file left behind
+    assert os.listdir(tmp_path) == ["g.snap"]
+
+
+def test_empty_index(tmp_path):
+    path = str(tmp_path / "g.snap")
+    _write(path, templates=0)
+    _, loaded, _ = read_snapshot(path)
+    assert loaded["templates"][0].shape == (0, DIM)
+    assert loaded["raw"][0].shape == (3, DIM)
+
+
+def test_rewrite_keeps_an_open_mapping_valid(tmp_path):
+    path = str(tmp_path / "g.snap")
+    indexes, _ = _write(path)
+    old = read_snapshot(path)[1]["raw"][0]
+    _write(path, raw=5)
+    assert np.array_equal(old, indexes["raw"][0])
+    assert read_snapshot(path)[1]["raw"][0].shape == (5, DIM)
+
+
+def test_unusable_files_read_as_none(tmp_path):
+    assert read_snapshot(str(tmp_path / "missing.snap")) is None
+
+    foreign = tmp_path / "foreign.snap"
+    foreign.write_bytes(b"not a snapshot")
+    assert read_snapshot(str(foreign)) is None
+
+    path = str(tmp_path / "g.snap")
+    _write(path)
+    truncated = tmp_path / "truncated.snap"
+    truncated.write_bytes((tmp_path / "g.snap").read_bytes()[:100])
+    assert read_snapshot(str(truncated)) is None
+
+
+def test_replayable(monkeypatch):
+    monkeypatch.setattr(gallery_snapshot, "GALLERY_CHANGE_RETENTION_S", 3600)
+    recent = {"since": (datetime.utcnow() - timedelta(minutes=5)).isoformat()}
+    stale = {"since": (datetime.utcnow() - timedelta(hours=2)).isoformat()}
+    assert replayable(recent)
+    assert not replayable(stale)
@@ -0,0 +1,104 @@
+# backend/tests/test_ingest.py
+import io
+import tempfile
+import numpy as np
+import cv2
+import pytest
+from PIL import Image
+from app.services import ingest
+from app.services.ingest import decode_image, image_size, read_upload, reduction_for, to_original
+
+
+def _jpeg(w, h, orientation=None):
+    # a bright square in the top-left corner of the stored (unrotated) pixels
+    img = np.zeros((h, w, 3), dtype=np.uint8)
+    img[: h // 4, : w // 4] = 255
+    buf = io.BytesIO()
+    pil = Image.fromarray(img)
+    if orientation:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        pil.save(buf, "JPEG", quality=95, exif=exif)
+    else:
+        pil.save(buf, "JPEG", quality=95)
+    return buf.getvalue()
+
+
+def _png(w, h):
+    ok, buf = cv2.imencode(".png", np.zeros((h, w, 3), dtype=np.uint8))
+    return buf.tobytes()
+
+
+def test_image_size_from_headers():
+    assert image_size(_jpeg(640, 480)) == (640, 480, "jpeg")
+    assert image_size(_png(200, 100)) == (200, 100, "png")
+    assert image_size(b"not an image") is None
+    assert image_size(b"\xff\xd8\xff") is None   # truncated JPEG
+
+
+def test_reduction_keeps_the_target_side():
+    assert reduction_for(4000, 3000, 0) == 1
+    assert reduction_for(4000, 3000, 640) == 4
+    assert reduction_for(4000, 3000, 1280) == 2
+    assert reduction_for(4000, 3000, 400) == 8
+    assert reduction_for(1280, 720, 1280) == 1
+
+
+def test_reduced_decode_scale():
+    frame = decode_image(_jpeg(4000, 3000), 1280)
+    assert frame.image.shape[:2] == (1500, 2000)
+    assert frame.scale == 0.5
+    assert frame.original_size == (4000, 3000)
+    assert to_original([100, 50, 200, 150], frame.scale) == [200, 100, 400, 300]
+
+
+def test_exif_rotated_photo_maps_back_to_displayed_pixels():
+    # stored 4000x3000 landscape, Orientation=6: displayed as 3000x4000 portrait
+    data = _jpeg(4000, 3000, orientation=6)
+    full = decode_image(data, 0)
+    frame = decode_image(data, 1280)
+    assert full.image.shape[:2] == (4000, 3000)
+    assert frame.image.shape[:2] == (2000, 1500)
+    assert frame.scale == 0.5
+    assert frame.original_size == (3000, 4000)
+
+    # the bright corner lands at the same place in both decodes
+    def corner(img):
+        ys, xs = np.nonzero(img[..., 0] > 128)
+        return [xs.min(), ys.min(), xs.max(), ys.max()]
+
+    small = to_original(corner(frame.image), frame.scale)
+    assert np.allclose(small, corner(full.image), atol=4)
+
+
+def test_png_is_decoded_full_size():
+    frame = decode_image(_png(2000, 1000), 640)
+    assert frame.image.shape[:2] == (1000, 2000)
+    assert frame.scale == 1.0
+
+
+def test_oversized_inputs_are_rejected_before_decoding(monkeypatch):
+    data = _jpeg(400, 300)
+    monkeypatch.setattr(ingest, "INGEST_MAX_PIXELS", 100_000)
+    with pytest.raises(ingest.ImageTooLarge) as e:
+        decode_image(data)
+    assert e.value.status_code == 413
+    monkeypatch.setattr(ingest, "INGEST_MAX_BYTES", 10)
+    with pytest.raises(ingest.ImageTooLarge):
+        decode_image(data)
+
+
+def test_garbage_decodes_to_none():
+    assert decode_image(b"\x00" * 100) is None
+
+
+@pytest.mark.parametrize("rolled", [False, True])
+def test_read_upload_from_spooled_file(rolled):
+    data = _jpeg(800, 600)
+    spool = tempfile.SpooledTemporaryFile(max_size=1 << 24)
+    spool.write(data)
+    if rolled:
+        spool.rollover()   # on disk: mmapped
+    frame = read_upload(spool, 0)
+    assert frame.image.shape[:2] == (600, 800)
+    spool.write(b"more")   # the buffer view was released
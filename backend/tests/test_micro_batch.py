@@ -0,0 +1,68 @@
+# backend/tests/test_micro_batch.py
+import asyncio
+import pytest
+from app.services import inference_pool
+from app.services.inference_pool import InferenceBusy, InferencePool
+from app.services.micro_batch import MicroBatcher
+
+
+class Recorder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, items):
+        self.calls.append(list(items))
+        return [x * 10 for x in items]
+
+
+def test_concurrent_requests_share_one_batch_and_get_their_own_results():
+    fn = Recorder()
+    batcher = MicroBatcher(fn, max_batch=32, max_wait_ms=20, max_inflight=1)
+
+    async def run():
+        return await asyncio.gather(
+            batcher.submit([1, 2]), batcher.submit([3]), batcher.submit([4, 5, 6])
+        )
+
+    assert asyncio.run(run()) == [[10, 20], [30], [40, 50, 60]]
+    assert fn.calls == [[1, 2, 3, 4, 5, 6]]
+    assert batcher.stats()["avg_batch"] == 6
+
+
+def test_full_batches_go_out_without_waiting_and_keep_requests_whole():
+    fn = Recorder()
+    # a long wait: only max_batch can trigger the first flush in time
+    batcher = MicroBatcher(fn, max_batch=4, max_wait_ms=10_000, max_inflight=4)
+
+    async def run():
+        return await asyncio.wait_for(asyncio.gather(
+            batcher.submit([1, 2, 3]), batcher.submit([4, 5]), batcher.submit([6, 7, 8, 9, 10]),
+        ), timeout=2)
+
+    assert asyncio.run(run()) == [[10, 20, 30], [40, 50], [60, 70, 80, 90, 100]]
+    assert sorted(map(len, fn.calls)) == [2, 3, 5]
+
+
+def test_queue_limit_and_failures():
+    def boom(items):
+        raise RuntimeError("model failed")
+
+    batcher = MicroBatcher(boom, max_batch=8, max_wait_ms=5, max_queued=2)
+
+    async def run():
+        first = asyncio.ensure_future(batcher.submit([1, 2]))
+        await asyncio.sleep(0)
+        with pytest.raises(InferenceBusy):
+            await batcher.submit([3])
+        with pytest.raises(RuntimeError):
+            await first
+        assert await batcher.submit([]) == []
+
+    asyncio.run(run())
+
+
+def test_pool_workers_split_the_cores_between_their_sessions(monkeypatch):
+    monkeypatch.setattr(inference_pool.os, "cpu_count", lambda: 16)
+    assert InferencePool(workers=4).intra_op_threads() == 4
+    assert InferencePool(workers=32).intra_op_threads() == 1
+    assert InferencePool(workers=1).intra_op_threads() == 0
@@ -0,0 +1,56 @@
+# backend/tests/test_readiness.py
+import asyncio
+from types import SimpleNamespace
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from app.db import mongo as mongo_module
+from app.services.warmup import Readiness
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = AsyncMongoMockClient()["attendance_test"]
+    monkeypatch.setattr(mongo_module, "db", db)
+    monkeypatch.setattr(mongo_module, "unique_marks", False)
+    monkeypatch.setattr(mongo_module, "missing_indexes", {"attendance_logs": [mongo_module.UNIQUE_MARK_INDEX]})
+    return db
+
+
+def _ready():
+    r = Readiness()
+    r.started = True
+    return asyncio.run(r.check(SimpleNamespace(ready=True)))
+
+
+def test_not_ready_without_the_unique_mark_index(db):
+    asyncio.run(db["attendance_logs"].insert_one({"session_id": "s1", "student_id": "a"}))
+    ok, checks = _ready()
+    assert not ok
+    assert checks["mongo"] and not checks["mark_index"]
+    assert Readiness().stats()["missing_indexes"] == {"attendance_logs": [mongo_module.UNIQUE_MARK_INDEX]}
+
+
+def test_ready_once_the_migration_built_the_index(db):
+    assert not _ready()[0]
+    asyncio.run(mongo_module.drop_duplicate_marks(apply=True))
+    ok, checks = _ready()
+    assert ok and checks["mark_index"]
+    assert mongo_module.missing_indexes == {}
+
+
+def test_server_mode_waits_for_the_inference_server(db, monkeypatch):
+    from app.services import face_engine, inference_server
+
+    asyncio.run(mongo_module.drop_duplicate_marks(apply=True))
+    monkeypatch.setattr(face_engine, "INFERENCE_MODE", "server")
+
+    def unreachable(timeout):
+        raise ConnectionRefusedError()
+
+    monkeypatch.setattr(inference_server, "ping", unreachable)
+    ok, checks = _ready()
+    assert not ok and not checks["inference_server"]
+
+    monkeypatch.setattr(inference_server, "ping", lambda timeout: {"workers": 2})
+    ok, checks = _ready()
+    assert ok and checks["inference_server"]
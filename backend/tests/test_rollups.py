@@ -0,0 +1,42 @@
+# backend/tests/test_rollups.py
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from app.services import rollups
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = AsyncMongoMockClient()["attendance_test"]
+    monkeypatch.setattr(rollups.mongo_module, "db", db)
+    return db
+
+
+def _sessions(db, *offsets_min):
+    now = datetime.now(timezone.utc)
+    asyncio.run(db["sessions"].insert_many([
+        {"subject": "Maths", "dept": "CSE", "sem": "3", "start_time": now + timedelta(minutes=m)}
+        for m in offsets_min
+    ]))
+
+
+def test_held_sessions_excludes_sessions_that_have_not_started(db):
+    # one three hours ago, one running, one two hours from now
+    _sessions(db, -180, -5, 120)
+    held = asyncio.run(rollups._held_sessions(date.today() - timedelta(days=1)))
+    assert held == {"Maths": 2}
+
+
+def test_held_sessions_respects_an_end_in_the_past(db):
+    _sessions(db, -3 * 24 * 60, -5)
+    before = date.today() - timedelta(days=2)
+    held = asyncio.run(rollups._held_sessions(date.today() - timedelta(days=7), before))
+    assert held == {"Maths": 1}
+
+
+def test_held_sessions_filters_on_class(db):
+    _sessions(db, -60)
+    since = date.today() - timedelta(days=1)
+    assert asyncio.run(rollups._held_sessions(since, dept="CSE", sem=3)) == {"Maths": 1}
+    assert asyncio.run(rollups._held_sessions(since, dept="ECE")) == {}
@@ -0,0 +1,106 @@
+# backend/tests/test_search_index.py
+import numpy as np
+from app.services.search_index import ExactIndex, IVFBackend, IVFIndex, make_backend
+
+
+def _clusters(n_clusters=20, per=50, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(n_clusters, dim)).astype(np.float32)
+    rows = np.repeat(centres, per, axis=0) + rng.normal(scale=0.1, size=(n_clusters * per, dim))
+    rows = rows.astype(np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+def test_exact_index_returns_best_rows_first():
+    rows = _clusters(per=5)
+    scores, idx = ExactIndex(rows).search(rows[:3], 4)
+    assert list(idx[:, 0]) == [0, 1, 2]
+    assert np.all(np.diff(scores, axis=1) <= 0)
+
+
+def test_ivf_agrees_with_exact_search():
+    rows = _clusters()
+    ids = [f"e{i}" for i in range(len(rows))]
+    index = IVFBackend(nlist=20, nprobe=4, min_rows=0).build(rows, ids)
+    assert isinstance(index, IVFIndex) and len(index) == len(rows)
+
+    queries = rows[::37]
+    exact_scores, exact_rows = ExactIndex(rows).search(queries, 1)
+    scores, found = index.search(queries, 1)
+    assert np.mean(found[:, 0] == exact_rows[:, 0]) >= 0.95
+    assert np.allclose(scores[found[:, 0] == exact_rows[:, 0]], exact_scores[found[:, 0] == exact_rows[:, 0]])
+
+
+def test_ivf_backend_reuses_centroids_and_assignments():
+    rows = _clusters()
+    ids = [f"e{i}" for i in range(len(rows))]
+    backend = IVFBackend(nlist=10, nprobe=2, min_rows=0)
+    backend.build(rows[:400], ids[:400])
+    centroids = backend.centroids
+
+    # grown, but not doubled: same centroids, cache follows the current ids
+    backend.build(rows[:700], ids[:700])
+    assert backend.centroids is centroids
+    assert len(backend._assign) == 700
+    backend.build(rows[100:700], ids[100:700])
+    assert "e0" not in backend._assign
+
+    # doubled: retrained
+    backend.build(rows, ids)
+    assert backend.centroids is not centroids
+
+
+def test_small_galleries_stay_exact():
+    rows = _clusters(per=2)
+    assert isinstance(IVFBackend(min_rows=1000).build(rows, list(range(len(rows)))), ExactIndex)
+    assert isinstance(make_backend("exact").build(rows, []), ExactIndex)
+
+
+def _updated(backend, index, rows, ids, keep, extra):
+    # snapshot of `index`'s gallery with only rows `keep`, then `extra` appended
+    embeddings = np.concatenate([rows[keep], extra])
+    new_ids = [ids[i] for i in keep] + [f"x{i}" for i in range(len(extra))]
+    origin = np.concatenate([keep, np.full(len(extra), -1)])
+    return embeddings, backend.update(index, embeddings, new_ids, origin)
+
+
+def test_ivf_update_shares_the_lists_and_matches_exact_search():
+    rows = _clusters()
+    ids = [f"e{i}" for i in range(len(rows))]
+    # probing every list makes the IVF search exact
+    backend = IVFBackend(nlist=10, nprobe=10, min_rows=0)
+    index = backend.build(rows[:900], ids[:900])
+
+    keep = np.setdiff1d(np.arange(900), np.arange(0, 900, 40))
+    embeddings, updated = _updated(backend, index, rows, ids, keep, rows[900:930])
+    assert isinstance(updated, IVFIndex) and len(updated) == len(embeddings)
+    assert updated.segments[0].rows is index.segments[0].rows
+    assert updated.tail_rows == 30 and updated.dead == 23
+
+    queries = rows[::45]
+    exact_scores, exact_rows = ExactIndex(embeddings).search(queries, 3)
+    scores, found = updated.search(queries, 3)
+    assert np.array_equal(found, exact_rows)
+    assert np.allclose(scores, exact_scores)
+
+    # the next update folds the tail's live rows into a new one instead of
+    # stacking another
+    new_ids = ids[:len(embeddings)]
+    _, again = _updated(backend, updated, embeddings, new_ids,
+                        np.arange(len(embeddings) - 5), rows[930:931])
+    assert len(again.segments) == 2 and again.tail_rows == 26 and again.dead == 23
+
+
+def test_ivf_update_rebuilds_past_the_threshold(monkeypatch):
+    from app.services import search_index
+
+    monkeypatch.setattr(search_index, "IVF_REBUILD_FRACTION", 0.05)
+    rows = _clusters()
+    ids = [f"e{i}" for i in range(len(rows))]
+    backend = IVFBackend(nlist=10, nprobe=10, min_rows=0)
+    index = backend.build(rows[:800], ids[:800])
+    centroids = backend.centroids
+
+    _, updated = _updated(backend, index, rows, ids, np.arange(800), rows[800:900])
+    assert len(updated.segments) == 1 and updated.dead == 0
+    assert backend.centroids is centroids
@@ -0,0 +1,60 @@
+# backend/tests/test_templates.py
+import asyncio
+import numpy as np
+from mongomock_motor import AsyncMongoMockClient
+from app.db import mongo as mongo_module
+from app.services import templates
+from app.services.embedding_codec import encode_fields
+from app.services.templates import build_templates, centroid, k_medoids
+
+
+def _pose_groups(seed=0, dim=16):
+    # two tight groups of images (e.g. with and without glasses)
+    rng = np.random.default_rng(seed)
+    a, b = rng.normal(size=(2, dim))
+    rows = np.vstack([a + rng.normal(scale=0.05, size=(4, dim)),
+                      b + rng.normal(scale=0.05, size=(3, dim))])
+    return (rows / np.linalg.norm(rows, axis=1, keepdims=True)).astype(np.float32)
+
+
+def test_centroid_is_the_unit_mean():
+    e = np.eye(2, 4, dtype=np.float32)
+    assert np.allclose(centroid(e), [2 ** -0.5, 2 ** -0.5, 0, 0])
+
+
+def test_k_medoids_picks_one_image_per_group():
+    e = _pose_groups()
+    medoids = sorted(k_medoids(e, 2))
+    assert medoids[0] < 4 <= medoids[1]
+    assert list(k_medoids(e[:2], 5)) == [0, 1]
+
+
+def test_build_templates_modes():
+    e = _pose_groups()
+    assert [k for k, _ in build_templates(e, mode="centroid")] == ["centroid"]
+    built = build_templates(e, mode="medoids", exemplars=2)
+    assert [k for k, _ in built] == ["centroid", "medoid", "medoid"]
+    assert all(np.isclose(np.linalg.norm(v), 1.0) for _, v in built)
+    # a single image has no exemplars to pick
+    assert len(build_templates(e[:1], mode="medoids", exemplars=2)) == 1
+    assert build_templates(np.empty((0, 16), np.float32)) == []
+
+
+def test_rebuild_all_templates_every_student(monkeypatch):
+    db = AsyncMongoMockClient()["attendance_test"]
+    monkeypatch.setattr(mongo_module, "db", db)
+    e = _pose_groups()
+    legacy = {"student_id": "s2", "embedding": e[5].tobytes()}   # raw float32, no format
+    asyncio.run(db["face_embeddings"].insert_many(
+        [{"student_id": "s1", **encode_fields(v)} for v in e[:4]]
+        + [legacy, {"student_id": "s2", **encode_fields(e[6])}]
+    ))
+
+    saved = {}
+
+    async def save(student, embeddings, mode=None):
+        saved[student.id] = (len(embeddings), mode)
+
+    monkeypatch.setattr(templates, "save_student_templates", save)
+    assert asyncio.run(templates.rebuild_all("centroid")) == 2
+    assert saved == {"s1": (4, "centroid"), "s2": (2, "centroid")}
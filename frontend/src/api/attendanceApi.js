@@ -16,9 +16,10 @@ export async function exportAttendance(filters = {}, range = "today") {
 }
 
 
-export async function attendanceToday(range = "today") {
+// one page of the preview: { records, count, next_cursor }
+export async function attendanceToday(range = "today", cursor = null) {
   const res = await axios.get(`${BASE}/attendance/preview`, {
-    params: { range },
+    params: cursor ? { range, cursor } : { range },
   });
   return res.data;
 }
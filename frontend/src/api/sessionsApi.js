@@ -68,3 +68,23 @@ export async function markSessionAttendance(sessionId, payload) {
 
   return res.data;
 }
+
+/* =========================
+   SESSION EVENTS (SSE)
+   GET /api/v1/events/stream
+   handlers: { [eventType]: (data) => void, open, error }
+   returns the EventSource (call .close() when done),
+   or null when the browser has no EventSource
+========================= */
+export function subscribeSessionEvents(handlers) {
+  if (typeof EventSource === "undefined") return null;
+
+  const source = new EventSource(`${API_BASE}/api/v1/events/stream`);
+  ["session.created", "session.status", "attendance.marked"].forEach((type) => {
+    if (!handlers[type]) return;
+    source.addEventListener(type, (e) => handlers[type](JSON.parse(e.data)));
+  });
+  source.onopen = () => handlers.open?.();
+  source.onerror = () => handlers.error?.();
+  return source;
+}
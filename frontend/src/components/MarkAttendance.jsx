@@ -4,6 +4,7 @@ import {
   createSession,
   listSessions,
   markSessionAttendance,
+  subscribeSessionEvents,
 } from "../api/sessionsApi";
 import { recognizeFace } from "../api/recognizeApi";
 
@@ -52,10 +53,38 @@ export default function MarkAttendance() {
     }
   };
 
+  // live updates come from the event feed; the list is only polled
+  // while the feed is down (or the browser has no EventSource)
   useEffect(() => {
+    let interval = null;
+    const startPolling = () => {
+      if (!interval) interval = setInterval(loadSessions, 15000);
+    };
+    const stopPolling = () => {
+      clearInterval(interval);
+      interval = null;
+    };
+
     loadSessions();
-    const interval = setInterval(loadSessions, 15000); // refresh list
-    return () => clearInterval(interval);
+    const source = subscribeSessionEvents({
+      "session.created": loadSessions,
+      "session.status": ({ session_id, status }) =>
+        setSessions((prev) =>
+          prev.map((s) => (s.id === session_id ? { ...s, status } : s))
+        ),
+      open: () => {
+        // catch up on whatever changed while disconnected
+        if (interval) loadSessions();
+        stopPolling();
+      },
+      error: startPolling, // EventSource keeps retrying on its own
+    });
+    if (!source) startPolling();
+
+    return () => {
+      source?.close();
+      stopPolling();
+    };
   }, []);
 
   /* =========================
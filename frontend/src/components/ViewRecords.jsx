@@ -12,6 +12,8 @@ export default function ViewRecords() {
   });
 
   const [preview, setPreview] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(false);
   const [range, setRange] = useState("today"); // today | week | month | year
 
@@ -22,23 +24,37 @@ export default function ViewRecords() {
     loadPreview();
   }, [range]);
 
+// the preview is paged: { records, count, next_cursor }
+function pageRows(data) {
+  if (Array.isArray(data)) return data;
+  if (Array.isArray(data?.records)) return data.records;
+  if (Array.isArray(data?.data)) return data.data;
+  return []; // fallback
+}
+
 async function loadPreview() {
   try {
     const data = await attendanceToday(range);
-
-    // ✅ FORCE array
-    if (Array.isArray(data)) {
-      setPreview(data);
-    } else if (Array.isArray(data?.records)) {
-      setPreview(data.records);
-    } else if (Array.isArray(data?.data)) {
-      setPreview(data.data);
-    } else {
-      setPreview([]); // fallback
-    }
+    setPreview(pageRows(data));
+    setNextCursor(data?.next_cursor || null);
   } catch (e) {
     console.error(e);
     setPreview([]);
+    setNextCursor(null);
+  }
+}
+
+async function loadMore() {
+  if (!nextCursor) return;
+  setLoadingMore(true);
+  try {
+    const data = await attendanceToday(range, nextCursor);
+    setPreview((rows) => [...rows, ...pageRows(data)]);
+    setNextCursor(data?.next_cursor || null);
+  } catch (e) {
+    console.error(e);
+  } finally {
+    setLoadingMore(false);
   }
 }
 
@@ -253,6 +269,19 @@ async function loadPreview() {
               </table>
             </div>
           )}
+
+          {nextCursor && (
+            <div className="flex items-center justify-between mt-4 text-sm text-gray-600">
+              <span>Showing the newest {preview.length} records</span>
+              <button
+                onClick={loadMore}
+                disabled={loadingMore}
+                className="px-4 py-2 border rounded hover:bg-gray-100 disabled:opacity-50"
+              >
+                {loadingMore ? "Loading..." : "Load more"}
+              </button>
+            </div>
+          )}
         </div>
       </div>
     </div>